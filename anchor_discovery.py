@@ -0,0 +1,317 @@
+#[Project code]:
+#Trust anchor discovery between domain controllers
+#A controller publishes under <domain>/KEY/32=metadata a Data signed by its trust anchor, listing the Names and
+#SHA-256 digests of the current trust anchor certificates. Its version only changes with the anchors and its
+#freshness period is long, so forwarder caches answer most requests. The anchors are then fetched by Name plus
+#implicit digest, which any cache can answer as well.
+#Clients keep the metadata and the anchors in a cache directory. Within the freshness period no Interest is sent;
+#afterwards the metadata is fetched again and only anchors with a new digest are fetched.
+#
+#   serve_anchors(app, keychain, '/lvs-test2')
+#
+#   cache = AnchorCache(app)
+#   anchors = await cache.anchors('/lvs-test2')
+
+import asyncio as aio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+from Cryptodome.PublicKey import ECC, RSA
+from ndn.encoding import TlvModel, NameField, BytesField, ModelField, RepeatedField, Name, Component, \
+    FormalName, BinaryStr, NonStrictName, SignatureType, SignaturePtrs, DecodeError, parse_data
+from ndn.app import NDNApp, InterestNack, InterestTimeout, InterestCanceled
+from ndn.security.keychain import Keychain
+from ndn.security.validator.known_key_validator import verify_ecdsa, verify_rsa
+
+
+METADATA_COMPONENT = Component.from_str('32=metadata')
+#Freshness period of the metadata in ms
+METADATA_FRESHNESS = 3600 * 1000
+CACHE_DIR = os.environ.get('ANCHOR_CACHE_DIR', os.path.expanduser('~/.ndn/anchor-cache'))
+
+
+class AnchorTypeNumber:
+    ANCHOR = 0xC9
+    ANCHOR_DIGEST = 0xCA
+
+
+class AnchorEntry(TlvModel):
+    name = NameField()
+    digest = BytesField(AnchorTypeNumber.ANCHOR_DIGEST)
+
+
+class AnchorMetadata(TlvModel):
+    anchors = RepeatedField(ModelField(AnchorTypeNumber.ANCHOR, AnchorEntry))
+
+
+async def _accept_unverified(_name, _sig_ptrs) -> bool:
+    #The metadata and the anchors are checked against each other once all are fetched
+    return True
+
+
+def _parse_signed(wire: BinaryStr, what: str) -> tuple:
+    """
+    Parse a Data packet received from another domain, as ``parse_data`` does.
+
+    :raises ValueError: the packet is malformed or carries no SignatureInfo.
+    """
+    try:
+        name, meta_info, content, sig_ptrs = parse_data(wire)
+    except (DecodeError, IndexError, TypeError) as e:
+        raise ValueError(f'Malformed {what}: {e}') from e
+    if sig_ptrs.signature_info is None:
+        raise ValueError(f'The {what} {Name.to_str(name)} has no SignatureInfo')
+    return name, meta_info, content, sig_ptrs
+
+
+def verify_signature(key_bits: BinaryStr, sig_ptrs: SignaturePtrs) -> bool:
+    sig_type = sig_ptrs.signature_info.signature_type
+    if sig_type == SignatureType.SHA256_WITH_ECDSA:
+        return verify_ecdsa(ECC.import_key(bytes(key_bits)), sig_ptrs)
+    elif sig_type == SignatureType.SHA256_WITH_RSA:
+        return verify_rsa(RSA.import_key(bytes(key_bits)), sig_ptrs)
+    raise ValueError(f'Unsupported signature type {sig_type}')
+
+
+def check_self_signature(cert_name: FormalName, key_bits: BinaryStr, sig_ptrs: SignaturePtrs) -> FormalName:
+    """
+    Check that a trust anchor certificate is signed by its own key, and return the Key Name.
+
+    :raises ValueError: it is not a self-signed certificate.
+    """
+    #Certificate Name: /<domain>/KEY/<key-id>/<issuer-id>/<version>
+    if len(cert_name) < 4 or cert_name[-4] != Component.from_str('KEY'):
+        raise ValueError(f'{Name.to_str(cert_name)} is not a certificate Name')
+    key_name = cert_name[:-2]
+    key_locator = sig_ptrs.signature_info.key_locator if sig_ptrs.signature_info else None
+    if key_locator is None or key_locator.name is None or not Name.is_prefix(key_name, key_locator.name):
+        raise ValueError(f'{Name.to_str(cert_name)} is not self-signed')
+    if not verify_signature(key_bits, sig_ptrs):
+        raise ValueError(f'Bad self-signature on {Name.to_str(cert_name)}')
+    return key_name
+
+
+def serve_anchors(app: NDNApp, keychain: Keychain, domain: NonStrictName, freshness: int = METADATA_FRESHNESS):
+    """
+    Serve the anchor metadata of a domain and its anchors under <domain>/KEY.
+    The anchors are the default certificates of the keys of the domain identity, the default key first.
+    The metadata is signed with the default anchor, and signed again when the anchors change in the keychain,
+    detected through its ``data_version`` if it has one.
+
+    :return: the metadata as first served.
+    """
+    prefix = Name.normalize(domain) + [Component.from_str('KEY')]
+    #data_version of the keychain, certificates, encoded Name -> wire, digests and signed metadata served
+    served = {}
+
+    def build():
+        identity = keychain[domain]
+        default_key = identity.default_key()
+        certs = [default_key.default_cert()] + [identity[key_name].default_cert()
+                                                for key_name in identity if key_name != default_key.name]
+        digests = [hashlib.sha256(bytes(cert.data)).digest() for cert in certs]
+        served['certs'] = certs
+        served['anchors'] = {Name.to_bytes(cert.name): bytes(cert.data) for cert in certs}
+        #The keychain also changes with PoRs and renewals, only sign again when the anchors changed
+        if digests == served.get('digests'):
+            return
+        metadata = AnchorMetadata()
+        metadata.anchors = []
+        for cert, digest in zip(certs, digests):
+            entry = AnchorEntry()
+            entry.name = cert.name
+            entry.digest = digest
+            metadata.anchors.append(entry)
+        #The version only depends on the anchors, so caches keep answering until they change
+        version = max(Component.to_number(Name.normalize(cert.name)[-1]) for cert in certs)
+        served['digests'] = digests
+        served['metadata'] = app.prepare_data(prefix + [METADATA_COMPONENT, Component.from_version(version)],
+                                              metadata.encode(), freshness_period=freshness,
+                                              signer=keychain.get_signer({'cert': certs[0].name}))
+
+    served['version'] = getattr(keychain, 'data_version', None)
+    build()
+
+    @app.route(prefix)
+    def on_interest(name, _param, _app_param):
+        version = getattr(keychain, 'data_version', None)
+        if version != served['version']:
+            build()
+            served['version'] = version
+        if len(name) > len(prefix) and name[len(prefix)] == METADATA_COMPONENT:
+            app.put_raw_packet(served['metadata'])
+            return
+        if Component.get_type(name[-1]) == Component.TYPE_IMPLICIT_SHA256:
+            name = name[:-1]
+        wire = served['anchors'].get(Name.to_bytes(name))
+        #Clients that do not know the metadata fetch <domain>/KEY by prefix, they get the default anchor
+        app.put_raw_packet(wire if wire is not None else bytes(served['certs'][0].data))
+
+    return served['metadata']
+
+
+def _write_atomic(path: str, data: bytes):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.anchors-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class AnchorCache:
+    """
+    The trust anchors of foreign domains, discovered through their metadata and cached in a directory.
+
+    :ivar app: the app fetching the metadata and the anchors.
+    :ivar cache_dir: the directory holding one ``<hash of the domain>.json`` file per domain.
+    :ivar hits: the lookups answered without any Interest.
+    :ivar revalidated: the lookups whose metadata was fetched again but had the same version.
+    :ivar fetched: the anchors fetched.
+    """
+    app: NDNApp
+    cache_dir: str
+    hits: int
+    revalidated: int
+    fetched: int
+
+    def __init__(self, app: NDNApp, cache_dir: Optional[str] = None):
+        self.app = app
+        self.cache_dir = cache_dir or CACHE_DIR
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.revalidated = 0
+        self.fetched = 0
+        self._entries = {}
+
+    def _path(self, domain: bytes) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(domain).hexdigest() + '.json')
+
+    def _load(self, domain: bytes) -> Optional[dict]:
+        if domain not in self._entries:
+            try:
+                with open(self._path(domain)) as f:
+                    raw = json.load(f)
+                self._entries[domain] = {
+                    'fetched_at': raw['fetched_at'],
+                    'metadata': bytes.fromhex(raw['metadata']),
+                    'anchors': {hashlib.sha256(wire).digest(): wire
+                                for wire in (bytes.fromhex(a) for a in raw['anchors'])},
+                }
+            except (FileNotFoundError, ValueError, KeyError, TypeError):
+                return None
+        return self._entries[domain]
+
+    def _save(self, domain: bytes, entry: dict):
+        self._entries[domain] = entry
+        _write_atomic(self._path(domain), json.dumps({
+            'fetched_at': entry['fetched_at'],
+            'metadata': entry['metadata'].hex(),
+            'anchors': [wire.hex() for wire in entry['anchors'].values()],
+        }).encode())
+
+    @staticmethod
+    def _parse_metadata(wire: bytes) -> tuple[FormalName, int, list[AnchorEntry], SignaturePtrs]:
+        name, meta_info, content, sig_ptrs = _parse_signed(wire, 'anchor metadata')
+        freshness = meta_info.freshness_period if meta_info and meta_info.freshness_period else 0
+        try:
+            listed = AnchorMetadata.parse(content).anchors or []
+        except (DecodeError, IndexError, TypeError) as e:
+            raise ValueError(f'Malformed anchor metadata {Name.to_str(name)}: {e}') from e
+        if any(anchor.name is None or anchor.digest is None for anchor in listed):
+            raise ValueError(f'Incomplete anchor entry in {Name.to_str(name)}')
+        return name, freshness, listed, sig_ptrs
+
+    @staticmethod
+    def _anchor_list(entry: dict) -> list[tuple[FormalName, FormalName, bytes]]:
+        #(certificate Name, Key Name, wire) of the anchors in the order of the metadata
+        _, _, listed, _ = AnchorCache._parse_metadata(entry['metadata'])
+        ret = []
+        for anchor in listed:
+            wire = entry['anchors'][bytes(anchor.digest)]
+            ret.append((anchor.name, anchor.name[:-2], wire))
+        return ret
+
+    async def _fetch_anchor(self, name: FormalName, digest: bytes, lifetime: int) -> bytes:
+        _, _, _, wire = await self.app.express_interest(
+            name + [Component.from_bytes(digest, Component.TYPE_IMPLICIT_SHA256)], lifetime=lifetime,
+            need_raw_packet=True, validator=_accept_unverified)
+        wire = bytes(wire)
+        if hashlib.sha256(wire).digest() != digest:
+            raise ValueError(f'Digest mismatch on {Name.to_str(name)}')
+        cert_name, _, key_bits, sig_ptrs = _parse_signed(wire, 'anchor')
+        if Name.to_bytes(cert_name) != Name.to_bytes(name):
+            raise ValueError(f'Got {Name.to_str(cert_name)} instead of {Name.to_str(name)}')
+        check_self_signature(cert_name, key_bits, sig_ptrs)
+        self.fetched += 1
+        return wire
+
+    async def anchors(self, domain: NonStrictName, lifetime: int = 4000) -> list[tuple[FormalName, FormalName, bytes]]:
+        """
+        The current trust anchors of a domain, the default one first.
+
+        :return: tuples of (certificate Name, Key Name, certificate wire). Every anchor is self-signed.
+        :raises ValueError: the metadata or an anchor is invalid.
+        :raises InterestNack, InterestTimeout: the metadata could not be fetched and nothing is cached.
+        """
+        domain = Name.normalize(domain)
+        domain_key = Name.to_bytes(domain)
+        entry = self._load(domain_key)
+        if entry is not None:
+            _, freshness, _, _ = self._parse_metadata(entry['metadata'])
+            if time.time() < entry['fetched_at'] + freshness / 1000:
+                self.hits += 1
+                return self._anchor_list(entry)
+
+        try:
+            _, _, _, metadata_wire = await self.app.express_interest(
+                domain + [Component.from_str('KEY'), METADATA_COMPONENT], must_be_fresh=True, can_be_prefix=True,
+                lifetime=lifetime, need_raw_packet=True, validator=_accept_unverified)
+        except (InterestNack, InterestTimeout, InterestCanceled) as e:
+            if entry is None:
+                raise
+            logging.warning(f'Using the expired anchor metadata of {Name.to_str(domain)}: {e.__class__.__name__}')
+            return self._anchor_list(entry)
+        metadata_wire = bytes(metadata_wire)
+        name, _, listed, sig_ptrs = self._parse_metadata(metadata_wire)
+        if not listed or not Name.is_prefix(domain, name):
+            raise ValueError(f'Invalid anchor metadata {Name.to_str(name)}')
+        if entry is not None and Name.to_bytes(self._parse_metadata(entry['metadata'])[0]) == Name.to_bytes(name):
+            self.revalidated += 1
+
+        #Only anchors with an unknown digest are fetched
+        known = entry['anchors'] if entry is not None else {}
+        anchors = {}
+        missing = []
+        for anchor in listed:
+            digest = bytes(anchor.digest)
+            if not Name.is_prefix(domain, anchor.name):
+                raise ValueError(f'Anchor {Name.to_str(anchor.name)} is not in {Name.to_str(domain)}')
+            if digest in known:
+                anchors[digest] = known[digest]
+            else:
+                missing.append((anchor.name, digest))
+        wires = await aio.gather(*(self._fetch_anchor(name, digest, lifetime) for name, digest in missing))
+        anchors.update((digest, wire) for (_, digest), wire in zip(missing, wires))
+
+        #The metadata must be signed by one of the anchors it lists
+        key_locator = sig_ptrs.signature_info.key_locator.name if sig_ptrs.signature_info.key_locator else None
+        signer = None
+        for wire in anchors.values():
+            cert_name, _, key_bits, _ = parse_data(wire)
+            #The KeyLocator is the certificate Name or the Key Name
+            if key_locator is not None and Name.is_prefix(key_locator, cert_name):
+                signer = key_bits
+                break
+        if signer is None or not verify_signature(signer, sig_ptrs):
+            raise ValueError(f'The anchor metadata of {Name.to_str(domain)} is not signed by one of its anchors')
+
+        entry = {'fetched_at': time.time(), 'metadata': metadata_wire, 'anchors': anchors}
+        self._save(domain_key, entry)
+        return self._anchor_list(entry)
@@ -0,0 +1,71 @@
+#[Project code]:
+#Parse throughput of certificates: the model-based parse_certificate compared with the lazy CertificateView,
+#reading the fields the validator needs (Name, key bits and NotAfter).
+#
+#   python bench_cert_parse.py --count 20000
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+from ndn.app_support.security_v2 import parse_certificate, derive_cert, CertificateView
+from ndn.encoding import Name
+from ndn.security import TpmFile, KeychainSqlite3
+
+
+def make_cert() -> bytes:
+    #A certificate signed with ECDSA, as the ones fetched from the producers
+    with tempfile.TemporaryDirectory() as base_dir:
+        pib_path = os.path.join(base_dir, 'pib.db')
+        tpm_path = os.path.join(base_dir, 'ndnsec-key-file')
+        KeychainSqlite3.initialize(pib_path, 'tpm-file', tpm_path)
+        keychain = KeychainSqlite3(pib_path, TpmFile(tpm_path))
+        key, issuer = keychain.new_keys([('/lvs-test/author/vincent', {}), ('/lvs-test/admin/ndn', {})])
+        signer = keychain.tpm.get_signer(issuer.name, issuer.default_cert().name)
+        _, cert_wire = derive_cert(key.name, 'ndn', key.key_bits, signer, datetime.utcnow(), 86400)
+        keychain.shutdown()
+    return bytes(cert_wire)
+
+
+def parse_model(wire):
+    cert = parse_certificate(wire)
+    return cert.name, cert.content, cert.signature_info.validity_period.not_after
+
+
+def parse_lazy(wire):
+    cert = CertificateView(wire)
+    return cert.name, cert.key_bits, cert.not_after
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark certificate parsing')
+    parser.add_argument('--count', type=int, default=20000, help='certificates parsed per parser')
+    args = parser.parse_args()
+
+    wire = make_cert()
+    expected = parse_model(wire)
+    got = parse_lazy(wire)
+    assert Name.to_bytes(got[0]) == Name.to_bytes(expected[0])
+    assert bytes(got[1]) == bytes(expected[1]) and bytes(got[2]) == bytes(expected[2])
+
+    results = {}
+    for mode, parse in (('model', parse_model), ('lazy view', parse_lazy)):
+        start = time.perf_counter()
+        for _ in range(args.count):
+            parse(wire)
+        results[mode] = time.perf_counter() - start
+    #Name only, as when the validator looks the key up in its storage
+    start = time.perf_counter()
+    for _ in range(args.count):
+        _ = CertificateView(wire).encoded_name
+    results['lazy, name only'] = time.perf_counter() - start
+
+    print(f'{len(wire)} byte certificate, {args.count} parses')
+    for mode, elapsed in results.items():
+        print(f'{mode:<16} {args.count / elapsed:>10.0f} certs/s  {elapsed / args.count * 1e6:>7.1f} us/cert')
+    print(f'speedup          {results["model"] / results["lazy view"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
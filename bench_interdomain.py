@@ -0,0 +1,247 @@
+#[Project code]:
+#End-to-end benchmark of intradomain vs interdomain validation
+#It generates a throwaway keychain holding both domains (no ndnsec needed), runs the producer, controller
+#and consumer flows of this repo over the in-process loopback forwarder, and reports for cold and warm caches:
+#throughput, p50/p99 validation latency, Interests per validated packet and the share of time spent in crypto.
+#
+#   python bench_interdomain.py --count 200 --concurrency 16 --delay 5 --json bench.json
+
+import argparse
+import asyncio as aio
+import contextlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from ndn.encoding import Component
+from ndn.security import TpmFile, KeychainSqlite3
+from ndn.app import NDNApp, InterestNack, InterestTimeout, ValidationFailure
+from ndn.app_support.security_v2 import derive_cert
+from ndn.app_support.light_versec import compile_lvs, Checker, DEFAULT_USER_FNS, lvs_validator
+from ndn.security.validator.cascade_validator import CascadeChecker, MemoryKeyStorage
+from loopback_forwarder import Forwarder, LoopbackFace, LinkConfig
+from lvs_cache import SuggestCache
+
+
+BASEDIR = os.path.dirname(os.path.abspath(__file__))
+LOCAL_DOMAIN = '/lvs-test'
+FOREIGN_DOMAIN = '/lvs-test2'
+CERT_LIFETIME = 365 * 24 * 3600
+
+
+def load_script(file_name: str):
+    #The scripts configure logging at import time, so configure it first to make that a no-op
+    logging.basicConfig(level=logging.WARNING)
+    spec = importlib.util.spec_from_file_location(file_name.replace('-', '_')[:-3], os.path.join(BASEDIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def issue_cert(keychain: KeychainSqlite3, id_name: str, issuer_id_name: str, issuer_id: str):
+    #Sign the default key of id_name with the default key of issuer_id_name and make it the default cert
+    key = keychain[id_name].default_key()
+    issuer_cert = keychain[issuer_id_name].default_key().default_cert()
+    signer = keychain.tpm.get_signer(issuer_cert.key, issuer_cert.name)
+    cert_name, cert_data = derive_cert(key.name, issuer_id, key.key_bits, signer, datetime.utcnow(), CERT_LIFETIME)
+    keychain.import_cert(key.name, cert_name, cert_data)
+    key.set_default_cert(cert_name)
+
+
+def make_keychain(base_dir: str) -> KeychainSqlite3:
+    """
+    Create a keychain with the identities listed in the README for both domains, plus the PoR of
+    the foreign trust anchor signed by the local trust anchor.
+    """
+    pib_path = os.path.join(base_dir, 'pib.db')
+    tpm_path = os.path.join(base_dir, 'ndnsec-key-file')
+    KeychainSqlite3.initialize(pib_path, 'tpm-file', tpm_path)
+    keychain = KeychainSqlite3(pib_path, TpmFile(tpm_path))
+    for domain in (LOCAL_DOMAIN, FOREIGN_DOMAIN):
+        for id_name in (domain, f'{domain}/admin/ndn', f'{domain}/author/vincent'):
+            keychain.new_identity(id_name)
+            keychain.new_key(id_name)
+        issue_cert(keychain, f'{domain}/admin/ndn', domain, domain[1:])
+        issue_cert(keychain, f'{domain}/author/vincent', f'{domain}/admin/ndn', 'ndn')
+    local_ta_key = keychain[LOCAL_DOMAIN].default_key().name
+    foreign_ta_key = keychain[FOREIGN_DOMAIN].default_key().name
+    keychain.sign_PoR(FOREIGN_DOMAIN, foreign_ta_key, local_ta_key, LOCAL_DOMAIN)
+    return keychain
+
+
+def serve_domain(app: NDNApp, keychain: KeychainSqlite3, domain: str, checker: Checker):
+    #Same routes as producer.py / producer-id.py, but any post name is accepted so requests do not aggregate
+    certs = [keychain[id_name].default_key().default_cert()
+             for id_name in (domain, f'{domain}/admin/ndn', f'{domain}/author/vincent')]
+
+    suggestions = SuggestCache(checker, keychain)
+
+    @app.route(f'{domain}/article/vincent')
+    def on_article(name, _param, _app_param):
+        data_name = name + [Component.from_version(int(time.time() * 1000))]
+        sign_cert_name = suggestions.suggest(data_name)
+        app.put_data(data_name, content=b'Hello,', freshness_period=10000, cert=sign_cert_name)
+
+    for cert in certs:
+        app.route(cert.name)(lambda _name, _param, _app_param, wire=cert.data: app.put_raw_packet(wire))
+
+
+def serve_por(app: NDNApp, keychain: KeychainSqlite3):
+    #The PoR index of controller-p.py, the keychain does not change during a run so it is not polled
+    controller_mod = load_script('controller-p.py')
+    controller_mod.serve_pors(app, controller_mod.PoRIndex(keychain, LOCAL_DOMAIN))
+
+
+class CryptoTimer:
+    """
+    Accumulate the time spent in signature verification of the cascade validator.
+    """
+    def __init__(self):
+        self.total = 0.0
+        self._orig = None
+
+    def __enter__(self):
+        self._orig = CascadeChecker._verify_sig
+
+        def timed_verify(pub_key_bits, sig_ptrs):
+            start = time.perf_counter()
+            try:
+                return self._orig(pub_key_bits, sig_ptrs)
+            finally:
+                self.total += time.perf_counter() - start
+
+        CascadeChecker._verify_sig = staticmethod(timed_verify)
+        return self
+
+    def __exit__(self, *exc):
+        CascadeChecker._verify_sig = staticmethod(self._orig)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+async def run_scenario(keychain, scenario: str, warm: bool, args) -> dict:
+    consumer_mod = load_script('consumer.py' if scenario == 'intradomain' else 'consumer-id.py')
+    producer_mod = load_script('producer.py' if scenario == 'intradomain' else 'producer-id.py')
+    domain = LOCAL_DOMAIN if scenario == 'intradomain' else FOREIGN_DOMAIN
+
+    user_fns = dict(DEFAULT_USER_FNS)
+    if hasattr(consumer_mod, 'check_PoR_domain'):
+        user_fns['$check_PoR_domain'] = consumer_mod.check_PoR_domain
+    consumer_checker = Checker(compile_lvs(consumer_mod.lvs_text), user_fns)
+    producer_checker = Checker(compile_lvs(producer_mod.lvs_text), DEFAULT_USER_FNS)
+    trust_anchor = keychain[LOCAL_DOMAIN].default_key().default_cert()
+
+    fwd = Forwarder(cs_size=args.cs_size, seed=0)
+    if scenario == 'interdomain':
+        fwd.set_link(FOREIGN_DOMAIN, LinkConfig(delay=args.interdomain_delay))
+    link = LinkConfig(delay=args.delay)
+    producer = NDNApp(face=LoopbackFace(fwd, link), keychain=keychain)
+    controller = NDNApp(face=LoopbackFace(fwd, link), keychain=keychain)
+    consumer = NDNApp(face=LoopbackFace(fwd, link), keychain=keychain)
+    serve_domain(producer, keychain, domain, producer_checker)
+    serve_por(controller, keychain)
+
+    latencies = []
+    failures = 0
+    shared_validator = lvs_validator(consumer_checker, consumer, trust_anchor.data, MemoryKeyStorage())
+
+    async def fetch(i: int, sem: aio.Semaphore):
+        nonlocal failures
+        if warm:
+            validator = shared_validator
+        else:
+            validator = lvs_validator(consumer_checker, consumer, trust_anchor.data, MemoryKeyStorage())
+
+        async def timed_validator(name, sig_ptrs):
+            start = time.perf_counter()
+            ret = await validator(name, sig_ptrs)
+            latencies.append(time.perf_counter() - start)
+            return ret
+
+        async with sem:
+            try:
+                await consumer.express_interest(f'{domain}/article/vincent/post{i}', must_be_fresh=True,
+                                                can_be_prefix=True, lifetime=6000, validator=timed_validator)
+            except (InterestNack, InterestTimeout, ValidationFailure):
+                failures += 1
+
+    result = {}
+
+    async def after_start():
+        # Let the producer and controller register their prefixes
+        await aio.sleep(0.1)
+        if warm:
+            await fetch(-1, aio.Semaphore(1))
+            latencies.clear()
+        sem = aio.Semaphore(args.concurrency)
+        interests_before = fwd.counters['n_in_interests']
+        with CryptoTimer() as crypto:
+            start = time.perf_counter()
+            await aio.gather(*(fetch(i, sem) for i in range(args.count)))
+            elapsed = time.perf_counter() - start
+        validated = args.count - failures
+        result.update({
+            'scenario': scenario,
+            'cache': 'warm' if warm else 'cold',
+            'validated': validated,
+            'failures': failures,
+            'throughput': validated / elapsed,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'interests_per_packet': (fwd.counters['n_in_interests'] - interests_before) / max(validated, 1),
+            'crypto_share': crypto.total / max(sum(latencies), 1e-9),
+        })
+        consumer.shutdown()
+        producer.shutdown()
+        controller.shutdown()
+
+    await aio.gather(producer.main_loop(), controller.main_loop(), consumer.main_loop(after_start()))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark intradomain vs interdomain validation')
+    parser.add_argument('--count', type=int, default=100, help='validated packets per run')
+    parser.add_argument('--concurrency', type=int, default=8, help='Interests in flight')
+    parser.add_argument('--delay', type=float, default=0.0, help='one-way delay of every face in ms')
+    parser.add_argument('--interdomain-delay', type=float, default=0.0,
+                        help='extra one-way delay towards the foreign domain in ms')
+    parser.add_argument('--cs-size', type=int, default=0, help='forwarder content store capacity')
+    parser.add_argument('--scenario', choices=('intradomain', 'interdomain', 'both'), default='both')
+    parser.add_argument('--json', default='', help='also write the results to this file')
+    args = parser.parse_args()
+
+    scenarios = ('intradomain', 'interdomain') if args.scenario == 'both' else (args.scenario,)
+    results = []
+    with tempfile.TemporaryDirectory() as base_dir:
+        keychain = make_keychain(base_dir)
+        for scenario in scenarios:
+            for warm in (False, True):
+                #The validator prints every step, keep that out of the report
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    results.append(aio.run(run_scenario(keychain, scenario, warm, args)))
+        keychain.shutdown()
+
+    header = f'{"scenario":<12} {"cache":<5} {"ok":>6} {"fail":>5} {"pkt/s":>9} {"p50 ms":>8} {"p99 ms":>8} ' \
+             f'{"Int/pkt":>8} {"crypto":>7}'
+    print(header)
+    for r in results:
+        print(f'{r["scenario"]:<12} {r["cache"]:<5} {r["validated"]:>6} {r["failures"]:>5} '
+              f'{r["throughput"]:>9.1f} {r["p50_ms"]:>8.2f} {r["p99_ms"]:>8.2f} '
+              f'{r["interests_per_packet"]:>8.2f} {r["crypto_share"]:>7.1%}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'python': sys.version, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#[Project code]:
+#Memory benchmark of the PIB records: holding many Certificates loaded from the keychain
+#as the previous dict-based records (data loaded eagerly) and as the __slots__ records, before and after
+#their data is accessed.
+#
+#   python bench_pib_memory.py --certs 100000
+
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from ndn.encoding import Name
+from ndn.security import TpmFile, KeychainSqlite3, DigestSha256Signer
+from ndn.security.keychain.keychain_sqlite3 import Certificate
+from ndn.app_support.security_v2 import derive_cert
+
+
+class DictCertificate:
+    #Same layout as the Certificate record before it used __slots__
+    def __init__(self, row_id, key, name, data, is_default):
+        self.id = row_id
+        self._key = key
+        self._name = name
+        self._data = data
+        self.is_default = is_default
+
+
+def make_keychain(base_dir: str, n_certs: int) -> KeychainSqlite3:
+    pib_path = os.path.join(base_dir, 'pib.db')
+    tpm_path = os.path.join(base_dir, 'ndnsec-key-file')
+    KeychainSqlite3.initialize(pib_path, 'tpm-file', tpm_path)
+    keychain = KeychainSqlite3(pib_path, TpmFile(tpm_path))
+    key = keychain.new_keys([('/federation/member', {})])[0]
+    #Only the size of the records matters here, a digest signature keeps generating 100k certificates fast
+    signer = DigestSha256Signer()
+    certs = []
+    for i in range(n_certs):
+        cert_name, cert_data = derive_cert(key.name, f'issuer{i}', key.key_bits, signer, datetime.utcnow(), 86400)
+        certs.append((key.name, cert_name, cert_data))
+    keychain.import_certs(certs)
+    return keychain
+
+
+def measure(load) -> tuple[int, float, list]:
+    #Return the memory held by the records returned by load, and the time it took
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = load()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, elapsed, records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the memory held by PIB Certificate records')
+    parser.add_argument('--certs', type=int, default=100000, help='number of certificates to hold')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        keychain = make_keychain(base_dir, args.certs)
+        key = keychain['/federation/member'].default_key()
+        key_name = key.name
+
+        def load_dict():
+            cursor = keychain.conn.execute('SELECT id, certificate_name, certificate_data, is_default '
+                                           'FROM certificates WHERE key_id=?', (key.row_id,))
+            ret = [DictCertificate(row_id, key_name, cert_name, cert_data, is_default != 0)
+                   for row_id, cert_name, cert_data, is_default in cursor]
+            cursor.close()
+            return ret
+
+        def load_slots():
+            return [Certificate(row.row_id, key_name, row.name, is_default=row.is_default, pib=keychain)
+                    for row in key.rows()]
+
+        def read_all():
+            for record in records:
+                _ = record.data
+
+        results = {}
+        results['dict, eager data'] = measure(load_dict)[:2]
+        size, elapsed, records = measure(load_slots)
+        results['slots, lazy data'] = (size, elapsed)
+        #Loaded data stays attached to the records, count it on top
+        read_size, read_elapsed, _ = measure(read_all)
+        results['slots, data read'] = (size + read_size, elapsed + read_elapsed)
+        keychain.shutdown()
+
+    n_records = len(records)
+    print(f'{"records":<18} {"MiB":>8} {"B/record":>9} {"load s":>7}')
+    for mode, (size, elapsed) in results.items():
+        print(f'{mode:<18} {size / 2**20:>8.1f} {size / n_records:>9.0f} {elapsed:>7.2f}')
+    print(f'Name of one record: {Name.to_str(records[0].name)}')
+
+
+if __name__ == '__main__':
+    main()
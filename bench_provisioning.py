@@ -0,0 +1,83 @@
+#[Project code]:
+#Benchmark of federation provisioning: storing many certificates in the PIB
+#one import_cert call (one commit) at a time, compared with a single import_certs transaction.
+#
+#   python bench_provisioning.py --certs 10000 --keys 100
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from ndn.security import TpmFile, KeychainSqlite3
+from ndn.app_support.security_v2 import derive_cert
+
+
+def make_keychain(base_dir: str, n_keys: int) -> tuple[KeychainSqlite3, list]:
+    pib_path = os.path.join(base_dir, 'pib.db')
+    tpm_path = os.path.join(base_dir, 'ndnsec-key-file')
+    KeychainSqlite3.initialize(pib_path, 'tpm-file', tpm_path)
+    keychain = KeychainSqlite3(pib_path, TpmFile(tpm_path))
+    keys = keychain.new_keys([(f'/federation/domain{i}', {}) for i in range(n_keys)])
+    return keychain, keys
+
+
+def cert_summary(keychain: KeychainSqlite3) -> tuple:
+    cursor = keychain.conn.execute('SELECT count(*), sum(is_default) FROM certificates')
+    ret = cursor.fetchone()
+    cursor.close()
+    return ret
+
+
+def make_certs(keychain: KeychainSqlite3, keys: list, n_certs: int) -> list:
+    #Signing is the same for both paths, so it is done once outside of the measurement
+    issuer = keys[0]
+    signer = keychain.tpm.get_signer(issuer.name, issuer.default_cert().name)
+    ret = []
+    for i in range(n_certs):
+        key = keys[i % len(keys)]
+        cert_name, cert_data = derive_cert(key.name, f'issuer{i}', key.key_bits, signer, datetime.utcnow(), 86400)
+        ret.append((key.name, cert_name, cert_data))
+    return ret
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark bulk certificate provisioning')
+    parser.add_argument('--certs', type=int, default=10000, help='number of certificates to import')
+    parser.add_argument('--keys', type=int, default=100, help='number of keys the certificates are spread over')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        start = time.perf_counter()
+        keychain, keys = make_keychain(base_dir, args.keys)
+        print(f'new_keys: {args.keys} keys in {time.perf_counter() - start:.3f}s')
+        certs = make_certs(keychain, keys, args.certs)
+        keychain.shutdown()
+
+        results = {}
+        summaries = {}
+        for mode in ('per-call', 'bulk'):
+            #Each path starts from a copy of the same PIB
+            pib_path = os.path.join(base_dir, f'{mode}.db')
+            shutil.copy(os.path.join(base_dir, 'pib.db'), pib_path)
+            keychain = KeychainSqlite3(pib_path, TpmFile(os.path.join(base_dir, 'ndnsec-key-file')))
+            start = time.perf_counter()
+            if mode == 'bulk':
+                keychain.import_certs(certs)
+            else:
+                for key_name, cert_name, cert_data in certs:
+                    keychain.import_cert(key_name, cert_name, cert_data)
+            results[mode] = time.perf_counter() - start
+            summaries[mode] = cert_summary(keychain)
+            keychain.shutdown()
+        #Both paths must store the same certificates and pick the same number of defaults
+        assert summaries['per-call'] == summaries['bulk'], summaries
+
+    for mode, elapsed in results.items():
+        print(f'{mode:<9} {args.certs} certs in {elapsed:8.3f}s  ({args.certs / elapsed:9.0f} certs/s)')
+    print(f'speedup   {results["per-call"] / results["bulk"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
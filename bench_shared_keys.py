@@ -0,0 +1,157 @@
+#[Project code]:
+#Multi-worker benchmark of the shared verified-key storage: several consumer processes on one host validate
+#interdomain (or intradomain) Data, each with a private MemoryKeyStorage or all with one SharedKeyStorage.
+#Reports, per number of workers, the Interests seen by the forwarder and the signature verifications done by
+#all the workers together. Workers start --stagger seconds apart, as when a fleet is scaled up or restarted;
+#with --stagger 0 they all fetch the same chains at once and sharing cannot help.
+#
+#   python bench_shared_keys.py --workers 1 2 4 8 --count 20 --stagger 0.2
+
+import argparse
+import asyncio as aio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from ndn.app import NDNApp, InterestNack, InterestTimeout, ValidationFailure
+from ndn.app_support.light_versec import compile_lvs, Checker, DEFAULT_USER_FNS, lvs_validator
+from ndn.security import TpmFile, KeychainSqlite3
+from ndn.security.validator.cascade_validator import CascadeChecker, MemoryKeyStorage
+from ndn.transport.stream_face import UnixFace
+from bench_interdomain import make_keychain, load_script, serve_domain, serve_por, LOCAL_DOMAIN, FOREIGN_DOMAIN
+from loopback_forwarder import Forwarder, LoopbackFace
+from shared_key_storage import SharedKeyStorage
+
+
+def run_worker(args):
+    #One consumer process, prints its result as a JSON line
+    consumer_mod = load_script('consumer.py' if args.scenario == 'intradomain' else 'consumer-id.py')
+    user_fns = dict(DEFAULT_USER_FNS)
+    if hasattr(consumer_mod, 'check_PoR_domain'):
+        user_fns['$check_PoR_domain'] = consumer_mod.check_PoR_domain
+    checker = Checker(compile_lvs(consumer_mod.lvs_text), user_fns)
+    keychain = KeychainSqlite3(args.pib, TpmFile(args.tpm))
+    trust_anchor = keychain[LOCAL_DOMAIN].default_key().default_cert()
+    storage = SharedKeyStorage(args.shared) if args.shared else MemoryKeyStorage()
+    domain = LOCAL_DOMAIN if args.scenario == 'intradomain' else FOREIGN_DOMAIN
+
+    verifies = 0
+    orig_verify = CascadeChecker._verify_sig
+
+    def counted_verify(pub_key_bits, sig_ptrs):
+        nonlocal verifies
+        verifies += 1
+        return orig_verify(pub_key_bits, sig_ptrs)
+
+    CascadeChecker._verify_sig = staticmethod(counted_verify)
+    app = NDNApp(face=UnixFace(args.socket), keychain=keychain)
+    result = {'validated': 0, 'failures': 0}
+
+    async def fetch_all():
+        validator = lvs_validator(checker, app, trust_anchor.data, storage)
+        await aio.sleep(args.worker * args.stagger)
+        start = time.perf_counter()
+        for i in range(args.count):
+            try:
+                await app.express_interest(f'{domain}/article/vincent/w{args.worker}p{i}', must_be_fresh=True,
+                                           can_be_prefix=True, lifetime=6000, validator=validator)
+                result['validated'] += 1
+            except (InterestNack, InterestTimeout, ValidationFailure):
+                result['failures'] += 1
+        result['elapsed'] = time.perf_counter() - start
+        app.shutdown()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        app.run_forever(fetch_all())
+    result['verifies'] = verifies
+    print(json.dumps(result))
+    keychain.shutdown()
+
+
+async def run_round(keychain, base_dir: str, n_workers: int, shared: bool, args) -> dict:
+    producer_mod = load_script('producer.py' if args.scenario == 'intradomain' else 'producer-id.py')
+    domain = LOCAL_DOMAIN if args.scenario == 'intradomain' else FOREIGN_DOMAIN
+    fwd = Forwarder()
+    socket_path = os.path.join(base_dir, 'fwd.sock')
+    server = await fwd.serve_unix(socket_path)
+    producer = NDNApp(face=LoopbackFace(fwd), keychain=keychain)
+    controller = NDNApp(face=LoopbackFace(fwd), keychain=keychain)
+    serve_domain(producer, keychain, domain, Checker(compile_lvs(producer_mod.lvs_text), DEFAULT_USER_FNS))
+    serve_por(controller, keychain)
+    shared_path = os.path.join(base_dir, f'keys-{n_workers}') if shared else ''
+    result = {}
+
+    async def workers():
+        await aio.sleep(0.1)
+        #Leave out the prefix registrations of the producer and the controller
+        interests_before = fwd.counters['n_in_interests']
+        procs = []
+        for worker in range(n_workers):
+            procs.append(await aio.create_subprocess_exec(
+                sys.executable, os.path.abspath(__file__), '--worker', str(worker), '--socket', socket_path,
+                '--pib', os.path.join(base_dir, 'pib.db'), '--tpm', os.path.join(base_dir, 'ndnsec-key-file'),
+                '--shared', shared_path, '--scenario', args.scenario, '--count', str(args.count),
+                '--stagger', str(args.stagger),
+                stdout=aio.subprocess.PIPE))
+        outputs = [json.loads((await proc.communicate())[0].splitlines()[-1]) for proc in procs]
+        validated = sum(o['validated'] for o in outputs)
+        interests = fwd.counters['n_in_interests'] - interests_before
+        result.update({
+            'workers': n_workers,
+            'storage': 'shared' if shared else 'private',
+            'validated': validated,
+            'failures': sum(o['failures'] for o in outputs),
+            'interests': interests,
+            'verifies': sum(o['verifies'] for o in outputs),
+            'interests_per_packet': interests / max(validated, 1),
+            'verifies_per_packet': sum(o['verifies'] for o in outputs) / max(validated, 1),
+        })
+        producer.shutdown()
+        controller.shutdown()
+
+    await aio.gather(producer.main_loop(), controller.main_loop(workers()))
+    server.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark private vs shared verified-key storage across workers')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='numbers of worker processes')
+    parser.add_argument('--count', type=int, default=20, help='packets validated by each worker')
+    parser.add_argument('--scenario', choices=('intradomain', 'interdomain'), default='interdomain')
+    parser.add_argument('--stagger', type=float, default=0.2, help='seconds between the starts of the workers')
+    parser.add_argument('--json', default='', help='also write the results to this file')
+    parser.add_argument('--worker', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--socket', help=argparse.SUPPRESS)
+    parser.add_argument('--pib', help=argparse.SUPPRESS)
+    parser.add_argument('--tpm', help=argparse.SUPPRESS)
+    parser.add_argument('--shared', default='', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(args)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as base_dir:
+        keychain = make_keychain(base_dir)
+        for n_workers in args.workers:
+            for shared in (False, True):
+                with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    results.append(aio.run(run_round(keychain, base_dir, n_workers, shared, args)))
+        keychain.shutdown()
+
+    print(f'{"workers":>7} {"storage":<8} {"ok":>5} {"fail":>5} {"Interests":>10} {"verifies":>9} '
+          f'{"Int/pkt":>8} {"ver/pkt":>8}')
+    for r in results:
+        print(f'{r["workers"]:>7} {r["storage"]:<8} {r["validated"]:>5} {r["failures"]:>5} {r["interests"]:>10} '
+              f'{r["verifies"]:>9} {r["interests_per_packet"]:>8.2f} {r["verifies_per_packet"]:>8.2f}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'python': sys.version, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
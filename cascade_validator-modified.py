@@ -16,13 +16,25 @@
 # limitations under the License.
 # -----------------------------------------------------------------------------
 import abc
+import asyncio
+import hashlib
+import heapq
 import logging
-from typing import Optional, Coroutine, Any
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Optional, Coroutine, Any, Iterable, Union, TYPE_CHECKING
 from Cryptodome.PublicKey import ECC, RSA
-from ...encoding import FormalName, BinaryStr, SignatureType, Name, parse_data, SignaturePtrs
-from ...app import NDNApp, Validator, ValidationFailure, InterestTimeout, InterestNack
+from ...encoding import FormalName, BinaryStr, SignatureType, Name, Component, NonStrictName, parse_data, \
+    SignaturePtrs, DecodeError, TlvModel, UintField, BytesField, RepeatedField
+from ...app import NDNApp, Validator, ValidationFailure, InterestTimeout, InterestNack, InterestCanceled
+from ...app_support.security_v2 import CertificateView
+from ..keychain import Keychain
 from .known_key_validator import verify_rsa, verify_hmac, verify_ecdsa
-from ndn.app_support.light_versec import Checker
+if TYPE_CHECKING:
+    # light_versec's validator imports this module
+    from ...app_support.light_versec import Checker
 
 class PublicKeyStorage(abc.ABC):
     @abc.abstractmethod
@@ -30,37 +42,503 @@ class PublicKeyStorage(abc.ABC):
         pass
 
     @abc.abstractmethod
-    def save(self, name: FormalName, key_bits: bytes):
+    def save(self, name: FormalName, key_bits: bytes, not_after: Optional[int] = None):
+        """
+        :param not_after: the end of the validity period of the certificate, in seconds since the epoch.
+            The key must not be loaded after that time.
+        """
         pass
 
+    def load_many(self, names: list[FormalName]) -> list[Optional[bytes]]:
+        return [self.load(name) for name in names]
+
+    def invalidate(self, name: FormalName):
+        """
+        Drop the key saved under a Name, if any.
+        """
+        pass
+
+
+class AsyncPublicKeyStorage(abc.ABC):
+    """
+    Key storage whose operations may wait, e.g. on disk, a PIB or a shared cache daemon,
+    without blocking the event loop of the validator.
+    """
+    @abc.abstractmethod
+    async def load(self, name: FormalName) -> Optional[bytes]:
+        pass
+
+    @abc.abstractmethod
+    async def save(self, name: FormalName, key_bits: bytes, not_after: Optional[int] = None):
+        """
+        :param not_after: the end of the validity period of the certificate, in seconds since the epoch.
+            The key must not be loaded after that time.
+        """
+        pass
+
+    async def load_many(self, names: list[FormalName]) -> list[Optional[bytes]]:
+        """
+        Load several keys at once. Storages with a round trip per operation should override it.
+        """
+        return list(await asyncio.gather(*(self.load(name) for name in names)))
+
+    @abc.abstractmethod
+    async def invalidate(self, name: FormalName):
+        """
+        Drop the key saved under a Name, if any.
+        """
+        pass
+
+
+class SyncStorageAdapter(AsyncPublicKeyStorage):
+    """
+    Present a :class:`PublicKeyStorage` as an :class:`AsyncPublicKeyStorage`.
+
+    :param storage: the synchronous storage.
+    :param executor: run the operations in this executor, for storages that block.
+        By default they run inline, which suits in-memory storages.
+    """
+    storage: PublicKeyStorage
+    executor: Optional[Executor]
+
+    def __init__(self, storage: PublicKeyStorage, executor: Optional[Executor] = None):
+        self.storage = storage
+        self.executor = executor
+
+    async def _call(self, fn, *args):
+        if self.executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def load(self, name: FormalName) -> Optional[bytes]:
+        return await self._call(self.storage.load, name)
+
+    async def save(self, name: FormalName, key_bits: bytes, not_after: Optional[int] = None):
+        return await self._call(self.storage.save, name, key_bits, not_after)
+
+    async def load_many(self, names: list[FormalName]) -> list[Optional[bytes]]:
+        return await self._call(self.storage.load_many, names)
+
+    async def invalidate(self, name: FormalName):
+        return await self._call(self.storage.invalidate, name)
+
+
+def as_async_storage(storage: Union[PublicKeyStorage, AsyncPublicKeyStorage]) -> AsyncPublicKeyStorage:
+    """
+    Return an asynchronous storage, wrapping synchronous ones in a :class:`SyncStorageAdapter`.
+    """
+    if isinstance(storage, AsyncPublicKeyStorage):
+        return storage
+    return SyncStorageAdapter(storage)
+
 
 class EmptyKeyStorage(PublicKeyStorage):
     def load(self, name: FormalName) -> Optional[bytes]:
         return None
 
-    def save(self, name: FormalName, key_bits: bytes):
+    def save(self, name: FormalName, key_bits: bytes, not_after: Optional[int] = None):
         return
 
 
 class MemoryKeyStorage(PublicKeyStorage):
     _cache: dict[bytes, bytes]
+    _not_after: dict[bytes, int]
+    _expiry: list[tuple[int, bytes]]
 
     def __init__(self):
         self._cache = {}
+        self._not_after = {}
+        # Min-heap of (not_after, name), entries replaced by a later save are skipped when popped
+        self._expiry = []
+
+    def evict_expired(self, now: Optional[float] = None):
+        """
+        Drop the keys whose certificate expired.
+        """
+        now = time.time() if now is None else now
+        while self._expiry and self._expiry[0][0] < now:
+            not_after, name = heapq.heappop(self._expiry)
+            if self._not_after.get(name) == not_after:
+                del self._not_after[name]
+                self._cache.pop(name, None)
 
     def load(self, name: FormalName) -> Optional[bytes]:
+        self.evict_expired()
         return self._cache.get(Name.to_bytes(name), None)
 
-    def save(self, name: FormalName, key_bits: bytes):
-        self._cache[Name.to_bytes(name)] = key_bits
+    def save(self, name: FormalName, key_bits: bytes, not_after: Optional[int] = None):
+        name = Name.to_bytes(name)
+        self._cache[name] = key_bits
+        if not_after is None:
+            self._not_after.pop(name, None)
+        else:
+            self._not_after[name] = not_after
+            heapq.heappush(self._expiry, (not_after, name))
+
+    def invalidate(self, name: FormalName):
+        name = Name.to_bytes(name)
+        self._cache.pop(name, None)
+        # The heap entry is skipped when popped
+        self._not_after.pop(name, None)
+
+
+def _implicit_digest(name: FormalName) -> Optional[bytes]:
+    # The value of the implicit SHA-256 digest component ending a Name, if any
+    if name and Component.get_type(name[-1]) == Component.TYPE_IMPLICIT_SHA256:
+        return bytes(Component.get_value(name[-1]))
+    return None
+
+
+async def _accept_unverified(_name: FormalName, _sig_ptrs: SignaturePtrs) -> bool:
+    # Used to fetch certificates whose validation is done by CascadeChecker itself
+    return True
+
+
+class CertificatePins:
+    """
+    SHA-256 digests of the full wire encoding of certificates known to be valid, i.e. their implicit digests.
+    A fetched certificate whose digest is known is accepted after hashing, without validating its chain.
+
+    :param pinned: digests, or Names ending with an implicit digest component (``.../sha256digest=...``),
+        of certificates trusted by configuration, e.g. anchors and PoRs.
+    :param max_learned: the number of digests of validated certificates that are remembered.
+    """
+    pinned: set[bytes]
+    max_learned: int
+
+    def __init__(self, pinned: Iterable[Union[bytes, NonStrictName]] = (), max_learned: int = 4096):
+        self.pinned = set()
+        self.max_learned = max_learned
+        self._learned = OrderedDict()
+        for item in pinned:
+            self.pin(item)
+
+    @staticmethod
+    def digest(wire: BinaryStr) -> bytes:
+        return hashlib.sha256(wire).digest()
+
+    def pin(self, item: Union[bytes, NonStrictName]):
+        """
+        Trust a certificate by its digest, or by a Name ending with its implicit digest.
+        """
+        if isinstance(item, (bytes, bytearray, memoryview)) and len(item) == 32:
+            self.pinned.add(bytes(item))
+            return
+        digest = _implicit_digest(Name.normalize(item))
+        if digest is None:
+            raise ValueError(f'{item} does not end with an implicit digest')
+        self.pinned.add(digest)
+
+    def learn(self, digest: bytes, name: Optional[bytes] = None):
+        """
+        Remember the digest of a certificate that passed validation.
+
+        :param name: the encoded Name of the certificate, used by :meth:`forget`.
+        """
+        self._learned[digest] = name
+        self._learned.move_to_end(digest)
+        while len(self._learned) > self.max_learned:
+            self._learned.popitem(last=False)
+
+    def forget(self, names: set[bytes]):
+        """
+        Drop the learned digests of certificates by encoded Name. Pinned digests are kept.
+        """
+        for digest in [digest for digest, name in self._learned.items() if name in names]:
+            del self._learned[digest]
+
+    def __contains__(self, digest: bytes) -> bool:
+        if digest in self.pinned:
+            return True
+        if digest in self._learned:
+            self._learned.move_to_end(digest)
+            return True
+        return False
+
+
+class LocalPoRStore:
+    """
+    PoRs read from a keychain shared with the domain controller, i.e. the PIB it stores PoRs in or a snapshot of it,
+    so that consumers on the same host do not fetch them. The latest PoR for a
+    (foreign anchor key Name, local domain Name) pair is looked up once and indexed in memory.
+
+    :param keychain: the keychain, e.g. a :class:`KeychainSqlite3` or a ``SnapshotKeychain``.
+    """
+    keychain: Keychain
+
+    def __init__(self, keychain: Keychain):
+        self.keychain = keychain
+        self._index = {}
+
+    def _lookup(self, prefix: FormalName) -> Optional[BinaryStr]:
+        latest_cert = getattr(self.keychain, 'latest_cert', None)
+        if latest_cert is not None:
+            try:
+                return latest_cert(prefix).data
+            except KeyError:
+                return None
+        # The PoR is a certificate of the foreign anchor key: identity/KEY/key-id/domain/version
+        try:
+            key = self.keychain[prefix[:-3]][prefix[:-1]]
+        except KeyError:
+            return None
+        versions = {}
+        for cert_name in key:
+            if Name.is_prefix(prefix, cert_name) and len(cert_name) == len(prefix) + 1:
+                try:
+                    versions[Component.to_number(cert_name[-1])] = cert_name
+                except (ValueError, DecodeError):
+                    continue
+        return key[versions[max(versions)]].data if versions else None
+
+    def get(self, foreign_key_name: NonStrictName, local_domain: NonStrictName) -> Optional[BinaryStr]:
+        """
+        The latest PoR of a foreign anchor key for a local domain, None if the keychain has none.
+        """
+        prefix = Name.normalize(foreign_key_name) + [Name.to_bytes(local_domain)]
+        index_key = Name.to_bytes(prefix)
+        wire = self._index.get(index_key)
+        if wire is None:
+            wire = self._lookup(prefix)
+            if wire is not None:
+                self._index[index_key] = wire
+        return wire
+
+    def forget(self, foreign_key_name: NonStrictName, local_domain: NonStrictName):
+        """
+        Drop an indexed PoR, e.g. after it expired, so that the keychain is looked up again.
+        """
+        self._index.pop(Name.to_bytes(Name.normalize(foreign_key_name) + [Name.to_bytes(local_domain)]), None)
+
+
+REVOCATION_COMPONENT = Component.from_str('REVOKED')
+DELTA_COMPONENT = Component.from_str('32=delta')
+
+
+class RevocationTypeNumber:
+    FILTER_VERSION = 0xD1
+    BASE_VERSION = 0xD2
+    SEED = 0xD3
+    HASH_COUNT = 0xD4
+    FILTER_BITS = 0xD5
+    REVOKED_DIGEST = 0xD6
+
+
+class RevocationUpdate(TlvModel):
+    """
+    The content of a revocation filter Data. A full filter carries the seed, hash count and bits of the filter.
+    A delta carries the version it applies to and the digests revoked since then. An update with neither is a
+    hint that no delta can be made from the version asked for, the full filter has to be fetched.
+    """
+    version = UintField(RevocationTypeNumber.FILTER_VERSION)
+    base_version = UintField(RevocationTypeNumber.BASE_VERSION)
+    seed = BytesField(RevocationTypeNumber.SEED)
+    hash_count = UintField(RevocationTypeNumber.HASH_COUNT)
+    bits = BytesField(RevocationTypeNumber.FILTER_BITS)
+    digests = RepeatedField(BytesField(RevocationTypeNumber.REVOKED_DIGEST))
+
+
+class RevocationFilter:
+    """
+    A Bloom filter of the digests of revoked certificates. A lookup hashes the digest once, whatever the number of
+    revoked certificates. The publisher picks a seed for which no certificate it knows to be valid is a false
+    positive, so a match is taken as a revocation.
+
+    :param size: the number of bits.
+    :param hash_count: the number of bits set per digest.
+    :param seed: prepended to the digests before hashing them.
+    """
+    size: int
+    hash_count: int
+    seed: bytes
+
+    def __init__(self, size: int, hash_count: int, seed: bytes, bits: Optional[BinaryStr] = None):
+        if size <= 0 or not 0 < hash_count <= 64 or len(seed) > 64:
+            raise ValueError('Invalid revocation filter parameters')
+        self.size = size
+        self.hash_count = hash_count
+        self.seed = bytes(seed)
+        self.bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+        if len(self.bits) != (size + 7) // 8:
+            raise ValueError('The revocation filter bits do not match its size')
+
+    @classmethod
+    def for_capacity(cls, capacity: int, seed: bytes, false_positive_rate: float = 1e-6) -> 'RevocationFilter':
+        """
+        An empty filter sized for ``capacity`` digests at the given false positive rate.
+        """
+        ln2 = math.log(2)
+        # Whole bytes, the size is sent as the length of the bits
+        size = max(1024, math.ceil(-capacity * math.log(false_positive_rate) / ln2 ** 2 / 8) * 8)
+        return cls(size, max(1, round(size / max(capacity, 1) * ln2)), seed)
+
+    @classmethod
+    def from_update(cls, update: RevocationUpdate) -> 'RevocationFilter':
+        if update.bits is None or update.hash_count is None or update.seed is None:
+            raise ValueError('Not a full revocation filter')
+        return cls(len(update.bits) * 8, update.hash_count, update.seed, update.bits)
+
+    def _positions(self, digest: bytes) -> Iterable[int]:
+        # One 32-bit position per hash, all taken from a single SHAKE-128 output
+        h = hashlib.shake_128(self.seed + digest).digest(4 * self.hash_count)
+        return (int.from_bytes(h[i:i + 4], 'little') % self.size for i in range(0, len(h), 4))
+
+    def add(self, digest: bytes):
+        for pos in self._positions(digest):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest: bytes) -> bool:
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+
+class RevocationFilters:
+    """
+    The revocation filters of the local domain and of the federated domains, fetched from their controllers
+    under ``<domain>/REVOKED`` and refreshed in the background when their freshness period runs out. After the
+    first full filter, only the digests revoked since the version held are transferred.
+    Checking a certificate costs one hash and no network access. A certificate is only checked against the filter
+    of the domain that issued it, i.e. the watched domain its key locator is under. A PoR is issued, and revoked,
+    by the local domain. Until the first filter of a domain arrives, nothing is revoked for it, and a filter that
+    cannot be refreshed is kept.
+
+    :param app: the app fetching the filters.
+    :param domains: the domains whose filters are fetched.
+    :param retry: seconds before retrying a failed fetch.
+    :ivar updated: the number of filter versions applied.
+    """
+    app: NDNApp
+    domains: list[FormalName]
+    retry: float
+
+    def __init__(self, app: NDNApp, domains: Iterable[NonStrictName], retry: float = 10.0,
+                 lifetime: int = 4000):
+        self.app = app
+        self.domains = [Name.normalize(domain) for domain in domains]
+        self.retry = retry
+        self.lifetime = lifetime
+        self.updated = 0
+        # Encoded domain Name -> (version, filter)
+        self._filters = {}
+        # Encoded domain Names whose next fetch asks for a full filter
+        self._resync = set()
+        self._checkers = []
+        self._tasks = []
+
+    def attach(self, checker: 'CascadeChecker'):
+        """
+        Drop the revoked keys from the cache of a checker on every update, and start the refresh if not running.
+        """
+        if checker not in self._checkers:
+            self._checkers.append(checker)
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._refresh(domain)) for domain in self.domains]
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def version(self, domain: NonStrictName) -> int:
+        entry = self._filters.get(Name.to_bytes(domain))
+        return entry[0] if entry is not None else 0
+
+    def domain_of(self, name: NonStrictName) -> Optional[bytes]:
+        """
+        The encoded Name of the watched domain a Name is under, the longest one if several, None if none.
+        """
+        name = Name.normalize(name)
+        matches = [domain for domain in self.domains if Name.is_prefix(domain, name)]
+        return Name.to_bytes(max(matches, key=len)) if matches else None
+
+    def revoked(self, digest: bytes, domain: Optional[bytes]) -> bool:
+        """
+        Whether the filter of a domain, given by its encoded Name, revokes a certificate digest.
+        """
+        entry = self._filters.get(domain) if domain is not None else None
+        return entry is not None and digest in entry[1]
+
+    def _apply(self, domain: bytes, update: RevocationUpdate) -> bool:
+        # Return whether the update changed the filter
+        current = self._filters.get(domain)
+        if update.base_version is None:
+            self._resync.discard(domain)
+        if current is not None and update.version <= current[0]:
+            return False
+        if update.base_version is None:
+            self._filters[domain] = (update.version, RevocationFilter.from_update(update))
+        elif current is not None and update.base_version == current[0]:
+            revoked = current[1]
+            for digest in update.digests or ():
+                revoked.add(bytes(digest))
+            self._filters[domain] = (update.version, revoked)
+        else:
+            # Keep the filter held meanwhile
+            self._resync.add(domain)
+            raise ValueError(f'Delta from version {update.base_version} does not apply')
+        self.updated += 1
+        return True
+
+    async def update(self, domain: NonStrictName) -> float:
+        """
+        Fetch the changes of the filter of a domain since the version held, and drop the keys they revoke.
+
+        :return: the freshness period of the response, in seconds.
+        :raises ValueError: the response is not a valid revocation filter of the domain.
+        """
+        domain = Name.normalize(domain)
+        encoded_domain = Name.to_bytes(domain)
+        checker = self._checkers[0]
+        have = 0 if encoded_domain in self._resync else self.version(domain)
+        name = domain + [REVOCATION_COMPONENT, DELTA_COMPONENT, Component.from_version(have)]
+        _, meta_info, content, wire = await self.app.express_interest(
+            name, need_raw_packet=True, validator=_accept_unverified, can_be_prefix=True, must_be_fresh=True,
+            lifetime=self.lifetime)
+        data_name, _, _, sig_ptrs = parse_data(wire)
+        try:
+            update = RevocationUpdate.parse(content)
+        except (DecodeError, IndexError, TypeError) as e:
+            raise ValueError(f'Malformed revocation filter {Name.to_str(data_name)}') from e
+        if update.version is None:
+            raise ValueError(f'Revocation filter {Name.to_str(data_name)} has no version')
+        if update.base_version is None and update.bits is None:
+            # The hint is not signed by the controller, it can only make us fetch the full filter
+            if have == 0:
+                raise ValueError(f'No full revocation filter in {Name.to_str(data_name)}')
+            self._resync.add(encoded_domain)
+            return 0
+        if not await checker.validate_revocations(domain, data_name, sig_ptrs):
+            raise ValueError(f'Revocation filter {Name.to_str(data_name)} failed validation')
+        if self._apply(encoded_domain, update):
+            logging.info(f'Revocation filter of {Name.to_str(domain)} is at version {update.version}')
+            for attached in self._checkers:
+                await attached.drop_revoked(encoded_domain)
+        freshness = meta_info.freshness_period if meta_info and meta_info.freshness_period else None
+        return freshness / 1000 if freshness else self.retry
+
+    async def _refresh(self, domain: FormalName):
+        while True:
+            try:
+                delay = await self.update(domain)
+            except (ValueError, ValidationFailure, InterestTimeout, InterestNack, InterestCanceled) as e:
+                logging.warning(f'Cannot refresh the revocation filter of {Name.to_str(domain)}: {e}')
+                delay = self.retry
+            await asyncio.sleep(delay)
 
 
 class CascadeChecker:
     app: NDNApp
     next_level: Validator
-    storage: Optional[PublicKeyStorage]
+    storage: AsyncPublicKeyStorage
+    trust_anchor: bytes
     anchor_key: bytes
     anchor_name: FormalName
+    revocation: Optional[RevocationFilters]
+    # Storage key -> (certificate Name, Name of its signer, key locator it is used for, all encoded, and NotAfter)
+    _chains: dict[bytes, tuple[bytes, bytes, bytes, int]]
+    # Storage key -> (certificate digest, key locator it is used for, watched domain that issued the certificate)
+    # of the keys this checker cached
+    _digests: dict[bytes, tuple[bytes, bytes, Optional[bytes]]]
 
     @staticmethod
     def _verify_sig(pub_key_bits, sig_ptrs) -> bool:
@@ -76,16 +554,283 @@ class CascadeChecker:
             return False
         
 
-    def __init__(self, app: NDNApp, trust_anchor: BinaryStr, storage: PublicKeyStorage = MemoryKeyStorage(), checker: Optional[Checker] = None):
+    def __init__(self, app: NDNApp, trust_anchor: BinaryStr,
+                 storage: Union[PublicKeyStorage, AsyncPublicKeyStorage] = MemoryKeyStorage(),
+                 checker: Optional['Checker'] = None, pins: Optional[CertificatePins] = None,
+                 por_store: Optional[LocalPoRStore] = None, revocation: Optional[RevocationFilters] = None):
         self.app = app
         self.next_level = self
-        self.storage = storage
+        self.storage = as_async_storage(storage)
         self.lvs_checker = checker #Added for interdomain PoR
+        self.pins = pins if pins is not None else CertificatePins()
+        self.por_store = por_store
+        #Certificates revoked by their domain are rejected, and the keys cached from them dropped
+        self.revocation = revocation
+        self._set_anchor(trust_anchor)
+        #Bumped by reload(), results of validations started before it are not cached
+        self._generation = 0
+        self._chains = {}
+        #(NotAfter, storage key) of the entries of _chains, entries are stale if the key was saved again since
+        self._expiry = []
+        self._digests = {}
+        #Key lookups of concurrent validations, loaded together by _flush_loads unless the storage answers inline
+        self._batch_loads = not (isinstance(self.storage, SyncStorageAdapter) and self.storage.executor is None)
+        self._pending_loads = []
+        self._flush_task = None
+
+    def _set_anchor(self, trust_anchor: BinaryStr):
         cert_name, _, key_bits, sig_ptrs = parse_data(trust_anchor)
+        if not self._verify_sig(bytes(key_bits), sig_ptrs):
+            raise ValueError('Trust anchor is not properly self-signed')
+        self.trust_anchor = bytes(trust_anchor)
         self.anchor_name = [bytes(c) for c in cert_name]  # Copy the name in case
         self.anchor_key = bytes(key_bits)
-        if not self._verify_sig(self.anchor_key, sig_ptrs):
-            raise ValueError('Trust anchor is not properly self-signed')
+        #The anchor is configured locally, so a missing ValidityPeriod is not an error for it
+        self.anchor_window = CertificateView(trust_anchor).validity_window
+
+    async def reload(self, checker: Optional['Checker'] = None, trust_anchor: Optional[BinaryStr] = None) -> int:
+        """
+        Swap in a new LVS checker and/or trust anchor without a restart.
+        Only the cached keys and learned certificates whose chain the new configuration does not accept are
+        dropped: the ones signed by a replaced anchor, the ones the new schema no longer allows their signer
+        to sign, the PoRs of foreign anchors that are no longer roots of trust, and everything below them.
+
+        :return: the number of cached keys dropped.
+        """
+        old_checker, old_anchor = self.lvs_checker, Name.to_bytes(self.anchor_name)
+        old_anchor_key = self.anchor_key
+        new_checker = checker if checker is not None else old_checker
+        if trust_anchor is not None:
+            new_anchor_name, _, new_anchor_key, sig_ptrs = parse_data(trust_anchor)
+            if not self._verify_sig(bytes(new_anchor_key), sig_ptrs):
+                raise ValueError('Trust anchor is not properly self-signed')
+            anchor_changed = (Name.to_bytes(new_anchor_name), bytes(new_anchor_key)) != (old_anchor, old_anchor_key)
+        else:
+            anchor_changed = False
+        schema_changed = (checker is not None and
+                          (old_checker is None or checker.save() != old_checker.save()))
+        #Validations in progress do not cache what they validated under the old configuration
+        self._generation += 1
+
+        root_of_trust = new_checker.root_of_trust() if schema_changed else set()
+        invalid = set()
+        for key, (cert_name, signer, used_for, _) in self._chains.items():
+            if anchor_changed and signer == old_anchor:
+                invalid.add(key)
+            elif schema_changed and not new_checker.check(cert_name, signer):
+                invalid.add(key)
+            elif schema_changed and key != used_for and not root_of_trust.issubset(
+                    sum((m[0] for m in new_checker.match(used_for)), start=[])):
+                #A PoR, used for a foreign anchor
+                invalid.add(key)
+        invalid_names = {self._chains[key][2] for key in invalid}
+        if anchor_changed:
+            invalid_names.add(old_anchor)
+        invalid = await self._drop_keys(invalid, invalid_names)
+        #Swap without awaiting in between, so every validation sees either the old or the new configuration
+        if trust_anchor is not None:
+            self._set_anchor(trust_anchor)
+        self.lvs_checker = new_checker
+        self._generation += 1
+        logging.info(f'Reloaded trust configuration, dropped {len(invalid)} cached keys')
+        return len(invalid)
+
+    async def _drop_keys(self, invalid: set[bytes], invalid_names: set[bytes]) -> set[bytes]:
+        #Drop cached keys, and everything signed by them or by the keys they are used for
+        while True:
+            below = {key for key, (_, signer, _, _) in self._chains.items()
+                     if key not in invalid and signer in invalid_names}
+            if not below:
+                break
+            invalid |= below
+            invalid_names |= {self._chains[key][2] for key in below}
+        self.pins.forget({self._chains[key][0] for key in invalid if key in self._chains})
+        for key in invalid:
+            self._chains.pop(key, None)
+            self._digests.pop(key, None)
+        await asyncio.gather(*(self.storage.invalidate(key) for key in invalid))
+        return invalid
+
+    async def drop_revoked(self, domain: bytes) -> int:
+        """
+        Drop the cached keys whose certificate is revoked by a domain, and everything below them.
+        Called by :class:`RevocationFilters` when the filter of the domain changes. Keys cached in a shared storage
+        by other processes are only dropped by those processes.
+
+        :param domain: the encoded Name of the domain.
+
+        :return: the number of cached keys dropped.
+        """
+        if self.revocation is None:
+            return 0
+        #Validations in progress may have fetched a certificate before the filter changed, they do not cache it
+        self._generation += 1
+        revoked = {key for key, (digest, _, issuer) in self._digests.items()
+                   if issuer == domain and self.revocation.revoked(digest, domain)}
+        if not revoked:
+            return 0
+        dropped = await self._drop_keys(revoked, {self._digests[key][1] for key in revoked})
+        logging.info(f'Dropped {len(dropped)} cached keys of revoked certificates')
+        return len(dropped)
+
+    def _is_revoked(self, storage_key: FormalName) -> bool:
+        #One hash of the digest of the certificate a cached key came from
+        if self.revocation is None:
+            return False
+        entry = self._digests.get(Name.to_bytes(storage_key))
+        return entry is not None and self.revocation.revoked(entry[0], entry[2])
+
+    def _revoked_cert(self, digest: bytes, signer: Optional[bytes]) -> bool:
+        #Only the filter of the domain that issued the certificate, named by its key locator, can revoke it
+        if self.revocation is None or signer is None:
+            return False
+        return self.revocation.revoked(digest, self.revocation.domain_of(Name.from_bytes(signer)))
+
+    async def validate_revocations(self, domain: FormalName, name: FormalName, sig_ptrs: SignaturePtrs) -> bool:
+        """
+        Validate a revocation filter: it is named under ``<domain>/REVOKED`` and signed by a trust anchor of that
+        domain, either ours or a foreign root of trust reached through its PoR.
+        """
+        if (not Name.is_prefix(domain + [REVOCATION_COMPONENT], name) or not sig_ptrs.signature_info
+                or not sig_ptrs.signature_info.key_locator or not sig_ptrs.signature_info.key_locator.name):
+            return False
+        key_locator = sig_ptrs.signature_info.key_locator.name
+        if not Name.is_prefix(domain, key_locator):
+            return False
+        if key_locator != self.anchor_name:
+            ta_matches = sum((m[0] for m in self.lvs_checker.match(key_locator)), start=[])
+            if not self.lvs_checker.root_of_trust().issubset(ta_matches):
+                return False
+        return await self.validate(name, sig_ptrs)
+
+    async def _load_key(self, name: FormalName) -> Optional[bytes]:
+        #Lookups made by concurrent validations in the same loop iteration are sent as one load_many
+        if not self._batch_loads:
+            return await self.storage.load(name)
+        future = asyncio.get_running_loop().create_future()
+        self._pending_loads.append((name, future))
+        if len(self._pending_loads) == 1:
+            self._flush_task = asyncio.create_task(self._flush_loads())
+        return await future
+
+    async def _flush_loads(self):
+        batch, self._pending_loads = self._pending_loads, []
+        try:
+            results = await self.storage.load_many([name for name, _ in batch])
+        except Exception as e:
+            results = None
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        for (_, future), key_bits in zip(batch, results or ()):
+            if not future.done():
+                future.set_result(key_bits)
+
+    async def _remember(self, generation: int, storage_key: FormalName, cert: CertificateView,
+                        signer: Optional[bytes], used_for: FormalName, key_bits: bytes, not_after: int,
+                        digest: bytes):
+        #Cache a validated key, unless the configuration it was validated under was replaced meanwhile
+        if generation != self._generation:
+            return
+        await self.storage.save(storage_key, key_bits, not_after)
+        if generation != self._generation:
+            await self.storage.invalidate(storage_key)
+            return
+        storage_key = Name.to_bytes(storage_key)
+        cert_name = bytes(cert.encoded_name)
+        if self.revocation is not None:
+            issuer = self.revocation.domain_of(Name.from_bytes(signer)) if signer is not None else None
+            self._digests[storage_key] = (digest, Name.to_bytes(used_for), issuer)
+        if signer is not None:
+            self._chains[storage_key] = (cert_name, signer, Name.to_bytes(used_for), not_after)
+            heapq.heappush(self._expiry, (not_after, storage_key))
+            self.pins.learn(digest, cert_name)
+        await self._prune_expired()
+
+    async def _prune_expired(self):
+        #The storage no longer loads expired keys, stop tracking them, and drop what was validated through them
+        now = time.time()
+        expired = set()
+        while self._expiry and self._expiry[0][0] < now:
+            not_after, key = heapq.heappop(self._expiry)
+            if key in self._chains and self._chains[key][3] == not_after:
+                expired.add(key)
+        if expired:
+            await self._drop_keys(expired, {self._chains[key][2] for key in expired})
+
+    async def _forget_missing(self, storage_key: FormalName):
+        #A tracked key the storage no longer has, e.g. evicted or invalidated by another process
+        key = Name.to_bytes(storage_key)
+        if key in self._chains:
+            await self._drop_keys({key}, {self._chains[key][2]})
+
+    async def _fetch_cert(self, name: FormalName, **kwargs) -> tuple[Optional[BinaryStr], Optional[bytes], bytes]:
+        #Fetch a certificate and validate it with the next level, unless it is byte-identical to a known one.
+        #Return its wire (None if it is not valid), the encoded Name of its signer, and its digest
+        _, _, _, wire = await self.app.express_interest(name=name, need_raw_packet=True,
+                                                        validator=_accept_unverified, **kwargs)
+        digest = self.pins.digest(wire)
+        expected = _implicit_digest(Name.normalize(name))
+        if expected is not None and digest != expected:
+            print(f'[Cascade_validator] {Name.to_str(name)} does not match its implicit digest')
+            return None, None, digest
+        cert_name, _, _, sig_ptrs = parse_data(wire)
+        signer = self._signer(sig_ptrs)
+        if self._revoked_cert(digest, signer):
+            print(f'[Cascade_validator] {Name.to_str(name)} is revoked')
+            return None, None, digest
+        if digest in self.pins:
+            print(f'[Cascade_validator] {Name.to_str(name)} is a known certificate, skipping its validation')
+            return wire, signer, digest
+        if not await self.next_level(cert_name, sig_ptrs):
+            return None, None, digest
+        return wire, signer, digest
+
+    @staticmethod
+    def _signer(sig_ptrs: SignaturePtrs) -> Optional[bytes]:
+        #The encoded key locator Name of a certificate, None if it has none
+        sig_info = sig_ptrs.signature_info
+        if not sig_info or not sig_info.key_locator or not sig_info.key_locator.name:
+            return None
+        return Name.to_bytes(sig_info.key_locator.name)
+
+    async def _local_por(self, foreign_key_name: str, local_domain: str) -> tuple[Optional[BinaryStr], Optional[bytes], bytes]:
+        #The PoR from the local store, validated like a fetched one: against the schema and our trust anchor
+        wire = self.por_store.get(foreign_key_name, local_domain) if self.por_store is not None else None
+        if wire is None:
+            return None, None, b''
+        digest = self.pins.digest(wire)
+        cert = CertificateView(wire)
+        if self._check_validity(cert) is None:
+            #Expired, a renewed PoR may be in the keychain by now, or on the network
+            self.por_store.forget(foreign_key_name, local_domain)
+            wire = self.por_store.get(foreign_key_name, local_domain)
+            if wire is None or self._check_validity(CertificateView(wire)) is None:
+                return None, None, b''
+            digest = self.pins.digest(wire)
+        cert_name, _, _, sig_ptrs = parse_data(wire)
+        signer = self._signer(sig_ptrs)
+        if self._revoked_cert(digest, signer):
+            logging.warning(f'Local PoR for {foreign_key_name} is revoked')
+            return None, None, digest
+        if digest in self.pins:
+            return wire, signer, digest
+        if not await self.next_level(cert_name, sig_ptrs):
+            logging.warning(f'Local PoR {Name.to_str(cert_name)} failed validation')
+            self.por_store.forget(foreign_key_name, local_domain)
+            return None, None, digest
+        return wire, signer, digest
+
+    @staticmethod
+    def _check_validity(cert: CertificateView) -> Optional[int]:
+        #Return the NotAfter of a fetched certificate if it is currently valid, None otherwise
+        try:
+            window = cert.validity_window
+        except DecodeError:
+            return None
+        if window is None or not window[0] <= time.time() <= window[1]:
+            return None
+        return window[1]
 
     async def validate(self, name: FormalName, sig_ptrs: SignaturePtrs) -> bool:
         #This function fetches key and actually verify packet
@@ -95,6 +840,9 @@ class CascadeChecker:
             print('[Cascade_validator]: If not sig_ptrs, returning False')
             return False
         cert_name = sig_ptrs.signature_info.key_locator.name
+        generation = self._generation
+        if self.revocation is not None:
+            self.revocation.attach(self)
         logging.debug(f'Verifying {Name.to_str(name)} <- {Name.to_str(cert_name)} ...')
         print(f'[Cascade-validator]: Verifying {Name.to_str(name)} <- {Name.to_str(cert_name)}')
 
@@ -130,42 +878,65 @@ class CascadeChecker:
             #Name building is somewhat convuluted due the local domain needing to be stored in TLV encoding
             por_name = Name.normalize(foreign_ta_key_name) + [Name.to_bytes(local_ta_domain_name)]
 
-            #3. Fetch the PoR
-            try:
-                    #Fetch via can_be_prefix does not seem to work
-                    _, _, key_bits = await self.app.express_interest(
-                        name=Name.to_str(por_name)+"/v=1678663087543", must_be_fresh=True, can_be_prefix=True,
-                        validator=self.next_level)
+            #3. Use the PoR cached until it expires, or fetch it
+            key_bits = await self._load_key(por_name)
+            if key_bits and self._is_revoked(por_name):
+                print(f'[Cascade_validator] cached PoR for {Name.to_str(cert_name)} is revoked, returning False')
+                return False
+            if key_bits:
+                logging.debug('Use cached PoR.')
+                print(f'[Cascade_validator] using cached PoR for {Name.to_str(name)} <- {Name.to_str(cert_name)}')
+            else:
+                await self._forget_missing(por_name)
+                #Co-located apps share the PIB with the controller, take the PoR from there if it has one
+                por_wire, signer, digest = await self._local_por(foreign_ta_key_name, local_ta_domain_name)
+                try:
+                    #Fetch the PoR by prefix, the controller registers the PoR prefix without the version
                     #Next level will check PoR against the schema AND also validate it using our own trust anchor
-
-                    #If this await does not except and passes, it means the PoR passed validation.
-                    #This implies that this level has also passed verification because we verified its certificate.
-                    print(f'[Cascade_validator] verifying sig return: True for {Name.to_str(name)} <- {Name.to_str(cert_name)}')
-                    return True
-            except (ValidationFailure, InterestTimeout, InterestNack) as e:
+                    if por_wire is None:
+                        por_wire, signer, digest = await self._fetch_cert(por_name, must_be_fresh=True,
+                                                                          can_be_prefix=True)
+                except (ValidationFailure, InterestTimeout, InterestNack) as e:
                     logging.debug('Public key not valid.')
                     print(f'[Cascade_validator] is raising an error while fetching PoR')
                     print(e)
                     return False
-            
+                if por_wire is None:
+                    print(f'[Cascade_validator] PoR failed validation, returning False')
+                    return False
+                #If we get here, it means the PoR passed validation.
+                #Its content is the key of the foreign trust anchor, which must have signed this packet.
+                por = CertificateView(por_wire)
+                if (not_after := self._check_validity(por)) is None:
+                    print(f'[Cascade_validator] PoR {Name.to_str(por.name)} is not currently valid, returning False')
+                    return False
+                key_bits = bytes(por.key_bits)
+                await self._remember(generation, por_name, por, signer, cert_name, key_bits, not_after, digest)
+
         #If certificate signing this key is same as trust anchor for my domain, then just check against my trust anchor.
-        if cert_name == self.anchor_name:
+        elif cert_name == self.anchor_name:
             logging.debug('Use trust anchor.')
             print(f'[Cascade_validator] using trust anchor for {Name.to_str(name)} <- {Name.to_str(cert_name)}')
+            if self.anchor_window and not self.anchor_window[0] <= time.time() <= self.anchor_window[1]:
+                print(f'[Cascade_validator] trust anchor is not currently valid, returning False')
+                return False
             key_bits = self.anchor_key
         #Else, it cannot be trust anchor (or it is an unrecognized trust anchor in the interdomain case) so we need to fetch the key.
         else:
-            if key_bits := self.storage.load(cert_name):
+            key_bits = await self._load_key(cert_name)
+            if key_bits and self._is_revoked(cert_name):
+                print(f'[Cascade_validator] cached key {Name.to_str(cert_name)} is revoked, returning False')
+                return False
+            if key_bits:
                 logging.debug('Use cached public key.')
                 print(f'[Cascade_validator] using cached public key for {Name.to_str(name)} <- {Name.to_str(cert_name)}')
             else:
+                await self._forget_missing(cert_name)
                 logging.debug('Cascade fetching public key ...')
                 print(f'[Cascade_validator] fetching public key for {Name.to_str(name)} by expressing interest for {Name.to_str(cert_name)}')
                 # Try to fetch
                 try:
-                    _, _, key_bits = await self.app.express_interest(
-                        name=cert_name, must_be_fresh=True, can_be_prefix=False,
-                        validator=self.next_level)
+                    cert_wire, signer, digest = await self._fetch_cert(cert_name, must_be_fresh=True, can_be_prefix=False)
                     #This express_interest fetches the public key to verify the current signature for this packet name.
                     #But then it also needs to verify that public key, b/c that public key has a name that is signed.
 
@@ -182,9 +953,18 @@ class CascadeChecker:
                     logging.debug('Public key not valid.')
                     print(f'[Cascade_validator] is raising an error for {Name.to_str(name)} <- {Name.to_str(cert_name)}, returning False {type(e)}')
                     return False
+                if cert_wire is None:
+                    print(f'[Cascade_validator] {Name.to_str(cert_name)} failed validation, returning False')
+                    return False
                 logging.debug('Public key fetched.')
+                #Only the key bits and validity are needed here, so the certificate is not fully decoded
+                cert = CertificateView(cert_wire)
+                if (not_after := self._check_validity(cert)) is None:
+                    print(f'[Cascade_validator] {Name.to_str(cert_name)} is not currently valid, returning False')
+                    return False
+                key_bits = cert.key_bits
                 if key_bits:
-                    self.storage.save(cert_name, key_bits)
+                    await self._remember(generation, cert_name, cert, signer, cert_name, bytes(key_bits), not_after, digest)
 
         # Validate signature
         if not key_bits:
@@ -192,8 +972,10 @@ class CascadeChecker:
             print(f'[Cascade_validator] found no key bits for {Name.to_str(name)} <- {Name.to_str(cert_name)}, returning false')
             return False
         
-        print(f'[Cascade_validator] verifying sig return: {self._verify_sig(key_bits, sig_ptrs)} for {Name.to_str(name)} <- {Name.to_str(cert_name)}')
-        return self._verify_sig(key_bits, sig_ptrs)
+        #Verify once, the result is both printed and returned
+        verified = self._verify_sig(key_bits, sig_ptrs)
+        print(f'[Cascade_validator] verifying sig return: {verified} for {Name.to_str(name)} <- {Name.to_str(cert_name)}')
+        return verified
 
     def __call__(self, name: FormalName, sig_ptrs: SignaturePtrs) -> Coroutine[Any, None, bool]:
         return self.validate(name, sig_ptrs)
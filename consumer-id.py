@@ -9,7 +9,9 @@ from ndn.utils import timestamp
 from ndn.encoding import Name, Component, InterestParam
 from ndn.security import TpmFile, KeychainSqlite3
 from ndn.app import NDNApp, InterestNack, InterestTimeout, InterestCanceled, ValidationFailure
-from ndn.app_support.light_versec import compile_lvs, Checker, DEFAULT_USER_FNS, lvs_validator
+from ndn.app_support.light_versec import DEFAULT_USER_FNS, lvs_validator
+from ndn.security.validator.cascade_validator import LocalPoRStore
+from lvs_cache import LvsCache
 
 
 logging.basicConfig(filename="logInterdomain.txt",
@@ -45,15 +47,18 @@ def main():
 
     print(f'Trust anchor name: {Name.to_str(trust_anchor.name)}')
 
-    lvs_model = compile_lvs(lvs_text)
-
     #Add own user function
     user_fns = dict(DEFAULT_USER_FNS)
     user_fns["$check_PoR_domain"] = check_PoR_domain
-    checker = Checker(lvs_model, user_fns)
+    #The compiled model and the sanity check of the trust anchor are cached on disk across runs
+    lvs_cache = LvsCache()
+    checker = lvs_cache.checker(lvs_text, user_fns)
+    lvs_cache.check_anchor(checker, trust_anchor.data)
     app = NDNApp(keychain=keychain)
 
-    validator = lvs_validator(checker, app, trust_anchor.data)
+    #The controller stores the PoRs in this same PIB, read them from there instead of fetching them
+    validator = lvs_validator(checker, app, trust_anchor.data, sanity_checked=True,
+                              por_store=LocalPoRStore(keychain))
     logging.debug("Done creating validator")
 
     async def fetch_interest(article: str):
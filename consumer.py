@@ -6,7 +6,8 @@ from ndn.utils import timestamp
 from ndn.encoding import Name, Component, InterestParam
 from ndn.security import TpmFile, KeychainSqlite3
 from ndn.app import NDNApp, InterestNack, InterestTimeout, InterestCanceled, ValidationFailure
-from ndn.app_support.light_versec import compile_lvs, Checker, DEFAULT_USER_FNS, lvs_validator
+from ndn.app_support.light_versec import DEFAULT_USER_FNS, lvs_validator
+from lvs_cache import LvsCache
 
 
 logging.basicConfig(filename="log.txt",
@@ -37,10 +38,12 @@ def main():
     trust_anchor = keychain['/lvs-test'].default_key().default_cert()
     print(f'Trust anchor name: {Name.to_str(trust_anchor.name)}')
 
-    lvs_model = compile_lvs(lvs_text)
-    checker = Checker(lvs_model, DEFAULT_USER_FNS)
+    #The compiled model and the sanity check of the trust anchor are cached on disk across runs
+    lvs_cache = LvsCache()
+    checker = lvs_cache.checker(lvs_text, DEFAULT_USER_FNS)
+    lvs_cache.check_anchor(checker, trust_anchor.data)
     app = NDNApp(keychain=keychain)
-    validator = lvs_validator(checker, app, trust_anchor.data)
+    validator = lvs_validator(checker, app, trust_anchor.data, sanity_checked=True)
 
     async def fetch_interest(article: str):
         try:
@@ -1,15 +1,26 @@
 #[Project code]:
 #Controller consumer entity living in /lvs-test domain
 #It handles PoR creation
+#The trust anchors of the foreign domains given on the command line are discovered concurrently through their
+#anchor metadata (see anchor_discovery.py), their self-signature is checked, and all the PoRs are issued in one
+#keychain transaction. Discovered anchors are cached, so later runs only revalidate the metadata.
+#
+#   python controller-c.py /lvs-test2 /lvs-test3 --parallel 16
+#   python controller-c.py --file federation.txt
 
 import os
 import sys
+import time
+import argparse
+import sqlite3
 import logging
+import asyncio as aio
 from ndn.utils import timestamp
 from ndn.encoding import FormalName, BinaryStr, SignatureType, Name, parse_data, SignaturePtrs
 from ndn.security import TpmFile, KeychainSqlite3
+from ndn.security.keychain.keychain_sqlite3 import AsyncKeychain
 from ndn.app import NDNApp, InterestNack, InterestTimeout, InterestCanceled, ValidationFailure
-from ndn.app_support.light_versec import compile_lvs, Checker, DEFAULT_USER_FNS, lvs_validator
+from anchor_discovery import AnchorCache
 
 
 logging.basicConfig(filename="logInterdomain.txt",
@@ -18,68 +29,115 @@ logging.basicConfig(filename="logInterdomain.txt",
                     level=logging.INFO,
                     style='{')
 
-app = NDNApp()
+LOCAL_DOMAIN = '/lvs-test'
+
 
 def main():
-    
+    parser = argparse.ArgumentParser(description='Fetch the trust anchors of foreign domains and issue their PoRs')
+    parser.add_argument('domains', nargs='*', help='the foreign domains (default: /lvs-test2)')
+    parser.add_argument('--file', default='', help='read more foreign domains from this file, one per line')
+    parser.add_argument('--parallel', type=int, default=8, help='trust anchors fetched at the same time')
+    parser.add_argument('--lifetime', type=int, default=4000, help='Interest lifetime in ms')
+    args = parser.parse_intermixed_args()
+    domains = list(args.domains)
+    if args.file:
+        with open(args.file) as f:
+            domains += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    #Keep the order, drop the duplicates
+    domains = list(dict.fromkeys(domains or ['/lvs-test2']))
+
     keychain = KeychainSqlite3("/home/vince/.ndn/pib.db", TpmFile("/home/vince/.ndn/ndnsec-key-file"))
-    trust_anchor = keychain['/lvs-test'].default_key()
+    trust_anchor = keychain[LOCAL_DOMAIN].default_key()
+    #Keychain writes (fsync) and signing run on the keychain thread instead of blocking the event loop
+    async_keychain = AsyncKeychain(keychain)
 
     app = NDNApp()
-
-    async def fetch_trust_anchor(anchor: str):
+    anchor_cache = AnchorCache(app)
+
+    async def fetch_trust_anchor(domain: str, sem: aio.Semaphore) -> dict:
+        #Discover the trust anchor of a controller, the default one is listed first in its metadata
+        result = {'domain': domain, 'error': None}
+        async with sem:
+            start = time.perf_counter()
+            try:
+                logging.debug(f'Discovering the trust anchor of {domain}')
+                cert_name, key_name, wire = (await anchor_cache.anchors(domain, lifetime=args.lifetime))[0]
+                _, _, key_bits, _ = parse_data(wire)
+                result.update(cert_name=cert_name, key_name=key_name, key_bits=bytes(key_bits), cert_data=wire)
+            except InterestNack as e:
+                result['error'] = f'Nacked with reason={e.reason}'
+            except InterestTimeout:
+                result['error'] = 'Timeout'
+            except InterestCanceled:
+                result['error'] = 'Canceled'
+            except ValueError as e:
+                result['error'] = str(e)
+            except Exception as e:
+                #e.g. a malformed packet, it only fails this domain and not the whole gather
+                logging.error(f'Discovering the trust anchor of {domain} failed', exc_info=e)
+                result['error'] = f'{type(e).__name__}: {e}'
+            result['fetch_ms'] = (time.perf_counter() - start) * 1000
+        return result
+
+    def keys_to_import(results: list[dict]) -> list[tuple]:
+        #Foreign trust anchors the keychain does not know yet; a different key under a known Name is an error
+        imports = []
+        for r in results:
+            if r['error']:
+                continue
+            domain, key_name = r['domain'], r['key_name']
+            if domain in keychain and key_name in keychain[domain]:
+                if bytes(keychain[domain][key_name].key_bits) != r['key_bits']:
+                    r['error'] = f'{Name.to_str(key_name)} is in the keychain with different key bits'
+                continue
+            imports.append((domain, key_name, r['key_bits'], r['cert_name'], r['cert_data']))
+        return imports
+
+    async def provision(domains: list[str]) -> list[dict]:
+        sem = aio.Semaphore(args.parallel)
+        results = await aio.gather(*(fetch_trust_anchor(domain, sem) for domain in domains))
+
+        imports = keys_to_import(results)
+        ok = [r for r in results if not r['error']]
+        start = time.perf_counter()
         try:
-            print(f'Sending Interest {anchor}')
-            logging.debug("Sending Interest")
-            data_name, _, key_bits = await app.express_interest(
-                name=anchor, must_be_fresh=True, can_be_prefix=True)
-            return data_name
-        except InterestNack as e:
-            print(f'Nacked with reason={e.reason}')
-        except InterestTimeout:
-            print(f'Timeout')
-        except InterestCanceled:
-            print(f'Canceled')
-        except ValidationFailure:
-            print(f'Data failed to validate')
+            if imports:
+                await async_keychain.import_keys(imports)
+            #Now create the PoRs, it needs various components to sign
+            #PoR: foreign_domain_key_name/local_domain/version <-(signed by) my trust anchor
+            await async_keychain.sign_PoRs([(r['domain'], r['key_name'], trust_anchor.name, LOCAL_DOMAIN)
+                                            for r in ok])
+        except (KeyError, ValueError, sqlite3.Error) as e:
+            for r in ok:
+                r['error'] = f'Issuing failed: {e}'
+        issue_ms = (time.perf_counter() - start) * 1000
+        for r in ok:
+            r['issue_ms'] = issue_ms
+        return results
+
+    def report(results: list[dict], elapsed: float):
+        print(f'{"domain":<24} {"status":<8} {"fetch ms":>9} {"issue ms":>9}  anchor / error')
+        for r in results:
+            if r['error']:
+                print(f'{r["domain"]:<24} {"FAILED":<8} {r["fetch_ms"]:>9.1f} {"":>9}  {r["error"]}')
+            else:
+                print(f'{r["domain"]:<24} {"ok":<8} {r["fetch_ms"]:>9.1f} {r["issue_ms"]:>9.1f}  '
+                      f'{Name.to_str(r["cert_name"])}')
+        failed = sum(1 for r in results if r['error'])
+        print(f'{len(results) - failed} PoRs issued, {failed} failed, in {elapsed:.3f}s')
+        print(f'Anchor cache: {anchor_cache.hits} hits, {anchor_cache.revalidated} revalidated, '
+              f'{anchor_cache.fetched} anchors fetched')
 
     async def ndn_main():
-        await generate_PoR()
+        start = time.perf_counter()
+        results = await provision(domains)
+        report(results, time.perf_counter() - start)
 
+        async_keychain.shutdown()
         app.shutdown()
-    
-    async def generate_PoR():
-        local_domain = '/lvs-test'
-        foreign_domain = '/lvs-test2'
-
-        #Fetch controller 2's trust anchor
-        #data_name is the cert name of the foreign trust anchor contains domain and keyid which we need /domain/key/key_id/...
-        #key_bits is the public key of the foreign trust anchor
-        data_name = await fetch_trust_anchor(f'{foreign_domain}/KEY/')
-        print("Fetched", Name.to_str(data_name))
-
-        data_name = Name.to_str(data_name).split('/')
-
-        foreign_domain_key_id = data_name[data_name.index('KEY')+1]
-        foreign_domain_key_name = f'{foreign_domain}/KEY/{foreign_domain_key_id}'
-
-        #Check if identity or key already exists, if not create them.
-        if foreign_domain in keychain:
-            print("Identity already exists")
-            if foreign_domain_key_name in keychain[foreign_domain]:
-                print("Key already exists")
-            else:
-                keychain.new_key(foreign_domain, key_id=foreign_domain_key_id)
-        else:
-            keychain.new_identity(foreign_domain)
-            keychain.new_key(foreign_domain, key_id=foreign_domain_key_id)
-
-        #Now create the PoR, it needs various components to sign
-        #PoR: foreign_domain_key_name/local_domain/version <-(signed by) my trust anchor
-        keychain.sign_PoR(foreign_domain, foreign_domain_key_name, Name.to_str(trust_anchor.name), local_domain)
 
     app.run_forever(ndn_main())
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
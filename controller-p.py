@@ -1,14 +1,27 @@
 #[Project code]:
 #Controller producer entity living in /lvs-test domain
-#It provides the PoR to entities in its own domain
+#It provides the PoRs to entities in its own domain
+#Every PoR issued by our trust anchor is loaded from the keychain into memory, and one prefix is registered per
+#recognized foreign trust anchor. The keychain is polled for changes, so PoRs issued later are served without
+#a restart.
+#PoRs are renewed ahead of their expiry, while the old PoR is still valid, so validators switch over without a gap.
+#The revocation filter of the domain is published too (see revocation.py), and reloaded when its file changes.
 import os
 import sys
 import logging
+import heapq
+import sqlite3
+import time
+import asyncio as aio
+from typing import Optional, Callable
 from ndn.utils import timestamp
-from ndn.encoding import Name, Component
+from ndn.encoding import Name, Component, FormalName, BinaryStr, DecodeError
 from ndn.security import TpmFile, KeychainSqlite3
+from ndn.security.keychain.keychain_sqlite3 import iter_rows, AsyncKeychain
 from ndn.app import NDNApp
 from ndn.app_support.light_versec import compile_lvs, Checker, DEFAULT_USER_FNS
+from ndn.app_support.security_v2 import CertificateView
+from revocation import RevocationPublisher, serve_revocations
 
 
 logging.basicConfig(format='[{asctime}]{levelname}:{message}',
@@ -16,25 +29,231 @@ logging.basicConfig(format='[{asctime}]{levelname}:{message}',
                     level=logging.INFO,
                     style='{')
 
+LOCAL_DOMAIN = '/lvs-test'
+#Seconds between two checks of the keychain for new PoRs
+REFRESH_INTERVAL = 2.0
+#PoRs are valid for 10 days, a replacement is issued 3 days before the current one expires
+RENEW_BEFORE = 3 * 24 * 3600
+#At most RENEW_BATCH PoRs are issued every RENEW_INTERVAL seconds
+RENEW_BATCH = 100
+RENEW_INTERVAL = 1.0
+#Seconds before retrying a failed renewal
+RENEW_RETRY = 60.0
+
+
+class PoRIndex:
+    """
+    The PoRs issued by a domain, i.e. the certificates named <foreign anchor key>/<domain>/<version>,
+    indexed by their encoded Name and by their Name without the version.
+    """
+    def __init__(self, keychain: KeychainSqlite3, local_domain: str = LOCAL_DOMAIN):
+        self.keychain = keychain
+        self.local_domain = local_domain
+        self.domain_component = Name.to_bytes(local_domain)
+        #Encoded PoR Name -> PoR wire
+        self.pors = {}
+        #Encoded PoR Name without version -> encoded Name of its latest version
+        self.latest = {}
+        self._version = None
+
+    def _scan(self) -> tuple[dict, dict]:
+        pors = {}
+        latest = {}
+        latest_versions = {}
+        local_domain = Name.normalize(self.local_domain)
+        rows = iter_rows(lambda: self.keychain.conn, 'certificates', 'certificate_name', 'certificate_data')
+        for row in rows:
+            cert_name = Name.from_bytes(row.name)
+            if (len(cert_name) < 5 or cert_name[-2] != self.domain_component
+                    or Name.is_prefix(local_domain, cert_name)):
+                continue
+            try:
+                version = Component.to_number(cert_name[-1])
+            except (ValueError, DecodeError):
+                continue
+            encoded_name = Name.to_bytes(cert_name)
+            pors[encoded_name] = row.data
+            prefix = Name.to_bytes(cert_name[:-1])
+            if version > latest_versions.get(prefix, -1):
+                latest_versions[prefix] = version
+                latest[prefix] = encoded_name
+        return pors, latest
+
+    def refresh(self) -> list[FormalName]:
+        """
+        Reload the PoRs if the keychain changed since the last call.
+
+        :return: the PoR prefixes (without version) that were not indexed before.
+        """
+        version = self.keychain.data_version
+        if version == self._version:
+            return []
+        pors, latest = self._scan()
+        new_prefixes = [Name.from_bytes(prefix) for prefix in latest if prefix not in self.latest]
+        self.pors, self.latest = pors, latest
+        self._version = version
+        return new_prefixes
+
+    def lookup(self, name: FormalName) -> Optional[BinaryStr]:
+        """
+        The PoR answering an Interest: an exact Name, or the latest version under a PoR prefix.
+        """
+        encoded_name = Name.to_bytes(name)
+        wire = self.pors.get(encoded_name)
+        if wire is not None:
+            return wire
+        #The validators fetch by prefix without CanBePrefix set on the version-less Name too, answer anyway
+        latest_name = self.latest.get(encoded_name)
+        return self.pors.get(latest_name) if latest_name is not None else None
+
+
+class PoRRenewer:
+    """
+    Keeps the latest PoR of every foreign trust anchor in the index valid. The expiries are kept in a heap, and
+    a new PoR is issued renew_before seconds before the latest one expires. The old PoR stays valid meanwhile,
+    and validators fetch the new one when their cached key expires. Renewals are issued in batches of at most
+    batch_size PoRs, one batch every batch_interval seconds, in one keychain transaction each.
+    """
+    def __init__(self, keychain: AsyncKeychain, index: PoRIndex, renew_before: float = RENEW_BEFORE,
+                 batch_size: int = RENEW_BATCH, batch_interval: float = RENEW_INTERVAL):
+        self.keychain = keychain
+        self.index = index
+        self.renew_before = renew_before
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.renewed = 0
+        #(renewal time, encoded PoR prefix), entries are stale if the prefix was rescheduled since
+        self._heap = []
+        #Encoded PoR prefix -> (NotAfter of its latest PoR, scheduled renewal time)
+        self._scheduled = {}
+
+    def _push(self, prefix: bytes, not_after: int, renew_at: float):
+        self._scheduled[prefix] = (not_after, renew_at)
+        heapq.heappush(self._heap, (renew_at, prefix))
+
+    def _is_current(self, renew_at: float, prefix: bytes) -> bool:
+        scheduled = self._scheduled.get(prefix)
+        return scheduled is not None and scheduled[1] == renew_at and prefix in self.index.latest
+
+    def schedule(self):
+        """
+        Schedule the renewal of the latest PoRs of the index that are not scheduled yet.
+        """
+        for prefix, por_name in self.index.latest.items():
+            not_after = self._not_after(self.index.pors[por_name])
+            if not_after is None:
+                logging.warning(f'PoR {Name.to_str(por_name)} has no validity period, it is not renewed')
+                continue
+            if prefix not in self._scheduled or self._scheduled[prefix][0] != not_after:
+                self._push(prefix, not_after, not_after - self.renew_before)
+
+    @staticmethod
+    def _not_after(wire: BinaryStr) -> Optional[int]:
+        try:
+            window = CertificateView(wire).validity_window
+        except DecodeError:
+            return None
+        return window[1] if window else None
+
+    def due(self, now: float) -> list[bytes]:
+        """
+        Pop the next batch of PoR prefixes to renew.
+        """
+        batch = []
+        while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+            renew_at, prefix = heapq.heappop(self._heap)
+            if self._is_current(renew_at, prefix):
+                batch.append(prefix)
+        return batch
+
+    def next_due(self) -> Optional[float]:
+        while self._heap and not self._is_current(*self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    async def renew(self, batch: list[bytes]):
+        #PoR prefix: <foreign identity>/KEY/<key-id>/<local domain>
+        ta_key_name = self.index.keychain[self.index.local_domain].default_key().name
+        requests = []
+        for prefix in batch:
+            key_name = Name.from_bytes(prefix)[:-1]
+            requests.append((key_name[:-2], key_name, ta_key_name, self.index.local_domain))
+        try:
+            await self.keychain.sign_PoRs(requests)
+        except (KeyError, ValueError, sqlite3.Error) as e:
+            logging.error(f'Renewal of {len(batch)} PoRs failed: {e}')
+            retry_at = time.time() + RENEW_RETRY
+            for prefix in batch:
+                self._push(prefix, self._scheduled[prefix][0], retry_at)
+            return
+        self.renewed += len(batch)
+        print(f'Renewed {len(batch)} PoRs')
+
+    async def run(self, on_renewed: Callable[[], None], poll_interval: float = REFRESH_INTERVAL):
+        """
+        Renew the PoRs as they come due. on_renewed is called after each batch, to index the new PoRs.
+        """
+        while True:
+            self.schedule()
+            batch = self.due(time.time())
+            if batch:
+                await self.renew(batch)
+                on_renewed()
+                await aio.sleep(self.batch_interval)
+                continue
+            next_due = self.next_due()
+            delay = poll_interval if next_due is None else min(poll_interval, max(next_due - time.time(), 0))
+            await aio.sleep(delay)
+
+
+def serve_pors(app: NDNApp, index: PoRIndex) -> Callable[[], None]:
+    """
+    Register a route per PoR prefix of the index.
+    Returns the function refreshing the index and registering the prefixes of new foreign trust anchors.
+    """
+    def on_interest(name, _param, _app_param):
+        wire = index.lookup(name)
+        if wire is None:
+            logging.debug(f'No PoR for {Name.to_str(name)}')
+            return
+        app.put_raw_packet(wire)
+
+    def refresh():
+        for prefix in index.refresh():
+            print(f'Serving PoRs under: {Name.to_str(prefix)}')
+            app.route(prefix)(on_interest)
+
+    refresh()
+    return refresh
+
+
 def main():
     keychain = KeychainSqlite3("/home/vince/.ndn/pib.db", TpmFile("/home/vince/.ndn/ndnsec-key-file"))
 
-    #Fetch PoR from keychain
-    proof_of_domain_recognition = keychain['/lvs-test2'].default_key()[f'/lvs-test2/KEY/%D9%A1%2A%F3V%3D%25%F7/7=%08%08lvs-test/v=1678663087543']
-    
-    print(f'PoR name: {Name.to_str(proof_of_domain_recognition.name)}')
-
     app = NDNApp(keychain=keychain)
+    index = PoRIndex(keychain, LOCAL_DOMAIN)
+    refresh = serve_pors(app, index)
+    print(f'{len(index.pors)} PoRs of {len(index.latest)} foreign trust anchors')
+    revocations = RevocationPublisher(keychain, LOCAL_DOMAIN)
+    serve_revocations(app, revocations)
+    print(f'Revocation filter: {len(revocations.revoked)} revoked certificates, read from {revocations.path}')
+
+    #Signing and keychain writes of the renewals run on the keychain thread
+    async_keychain = AsyncKeychain(keychain)
+    renewer = PoRRenewer(async_keychain, index)
+
+    #Pick up the PoRs issued by controller-c.py and the revocations while running
+    async def poll():
+        while True:
+            await aio.sleep(REFRESH_INTERVAL)
+            refresh()
+            revocations.refresh()
 
-    @app.route(proof_of_domain_recognition.name)
-    def on_interest(name, param, _app_param):
-        print(f'>> I: {Name.to_str(name)}, {param}')
-        app.put_raw_packet(proof_of_domain_recognition.data)
-        print(f'<< D: {Name.to_str(proof_of_domain_recognition.name)}')
-        print('')
+    async def background():
+        await aio.gather(poll(), renewer.run(refresh))
 
     print('Start serving ...')
-    app.run_forever()
+    app.run_forever(after_start=background())
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
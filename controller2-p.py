@@ -1,16 +1,20 @@
 #[Project code]:
 #Controller producer entity living in /lvs-test2 domain
-#It provides the /lvs-test2 trust anchor to controller 1
+#It provides the /lvs-test2 trust anchor to controller 1, with the anchor discovery metadata
+#It also publishes the revocation filter of /lvs-test2 (see revocation.py)
 
 import os
 import sys
 import logging
+import asyncio as aio
 from ndn.utils import timestamp
 from ndn.encoding import FormalName, BinaryStr, SignatureType, Name, parse_data, SignaturePtrs
 from ndn.security import TpmFile, KeychainSqlite3
 from ndn.app import NDNApp
 from ndn.app_support.light_versec import compile_lvs, Checker, DEFAULT_USER_FNS
 from Cryptodome.PublicKey import ECC, RSA
+from anchor_discovery import serve_anchors
+from revocation import RevocationPublisher, serve_revocations
 
 
 logging.basicConfig(format='[{asctime}]{levelname}:{message}',
@@ -25,30 +29,28 @@ def main():
     trust_anchor = keychain['/lvs-test2'].default_key().default_cert()
 
     print(f'Serving trust anchor name: {Name.to_str(trust_anchor.name)}')
-    #print("Trust anchor identity", Name.to_str(trust_anchor.identity))
-    #print("Trust anchor key bits", trust_anchor.key_bits)
-    #print("Trust anchor certificate data", trust_anchor.default_cert().data)
-    name, _, key_bits, _= parse_data(trust_anchor.data)
-
-    #print(keychain['/lvs-test2'].default_key().key_bits == bytes(key_bits))
 
     app = NDNApp(keychain=keychain)
 
-    #@app.route(trust_anchor.name)
-    '''
-    For some reason, I have to use this /lvs-test2/KEY/ specifically because the network wont work with can_be_prefix on trust_anchor.name
-    As controller of /lvs-test doesn't know the full TA details of /lvs-test2, I tried using can_be_prefix to fetch it with part of the name
-    But it did not work, so I resorted to this
-    '''
-    @app.route('/lvs-test2/KEY/')
-    def on_interest(name, param, _app_param):
-        print(f'>> I: {Name.to_str(name)}, {param}')
-        app.put_raw_packet(trust_anchor.data)
-        print(f'<< D: {Name.to_str(trust_anchor.name)}')
-        print('')
-    
+    #Other controllers discover our trust anchors through the metadata under /lvs-test2/KEY/32=metadata,
+    #then fetch each anchor by its Name and implicit digest. The metadata is signed by our trust anchor
+    #and has a long freshness period, so forwarder caches answer the repeated requests.
+    #Interests for any other Name under /lvs-test2/KEY still get the trust anchor, as before.
+    metadata_wire = serve_anchors(app, keychain, '/lvs-test2')
+    print(f'Anchor metadata name: {Name.to_str(parse_data(metadata_wire)[0])}')
+
+    #Validators of both domains refresh it when its freshness period runs out, and only get what changed
+    revocations = RevocationPublisher(keychain, '/lvs-test2')
+    serve_revocations(app, revocations)
+    print(f'Revocation filter: {len(revocations.revoked)} revoked certificates, read from {revocations.path}')
+
+    async def poll():
+        while True:
+            await aio.sleep(revocations.freshness / 1000)
+            revocations.refresh()
+
     print('Start serving ...')
-    app.run_forever()
+    app.run_forever(after_start=poll())
     
 
 if __name__ == '__main__':
@@ -16,17 +16,40 @@
 # limitations under the License.
 # -----------------------------------------------------------------------------
 from __future__ import annotations
+import asyncio
+import functools
 import logging
 import os
 import sqlite3
-from typing import Iterator, Any
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Iterator, Iterable, Any, Optional, Callable, TypeVar, NamedTuple
 from ...encoding import FormalName, BinaryStr, NonStrictName, Name
-from ...app_support.security_v2 import self_sign, sign_req_PoR
+from ...app_support.security_v2 import self_sign, sign_req_PoR, sign_req_PoRs
 from ..signer.sha256_digest_signer import DigestSha256Signer
 from ..tpm.tpm import Tpm
 from .keychain import Keychain, AbstractCertificate, AbstractKey, AbstractIdentity
 
 
+T = TypeVar('T')
+
+# Seconds a connection waits for another writer to release the database before raising "database is locked"
+BUSY_TIMEOUT = 30.0
+# Rows fetched per query when iterating over the PIB
+PAGE_SIZE = 500
+# Signers kept by default, one per KeyLocator Name
+SIGNER_CACHE_SIZE = 128
+
+# The triggers picking the first inserted row as default: trigger name -> (table, parent id column)
+DEFAULT_INSERT_TRIGGERS = {
+    'identity_default_after_insert_trigger': ('identities', None),
+    'key_default_after_insert_trigger': ('keys', 'identity_id'),
+    'cert_default_after_insert_trigger': ('certificates', 'key_id'),
+}
+
 INITIALIZE_SQL = """
 CREATE TABLE IF NOT EXISTS
   tpmInfo(
@@ -167,10 +190,102 @@ CREATE TRIGGER IF NOT EXISTS
   END;
 """
 
+# The value of an encoded Name, i.e. the concatenated components without the Name TLV header.
+# Component-wise prefixes of a Name are byte prefixes of this value, so it can be range-scanned.
+NAME_VALUE_SQL = ("substr({0}, CASE hex(substr({0}, 2, 1)) WHEN 'FD' THEN 5 WHEN 'FE' THEN 7 "
+                  "WHEN 'FF' THEN 11 ELSE 3 END)")
+CERT_NAME_VALUE = NAME_VALUE_SQL.format('certificate_name')
+
+# Secondary indexes, also created when an existing database is opened
+INDEX_SQL = f"""
+CREATE INDEX IF NOT EXISTS
+  keyIdentityIndex ON keys(identity_id);
+CREATE INDEX IF NOT EXISTS
+  certKeyIndex ON certificates(key_id);
+CREATE INDEX IF NOT EXISTS
+  certNameValueIndex ON certificates({CERT_NAME_VALUE});
+"""
+
+
+@functools.lru_cache(maxsize=1024)
+def _str_name_to_bytes(name: str) -> bytes:
+    return Name.to_bytes(name)
+
+
+def name_to_bytes(name: NonStrictName) -> bytes:
+    """
+    Same as :any:`Name.to_bytes`, but string Names (the usual literals in applications) are only parsed once.
+    """
+    if isinstance(name, str):
+        return _str_name_to_bytes(name)
+    return Name.to_bytes(name)
+
+
+class PibRow(NamedTuple):
+    """
+    A row of the PIB as returned by the ``rows`` iterators.
+
+    :ivar row_id: its id in the database.
+    :vartype row_id: int
+    :ivar name: its encoded Name.
+    :vartype name: bytes
+    :ivar is_default: whether this is the default entry of its parent.
+    :vartype is_default: bool
+    :ivar data: the key bits or certificate data if requested, otherwise ``None``.
+    :vartype data: Optional[bytes]
+    """
+    row_id: int
+    name: bytes
+    is_default: bool
+    data: Optional[bytes] = None
+
 
-class Certificate(AbstractCertificate):
+def iter_rows(conn_getter: Callable[[], sqlite3.Connection], table: str, name_col: str,
+              data_col: Optional[str] = None, parent_col: Optional[str] = None, parent_id: Optional[int] = None,
+              page_size: int = PAGE_SIZE) -> Iterator[PibRow]:
     """
-    A dataclass for a Certificate.
+    Iterate over the rows of a PIB table, one page at a time, using keyset pagination on the row id.
+    No cursor is kept open between pages, so memory use is bounded by ``page_size`` and writers
+    are not blocked by a long-running read.
+    """
+    columns = f'id, {name_col}, is_default, {data_col if data_col else "NULL"}'
+    where = f'{parent_col}=? AND id>?' if parent_col else 'id>?'
+    sql = f'SELECT {columns} FROM {table} WHERE {where} ORDER BY id LIMIT ?'
+    last_id = 0
+    while True:
+        args = (parent_id, last_id, page_size) if parent_col else (last_id, page_size)
+        cursor = conn_getter().execute(sql, args)
+        page = cursor.fetchall()
+        cursor.close()
+        for row_id, name, is_default, data in page:
+            yield PibRow(row_id, name, is_default != 0, data)
+        if len(page) < page_size:
+            return
+        last_id = page[-1][0]
+
+
+def _load_blob(pib, table: str, column: str, row_id: int) -> bytes:
+    # Load a blob column of a record that was created without it
+    cursor = pib.conn.execute(f'SELECT {column} FROM {table} WHERE id=?', (row_id,))
+    data = cursor.fetchone()
+    cursor.close()
+    if not data:
+        raise KeyError(f'{table} row {row_id} no longer exists')
+    return data[0]
+
+
+def _encoded(name) -> bytes:
+    if isinstance(name, bytes):
+        return name
+    if isinstance(name, memoryview):
+        return bytes(name)
+    return name_to_bytes(name)
+
+
+class Certificate:
+    """
+    A Certificate record. The Name is kept encoded and decoded on first access, and the
+    certificate data is only loaded from the database when :attr:`data` is accessed.
 
     :ivar id: its id in the database.
     :vartype id: int
@@ -178,40 +293,52 @@ class Certificate(AbstractCertificate):
     :vartype key: :any:`FormalName`
     :ivar name: its Name.
     :vartype name: :any:`FormalName`
+    :ivar encoded_name: its encoded Name.
+    :vartype encoded_name: bytes
     :ivar data: the content.
     :vartype data: bytes
     :ivar is_default: whether this is the default Identity.
     :vartype is_default: bool
     """
-    id: int
-    _key: FormalName
-    _name: FormalName
-    _data: BinaryStr
-    is_default: bool
+    __slots__ = ('id', 'is_default', '_pib', '_key', '_name_bytes', '_name', '_data')
 
     @property
     def name(self) -> FormalName:
+        if self._name is None:
+            self._name = Name.from_bytes(self._name_bytes)
         return self._name
 
+    @property
+    def encoded_name(self) -> bytes:
+        return self._name_bytes
+
     @property
     def key(self) -> FormalName:
+        if isinstance(self._key, bytes):
+            self._key = Name.from_bytes(self._key)
         return self._key
 
     @property
     def data(self) -> BinaryStr:
+        if self._data is None:
+            self._data = _load_blob(self._pib, 'certificates', 'certificate_data', self.id)
         return self._data
 
-    def __init__(self, row_id: int, key: FormalName, name: FormalName, data: BinaryStr, is_default: bool):
+    def __init__(self, row_id: int, key, name, data: Optional[BinaryStr] = None, is_default: bool = False,
+                 pib=None):
         self.id = row_id
+        self.is_default = is_default
+        self._pib = pib
         self._key = key
-        self._name = name
+        self._name_bytes = _encoded(name)
+        self._name = None
         self._data = data
-        self.is_default = is_default
 
 
-class Key(AbstractKey):
+class Key(Mapping):
     """
     A Key. It behaves like an immutable ``dict`` from :any:`FormalName` to :any:`Certificate`.
+    The key bits are only loaded from the database when :attr:`key_bits` is accessed.
 
     :ivar row_id: its id in the database.
     :vartype row_id: int
@@ -219,62 +346,80 @@ class Key(AbstractKey):
     :vartype identity: :any:`FormalName`.
     :ivar name: its Name.
     :vartype name: :any:`FormalName`
+    :ivar encoded_name: its encoded Name.
+    :vartype encoded_name: bytes
     :ivar key_bits: the key bits of the public key.
     :vartype key_bits: bytes
     :ivar is_default: whether this is the default Identity.
     :vartype is_default: bool
     """
-    row_id: int
-    _identity: FormalName
-    _name: FormalName
-    _key_bits: BinaryStr
-    is_default: bool
+    __slots__ = ('pib', 'row_id', 'is_default', '_identity', '_name_bytes', '_name', '_key_bits')
 
     @property
     def key_bits(self) -> BinaryStr:
+        if self._key_bits is None:
+            self._key_bits = _load_blob(self.pib, 'keys', 'key_bits', self.row_id)
         return self._key_bits
 
     @property
     def name(self) -> FormalName:
+        if self._name is None:
+            self._name = Name.from_bytes(self._name_bytes)
         return self._name
 
+    @property
+    def encoded_name(self) -> bytes:
+        return self._name_bytes
+
     @property
     def identity(self) -> FormalName:
         return self._identity
 
-    def __init__(self, pib, identity, row_id, name, key_bits, is_default):
+    def __init__(self, pib, identity, row_id, name, key_bits=None, is_default=False):
         self.pib = pib
         self._identity = identity
         self.row_id = row_id
-        self._name = name
+        self._name_bytes = _encoded(name)
+        self._name = None
         self._key_bits = key_bits
         self.is_default = is_default
 
     def __len__(self) -> int:
-        cursor = self.pib.conn.execute('SELECT count(*) FROM keys WHERE identity_id=?', (self.row_id,))
+        cursor = self.pib.conn.execute('SELECT count(*) FROM certificates WHERE key_id=?', (self.row_id,))
         ret = cursor.fetchone()[0]
         cursor.close()
         return ret
 
     def __getitem__(self, name: NonStrictName) -> Certificate:
-        name = Name.to_bytes(name)
-        sql = 'SELECT id, certificate_name, certificate_data, is_default FROM certificates WHERE certificate_name=?'
+        name = name_to_bytes(name)
+        cache = self.pib.cache
+        if cache is not None and (cert := cache.certs.get(name)) is not None:
+            return cert
+        sql = 'SELECT id, is_default FROM certificates WHERE certificate_name=?'
         cursor = self.pib.conn.execute(sql, (name,))
         data = cursor.fetchone()
         if not data:
             raise KeyError(name)
-        row_id, cert_name, cert_data, is_default = data
+        row_id, is_default = data
         cursor.close()
-        return Certificate(row_id=row_id, key=self._name, name=cert_name, data=cert_data, is_default=is_default != 0)
+        cert = Certificate(row_id=row_id, key=self.name, name=name, is_default=is_default != 0, pib=self.pib)
+        if cache is not None:
+            cache.certs[name] = cert
+        return cert
 
     def __iter__(self) -> Iterator[FormalName]:
-        cursor = self.pib.conn.execute('SELECT certificate_name FROM certificates WHERE key_id=?', (self.row_id,))
-        while True:
-            name = cursor.fetchone()
-            if not name:
-                break
-            yield Name.from_bytes(name[0])
-        cursor.close()
+        for row in self.rows():
+            yield Name.from_bytes(row.name)
+
+    def rows(self, with_data: bool = False, page_size: int = PAGE_SIZE) -> Iterator[PibRow]:
+        """
+        Iterate over its Certificates without decoding their Names.
+
+        :param with_data: whether to load the certificate data as well.
+        :param page_size: the number of rows fetched per query.
+        """
+        return iter_rows(lambda: self.pib.conn, 'certificates', 'certificate_name',
+                         'certificate_data' if with_data else None, 'key_id', self.row_id, page_size)
 
     def del_cert(self, name: NonStrictName):
         """
@@ -303,9 +448,11 @@ class Key(AbstractKey):
         :param name: the Name of the new default Certificate.
         :type name: :any:`NonStrictName`
         """
-        name = Name.to_bytes(name)
+        name = name_to_bytes(name)
         self.pib.conn.execute('UPDATE certificates SET is_default=1 WHERE certificate_name=?', (name,))
         self.pib.conn.commit()
+        if self.pib.cache is not None:
+            self.pib.cache.invalidate_certs(self.row_id, self.name)
 
     def default_cert(self) -> Certificate:
         """
@@ -313,18 +460,24 @@ class Key(AbstractKey):
 
         :return: the default Certificate.
         """
-        sql = ('SELECT id, certificate_name, certificate_data, is_default '
-               'FROM certificates WHERE is_default=1 AND key_id=?')
+        cache = self.pib.cache
+        if cache is not None and (cert := cache.default_certs.get(self.row_id)) is not None:
+            return cert
+        sql = 'SELECT id, certificate_name, is_default FROM certificates WHERE is_default=1 AND key_id=?'
         cursor = self.pib.conn.execute(sql, (self.row_id,))
         data = cursor.fetchone()
         if not data:
             raise KeyError('No default certificate')
-        row_id, cert_name, cert_data, is_default = data
+        row_id, cert_name, is_default = data
         cursor.close()
-        return Certificate(row_id=row_id, key=self._name, name=cert_name, data=cert_data, is_default=is_default != 0)
+        cert = Certificate(row_id=row_id, key=self.name, name=cert_name, is_default=is_default != 0,
+                           pib=self.pib)
+        if cache is not None:
+            cache.default_certs[self.row_id] = cert
+        return cert
 
 
-class Identity(AbstractIdentity):
+class Identity(Mapping):
     """
     An Identity. It behaves like an immutable ``dict`` from :any:`FormalName` to :any:`Key`.
 
@@ -332,21 +485,28 @@ class Identity(AbstractIdentity):
     :vartype row_id: int
     :ivar name: its Name.
     :vartype name: :any:`FormalName`
+    :ivar encoded_name: its encoded Name.
+    :vartype encoded_name: bytes
     :ivar is_default: whether this is the default Identity.
     :vartype is_default: bool
     """
-    row_id: int
-    _name: FormalName
-    is_default: bool
+    __slots__ = ('pib', 'row_id', 'is_default', '_name_bytes', '_name')
 
     @property
     def name(self) -> FormalName:
+        if self._name is None:
+            self._name = Name.from_bytes(self._name_bytes)
         return self._name
 
+    @property
+    def encoded_name(self) -> bytes:
+        return self._name_bytes
+
     def __init__(self, pib, row_id, name, is_default):
         self.pib = pib
         self.row_id = row_id
-        self._name = name
+        self._name_bytes = _encoded(name)
+        self._name = None
         self.is_default = is_default
 
     def __len__(self) -> int:
@@ -356,24 +516,34 @@ class Identity(AbstractIdentity):
         return ret
 
     def __getitem__(self, name: NonStrictName) -> Key:
-        name = Name.to_bytes(name)
-        cursor = self.pib.conn.execute('SELECT id, key_name, key_bits, is_default FROM keys WHERE key_name=?',
-                                       (name,))
+        name = name_to_bytes(name)
+        cache = self.pib.cache
+        if cache is not None and (key := cache.keys.get(name)) is not None:
+            return key
+        cursor = self.pib.conn.execute('SELECT id, is_default FROM keys WHERE key_name=?', (name,))
         data = cursor.fetchone()
         if not data:
             raise KeyError(name)
-        row_id, key_name, key_bits, is_default = data
+        row_id, is_default = data
         cursor.close()
-        return Key(self.pib, self._name, row_id, Name.from_bytes(key_name), key_bits, is_default != 0)
+        key = Key(self.pib, self.name, row_id, name, is_default=is_default != 0)
+        if cache is not None:
+            cache.keys[name] = key
+        return key
 
     def __iter__(self) -> Iterator[FormalName]:
-        cursor = self.pib.conn.execute('SELECT key_name FROM keys WHERE identity_id=?', (self.row_id,))
-        while True:
-            name = cursor.fetchone()
-            if not name:
-                break
-            yield Name.from_bytes(name[0])
-        cursor.close()
+        for row in self.rows():
+            yield Name.from_bytes(row.name)
+
+    def rows(self, with_data: bool = False, page_size: int = PAGE_SIZE) -> Iterator[PibRow]:
+        """
+        Iterate over its Keys without decoding their Names.
+
+        :param with_data: whether to load the key bits as well.
+        :param page_size: the number of rows fetched per query.
+        """
+        return iter_rows(lambda: self.pib.conn, 'keys', 'key_name',
+                         'key_bits' if with_data else None, 'identity_id', self.row_id, page_size)
 
     def del_key(self, name: NonStrictName):
         """
@@ -391,7 +561,7 @@ class Identity(AbstractIdentity):
         :param key_type: the type of the Key. Can be ``ec`` or ``rsa``.
         :return: the new Key.
         """
-        return self.pib.new_key(self._name, key_type=key_type)
+        return self.pib.new_key(self.name, key_type=key_type)
 
     def has_default_key(self) -> bool:
         """
@@ -411,9 +581,11 @@ class Identity(AbstractIdentity):
         :param name: the Name of the new default Key.
         :type name: :any:`NonStrictName`
         """
-        name = Name.to_bytes(name)
+        name = name_to_bytes(name)
         self.pib.conn.execute('UPDATE keys SET is_default=1 WHERE key_name=?', (name,))
         self.pib.conn.commit()
+        if self.pib.cache is not None:
+            self.pib.cache.invalidate_keys(self.row_id, self.name)
 
     def default_key(self) -> Key:
         """
@@ -421,19 +593,154 @@ class Identity(AbstractIdentity):
 
         :return: the default Key.
         """
-        sql = 'SELECT id, key_name, key_bits, is_default FROM keys WHERE is_default=1 AND identity_id=?'
+        cache = self.pib.cache
+        if cache is not None and (key := cache.default_keys.get(self.row_id)) is not None:
+            return key
+        sql = 'SELECT id, key_name, is_default FROM keys WHERE is_default=1 AND identity_id=?'
         cursor = self.pib.conn.execute(sql, (self.row_id,))
         data = cursor.fetchone()
         if not data:
             raise KeyError('No default key')
-        row_id, key_name, key_bits, is_default = data
+        row_id, key_name, is_default = data
         cursor.close()
-        return Key(self.pib, self._name, row_id, Name.from_bytes(key_name), key_bits, is_default != 0)
+        key = Key(self.pib, self.name, row_id, key_name, is_default=is_default != 0)
+        if cache is not None:
+            cache.default_keys[self.row_id] = key
+        return key
+
+
+# The records do not inherit from the abstract classes, which would give every instance a __dict__
+AbstractCertificate.register(Certificate)
+AbstractKey.register(Key)
+AbstractIdentity.register(Identity)
+
+
+class PibCache:
+    """
+    In-memory copies of the PIB rows looked up through a :class:`KeychainSqlite3`.
+    Entries are dropped by the methods of the same keychain that modify the corresponding rows,
+    so changes made by other processes are not seen. Cached objects must be treated as read-only.
+
+    :ivar identities: Identities by encoded Name.
+    :ivar keys: Keys by encoded Name.
+    :ivar certs: Certificates by encoded Name.
+    :ivar default_identity: the default Identity, if loaded.
+    :ivar default_keys: default Keys by Identity row id.
+    :ivar default_certs: default Certificates by Key row id.
+    """
+    identities: dict[bytes, Identity]
+    keys: dict[bytes, Key]
+    certs: dict[bytes, Certificate]
+    default_identity: Optional[Identity]
+    default_keys: dict[int, Key]
+    default_certs: dict[int, Certificate]
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.identities = {}
+        self.keys = {}
+        self.certs = {}
+        self.default_identity = None
+        self.default_keys = {}
+        self.default_certs = {}
+
+    def invalidate_identities(self):
+        """
+        Drop all Identities, used when the default Identity changes.
+        """
+        self.identities = {}
+        self.default_identity = None
+
+    def invalidate_keys(self, identity_id: int, id_name: FormalName):
+        """
+        Drop the Keys of an Identity, used when they are added, removed or their default changes.
+        """
+        self.default_keys.pop(identity_id, None)
+        for name, key in list(self.keys.items()):
+            if key.identity == id_name:
+                self.keys.pop(name, None)
+
+    def invalidate_certs(self, key_id: int, key_name: FormalName):
+        """
+        Drop the Certificates of a Key, used when they are added, removed or their default changes.
+        """
+        self.default_certs.pop(key_id, None)
+        for name in list(self.certs.keys()):
+            if Name.from_bytes(name)[:-2] == key_name:
+                self.certs.pop(name, None)
+
+
+class SignerCache:
+    """
+    A bounded LRU cache of signers by encoded KeyLocator Name.
+
+    :ivar maxsize: the maximum number of signers kept.
+    :vartype maxsize: int
+    :ivar hits: the number of lookups that found a signer.
+    :vartype hits: int
+    :ivar misses: the number of lookups that did not.
+    :vartype misses: int
+    """
+    maxsize: int
+    hits: int
+    misses: int
+
+    def __init__(self, maxsize: int = SIGNER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # KeyLocator Name -> (Key Name, signer)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key_locator: bytes):
+        with self._lock:
+            entry = self._entries.get(key_locator)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key_locator)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key_locator: bytes, key_name: bytes, signer):
+        with self._lock:
+            self._entries[key_locator] = (key_name, signer)
+            self._entries.move_to_end(key_locator)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_key(self, key_name: bytes):
+        """
+        Drop the signers using a Key, used when it is deleted.
+        """
+        with self._lock:
+            for key_locator, entry in list(self._entries.items()):
+                if entry[0] == key_name:
+                    del self._entries[key_locator]
+
+    def invalidate_locator(self, key_locator: bytes):
+        """
+        Drop the signer putting a KeyLocator, used when that Certificate is deleted.
+        """
+        with self._lock:
+            self._entries.pop(key_locator, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
 
 
 class KeychainSqlite3(Keychain):
     r"""
     Store public infomation in a Sqlite3 database and private keys in a TPM.
+    The database is used in WAL mode with one connection per thread,
+    so other threads and processes can read it while this one writes.
 
     :ivar path: the path to the database. The default path is ``~/.ndn/pib.db``.
     :vartype path: str
@@ -441,11 +748,16 @@ class KeychainSqlite3(Keychain):
     :vartype tpm: :class:`Tpm`
     :ivar tpm_locator: a URI string describing the location of TPM.
     :vartype tpm_locator: str
+    :ivar cache: the in-memory object cache, ``None`` if disabled.
+    :vartype cache: Optional[:class:`PibCache`]
+    :ivar signer_cache: the signers returned by :meth:`get_signer`.
+    :vartype signer_cache: :class:`SignerCache`
     """
     tpm: Tpm
     path: str
     tpm_locator: str
-    _signer_cache: dict
+    cache: Optional[PibCache]
+    signer_cache: SignerCache
 
     @staticmethod
     def initialize(path: str, tpm_scheme: str, tpm_path: str = '') -> bool:
@@ -462,29 +774,84 @@ class KeychainSqlite3(Keychain):
             os.makedirs(tpm_path, exist_ok=True)
         # Create sqlite3 database
         conn = sqlite3.connect(path)
+        conn.execute('PRAGMA journal_mode=WAL')
         conn.executescript(INITIALIZE_SQL)
+        conn.executescript(INDEX_SQL)
         conn.execute('INSERT INTO tpmInfo (tpm_locator) VALUES (?)', (f'{tpm_scheme}:{tpm_path}'.encode(),))
         conn.commit()
         conn.close()
         return True
 
-    def __init__(self, path: str, tpm: Tpm):
+    def __init__(self, path: str, tpm: Tpm, cache: bool = False, signer_cache_size: int = SIGNER_CACHE_SIZE):
+        """
+        :param path: the path to the database.
+        :param tpm: an instance of TPM.
+        :param cache: keep Identities, Keys and Certificates in memory after the first lookup.
+            Only use it when no other process modifies the PIB, and from a single thread: the cache has no lock,
+            so it must not be combined with :class:`AsyncKeychain`.
+        :param signer_cache_size: the maximum number of signers kept by :meth:`get_signer`.
+        """
         self.path = path
-        self.conn = sqlite3.connect(path)
+        self._local = threading.local()
+        self._conns_lock = threading.Lock()
+        self._conns = []
         cursor = self.conn.execute('SELECT tpm_locator FROM tpmInfo')
         self.tpm_locator = cursor.fetchone()[0]
         cursor.close()
+        try:
+            # Migrate databases created before the secondary indexes existed
+            self.conn.executescript(INDEX_SQL)
+        except sqlite3.OperationalError as e:
+            logging.warning(f'Unable to create the indexes of PIB {self.path}: {e}')
         self.tpm = tpm
-        self._signer_cache = {}
+        self.cache = PibCache() if cache else None
+        self.signer_cache = SignerCache(signer_cache_size)
 
-    def __iter__(self) -> Iterator[FormalName]:
-        cursor = self.conn.execute('SELECT identity FROM identities')
-        while True:
-            name = cursor.fetchone()
-            if not name:
-                break
-            yield Name.from_bytes(name[0])
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """
+        The connection of the calling thread, opened on first use.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Only used by this thread, but shutdown() may close it from another one
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            try:
+                # Persistent in the database file, so this also migrates existing PIBs
+                conn.execute('PRAGMA journal_mode=WAL')
+                # WAL stays consistent on power loss with NORMAL, it only skips the fsync per commit
+                conn.execute('PRAGMA synchronous=NORMAL')
+            except sqlite3.OperationalError as e:
+                logging.warning(f'Unable to switch PIB {self.path} to WAL mode: {e}')
+            with self._conns_lock:
+                self._conns.append(conn)
+            self._local.conn = conn
+        return conn
+
+    @property
+    def data_version(self) -> tuple[int, int, int]:
+        """
+        A value that changes whenever the PIB is modified, by the calling thread or by another connection
+        (another thread or process). Results derived from the PIB content can be cached against it.
+        """
+        conn = self.conn
+        cursor = conn.execute('PRAGMA data_version')
+        version = cursor.fetchone()[0]
         cursor.close()
+        # data_version only reflects commits of other connections, total_changes covers this one
+        return id(conn), conn.total_changes, version
+
+    def __iter__(self) -> Iterator[FormalName]:
+        for row in self.rows():
+            yield Name.from_bytes(row.name)
+
+    def rows(self, page_size: int = PAGE_SIZE) -> Iterator[PibRow]:
+        """
+        Iterate over the Identities without decoding their Names.
+
+        :param page_size: the number of rows fetched per query.
+        """
+        return iter_rows(lambda: self.conn, 'identities', 'identity', page_size=page_size)
 
     def __len__(self) -> int:
         cursor = self.conn.execute('SELECT count(*) FROM identities')
@@ -493,14 +860,19 @@ class KeychainSqlite3(Keychain):
         return ret
 
     def __getitem__(self, name: NonStrictName) -> Identity:
-        name = Name.to_bytes(name)
+        name = name_to_bytes(name)
+        if self.cache is not None and (identity := self.cache.identities.get(name)) is not None:
+            return identity
         cursor = self.conn.execute('SELECT id, identity, is_default FROM identities WHERE identity=?', (name,))
         data = cursor.fetchone()
         if not data:
             raise KeyError(name)
         row_id, identity, is_default = data
         cursor.close()
-        return Identity(self, row_id, Name.from_bytes(identity), is_default != 0)
+        identity = Identity(self, row_id, identity, is_default != 0)
+        if self.cache is not None:
+            self.cache.identities[name] = identity
+        return identity
 
     def has_default_identity(self) -> bool:
         """
@@ -519,9 +891,11 @@ class KeychainSqlite3(Keychain):
         :param name: the Name of the new default Identity.
         :type name: :any:`NonStrictName`
         """
-        name = Name.to_bytes(name)
+        name = name_to_bytes(name)
         self.conn.execute('UPDATE identities SET is_default=1 WHERE identity=?', (name,))
         self.conn.commit()
+        if self.cache is not None:
+            self.cache.invalidate_identities()
 
     def default_identity(self) -> Identity:
         """
@@ -529,13 +903,18 @@ class KeychainSqlite3(Keychain):
 
         :return: the default Identity.
         """
+        if self.cache is not None and self.cache.default_identity is not None:
+            return self.cache.default_identity
         cursor = self.conn.execute('SELECT id, identity, is_default FROM identities WHERE is_default=1')
         data = cursor.fetchone()
         if not data:
             raise KeyError('No default identity')
         row_id, identity, is_default = data
         cursor.close()
-        return Identity(self, row_id, Name.from_bytes(identity), is_default != 0)
+        identity = Identity(self, row_id, identity, is_default != 0)
+        if self.cache is not None:
+            self.cache.default_identity = identity
+        return identity
 
     def new_identity(self, name: NonStrictName) -> Identity:
         """
@@ -546,10 +925,12 @@ class KeychainSqlite3(Keychain):
         :type name: :any:`NonStrictName`
         :return: the Identity created.
         """
-        name = Name.to_bytes(name)
+        name = name_to_bytes(name)
         if name not in self:
             self.conn.execute('INSERT INTO identities (identity) VALUES (?)', (name,))
             self.conn.commit()
+            if self.cache is not None:
+                self.cache.invalidate_identities()
         else:
             raise KeyError(f'Identity {Name.to_str(name)} already exists')
         if not self.has_default_identity():
@@ -565,25 +946,30 @@ class KeychainSqlite3(Keychain):
         :type id_name: :any:`NonStrictName`
         :return: the specified Identity.
         """
-        name = Name.to_bytes(id_name)
+        name = name_to_bytes(id_name)
         if name not in self:
             self.conn.execute('INSERT INTO identities (identity) VALUES (?)', (name,))
             self.conn.commit()
+            if self.cache is not None:
+                self.cache.invalidate_identities()
             self.new_key(name)
         if not self.has_default_identity():
             self.set_default_identity(name)
         return self[name]
 
     def __del__(self):
-        if self.conn is not None:
+        if getattr(self, '_conns', None):
             self.shutdown()
 
     def shutdown(self):
         """
-        Close the connection.
+        Close the connections of all threads.
         """
-        self.conn.close()
-        self.conn = None
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+        self._local = threading.local()
 
     def del_identity(self, name: NonStrictName):
         """
@@ -592,16 +978,15 @@ class KeychainSqlite3(Keychain):
         :param name: the Identity Name.
         :type name: :any:`NonStrictName`
         """
-        name = Name.to_bytes(name)
+        name = name_to_bytes(name)
         for key_name in self[name]:
             self.del_key(key_name)
         self.conn.execute('DELETE FROM identities WHERE identity=?', (name,))
         self.conn.commit()
-        self._signer_cache = {}
+        if self.cache is not None:
+            self.cache.invalidate_identities()
 
     def get_signer(self, sign_args: dict[str, Any]):
-        print("IN GET SIGNER")
-        print(sign_args)
         if sign_args.get('no_signature', False):
             return None
         if sign_args.get('digest_sha256', False):
@@ -625,23 +1010,44 @@ class KeychainSqlite3(Keychain):
                 cert_name = key_name.default_cert().name
                 key_name = key_name.name
             else:
+                key_name = Name.normalize(key_name)
                 id_name = key_name[:-2]
                 cert_name = self[id_name][key_name].default_cert().name
         elif isinstance(cert_name, Certificate):
             cert_name = cert_name.name
             key_name = cert_name[:-2]
         else:
+            cert_name = Name.normalize(cert_name)
             key_name = cert_name[:-2]
         key_locator_name = sign_args.get('key_locator', None)
         if not key_locator_name:
             key_locator_name = cert_name
-        key_locator_bytes = Name.to_bytes(key_locator_name)
-        signer = self._signer_cache.get(key_locator_bytes, None)
+        key_locator_bytes = name_to_bytes(key_locator_name)
+        signer = self.signer_cache.get(key_locator_bytes)
         if not signer:
             signer = self.tpm.get_signer(key_name, key_locator_name)
-            self._signer_cache[key_locator_bytes] = signer
+            self.signer_cache.put(key_locator_bytes, name_to_bytes(key_name), signer)
         return signer
 
+    def prewarm_signers(self, certs: Iterable) -> int:
+        """
+        Load the signers of Certificates ahead of the first packets to sign,
+        e.g. every Certificate that ``checker.suggest`` can return for the routes of a producer.
+
+        :param certs: the Certificates or their Names.
+        :return: the number of signers loaded.
+        """
+        count = 0
+        for cert in certs:
+            try:
+                self.get_signer({'cert': cert})
+            except KeyError:
+                cert_name = cert.name if isinstance(cert, Certificate) else cert
+                logging.warning(f'Unable to load the signer of {Name.to_str(cert_name)}')
+                continue
+            count += 1
+        return count
+
     def del_key(self, name: NonStrictName):
         """
         Delete a specific Key.
@@ -652,12 +1058,16 @@ class KeychainSqlite3(Keychain):
         formal_name = Name.normalize(name)
         name = Name.to_bytes(name)
         id_name = formal_name[:-2]
-        key = self[id_name][formal_name]
+        identity = self[id_name]
+        key = identity[formal_name]
         self.conn.execute('DELETE FROM certificates WHERE key_id=?', (key.row_id,))
         self.conn.execute('DELETE FROM keys WHERE key_name=?', (name,))
         self.conn.commit()
+        if self.cache is not None:
+            self.cache.invalidate_certs(key.row_id, key.name)
+            self.cache.invalidate_keys(identity.row_id, identity.name)
         self.tpm.delete_key(formal_name)
-        self._signer_cache = {}
+        self.signer_cache.invalidate_key(name)
 
     def del_cert(self, name: NonStrictName):
         """
@@ -666,10 +1076,12 @@ class KeychainSqlite3(Keychain):
         :param name: the Certificate Name.
         :type name: :any:`NonStrictName`
         """
-        name = Name.to_bytes(name)
+        name = name_to_bytes(name)
         self.conn.execute('DELETE FROM certificates WHERE certificate_name=?', (name,))
         self.conn.commit()
-        self._signer_cache = {}
+        if self.cache is not None:
+            self._invalidate_certs_of(Name.from_bytes(name)[:-2])
+        self.signer_cache.invalidate_locator(name)
 
     def new_key(self, id_name: NonStrictName, key_type: str = 'ec', **kwargs) -> Key:
         """
@@ -709,6 +1121,8 @@ class KeychainSqlite3(Keychain):
                           'VALUES ((SELECT id FROM keys WHERE key_name=?), ?, ?)',
                           (key_name, cert_name, bytes(cert_data)))
         self.conn.commit()
+        if self.cache is not None:
+            self.cache.invalidate_keys(identity.row_id, identity.name)
 
         if not identity.has_default_key():
             identity.set_default_key(key_name)
@@ -716,6 +1130,16 @@ class KeychainSqlite3(Keychain):
     
     #[Project code]:
     def sign_PoR(self, id_name: NonStrictName, key_name: NonStrictName, ta_key_name: NonStrictName, domain_name: NonStrictName) -> Key:
+        key, cert_name, cert_data = self._make_PoR(id_name, key_name, ta_key_name, domain_name)
+        self.conn.execute('INSERT INTO certificates (key_id, certificate_name, certificate_data)'
+                          'VALUES ((SELECT id FROM keys WHERE key_name=?), ?, ?)',
+                          (Name.to_bytes(key.name), cert_name, bytes(cert_data)))
+        self.conn.commit()
+        if self.cache is not None:
+            self.cache.invalidate_certs(key.row_id, key.name)
+
+    def _make_PoR(self, id_name: NonStrictName, key_name: NonStrictName, ta_key_name: NonStrictName,
+                  domain_name: NonStrictName) -> tuple[Key, bytes, BinaryStr]:
         #To sign a PoR we need to find the correct identity, the key to be signed, our trust anchor, and our domain name
 
         name = Name.normalize(id_name)
@@ -726,23 +1150,20 @@ class KeychainSqlite3(Keychain):
             raise KeyError(f'Identity {Name.to_str(key_name)} does not exist')
         key = identity[key_name]
 
+        cert_name, cert_data = sign_req_PoR(key_name, key.key_bits, self._PoR_signer(ta_key_name, domain_name),
+                                            domain_name)
+        return key, Name.to_bytes(cert_name), cert_data
+
+    def _PoR_signer(self, ta_key_name: NonStrictName, domain_name: NonStrictName):
         #Signer is the person that will sign the key name and pub_key
         #In the case of the PoR, it is our trust anchor
         signer = self.tpm.get_signer(ta_key_name)
-        
+
         #In this case, in the certificate, we need to specify the key locator name to the TA certificate (default is TA key name)
         #This is because the get_signer only works on key names not certificate names
         #So when the checker checks, it checks on cert names on the key locator field. Therefore it cannot be a key name but a cert name
         signer.key_locator_name = Name.to_str(self[domain_name][ta_key_name].default_cert().name)
-        cert_name, cert_data = sign_req_PoR(key_name, key.key_bits, signer, domain_name)
-        
-        key_name = Name.to_bytes(key_name)
-        cert_name = Name.to_bytes(cert_name)
-        self.conn.execute('INSERT INTO certificates (key_id, certificate_name, certificate_data)'
-                          'VALUES ((SELECT id FROM keys WHERE key_name=?), ?, ?)',
-                          (key_name, cert_name, bytes(cert_data)))
-        self.conn.commit()
-        
+        return signer
 
     def import_cert(self, key_name: NonStrictName, cert_name: NonStrictName, cert_data: BinaryStr):
         key_name = Name.to_bytes(key_name)
@@ -750,4 +1171,250 @@ class KeychainSqlite3(Keychain):
         self.conn.execute('INSERT INTO certificates (key_id, certificate_name, certificate_data)'
                           'VALUES ((SELECT id FROM keys WHERE key_name=?), ?, ?)',
                           (key_name, cert_name, bytes(cert_data)))
-        self.conn.commit()
\ No newline at end of file
+        self.conn.commit()
+        if self.cache is not None:
+            self._invalidate_certs_of(Name.from_bytes(key_name))
+
+    @staticmethod
+    def _prefix_range(prefix: NonStrictName) -> tuple[bytes, Optional[bytes]]:
+        # The lower and (exclusive) upper bound of the Name values starting with prefix
+        lower = b''.join(bytes(c) for c in Name.normalize(prefix))
+        upper = lower.rstrip(b'\xff')
+        if not upper:
+            return lower, None
+        return lower, upper[:-1] + bytes([upper[-1] + 1])
+
+    def _query_certs_by_prefix(self, prefix: NonStrictName, suffix_sql: str) -> sqlite3.Cursor:
+        lower, upper = self._prefix_range(prefix)
+        sql = ('SELECT certificates.id, key_name, certificate_name, certificates.is_default '
+               'FROM certificates JOIN keys ON certificates.key_id=keys.id '
+               f'WHERE {CERT_NAME_VALUE}>=?')
+        args = (lower,)
+        if upper is not None:
+            sql += f' AND {CERT_NAME_VALUE}<?'
+            args = (lower, upper)
+        return self.conn.execute(f'{sql} {suffix_sql}', args)
+
+    def find_certs(self, prefix: NonStrictName) -> Iterator[Certificate]:
+        """
+        Iterate over all Certificates under a Name prefix, in canonical Name order,
+        using a range scan of the Certificate Name index.
+
+        :param prefix: the Name prefix.
+        :type prefix: :any:`NonStrictName`
+        """
+        cursor = self._query_certs_by_prefix(prefix, f'ORDER BY {CERT_NAME_VALUE}')
+        try:
+            for row_id, key_name, cert_name, is_default in cursor:
+                yield Certificate(row_id=row_id, key=key_name, name=cert_name, is_default=is_default != 0, pib=self)
+        finally:
+            cursor.close()
+
+    def latest_cert(self, prefix: NonStrictName) -> Certificate:
+        """
+        Get the last Certificate under a Name prefix in canonical Name order.
+        When the prefix fixes everything but the version, e.g. a foreign Key Name followed by the
+        local domain for a PoR, this is the newest version.
+
+        :param prefix: the Name prefix.
+        :type prefix: :any:`NonStrictName`
+        :return: the Certificate.
+        :raises KeyError: there is no Certificate under the prefix.
+        """
+        cursor = self._query_certs_by_prefix(prefix, f'ORDER BY {CERT_NAME_VALUE} DESC LIMIT 1')
+        data = cursor.fetchone()
+        cursor.close()
+        if not data:
+            raise KeyError(f'No certificate under {Name.to_str(prefix)}')
+        row_id, key_name, cert_name, is_default = data
+        return Certificate(row_id=row_id, key=key_name, name=cert_name, is_default=is_default != 0, pib=self)
+
+    @contextmanager
+    def _bulk_transaction(self, *triggers: str):
+        """
+        Run a block of inserts as one transaction, with the given default-selection triggers dropped.
+        Instead of the triggers evaluating once per row, the defaults they would have picked
+        (the first row inserted for each parent) are set once at the end, then the triggers are restored.
+        DDL is transactional in Sqlite, so other connections never see the triggers missing.
+        """
+        conn = self.conn
+        if conn.in_transaction:
+            # Writes of this thread not committed yet, e.g. by a per-call method; BEGIN would fail within them
+            conn.commit()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            trigger_sql = []
+            last_ids = {}
+            for trigger in triggers:
+                table, _ = DEFAULT_INSERT_TRIGGERS[trigger]
+                cursor = conn.execute(f'SELECT coalesce(max(id), 0) FROM {table}')
+                last_ids[trigger] = cursor.fetchone()[0]
+                cursor.close()
+                cursor = conn.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name=?", (trigger,))
+                row = cursor.fetchone()
+                cursor.close()
+                if row:
+                    trigger_sql.append(row[0])
+                    conn.execute(f'DROP TRIGGER {trigger}')
+            yield conn
+            # Rows with an id above the previous maximum are the inserted ones
+            for trigger in triggers:
+                table, parent = DEFAULT_INSERT_TRIGGERS[trigger]
+                if parent is None:
+                    conn.execute(f'UPDATE {table} SET is_default=1 '
+                                 f'WHERE id=(SELECT min(id) FROM {table} WHERE id>?) '
+                                 f'AND NOT EXISTS (SELECT id FROM {table} WHERE is_default=1)',
+                                 (last_ids[trigger],))
+                else:
+                    conn.execute(f'UPDATE {table} SET is_default=1 WHERE id IN '
+                                 f'(SELECT min(id) FROM {table} WHERE id>? AND {parent} NOT IN '
+                                 f'(SELECT {parent} FROM {table} WHERE is_default=1) GROUP BY {parent})',
+                                 (last_ids[trigger],))
+            for sql in trigger_sql:
+                conn.execute(sql)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            if self.cache is not None:
+                self.cache.clear()
+
+    def import_certs(self, certs: Iterable[tuple[NonStrictName, NonStrictName, BinaryStr]]):
+        """
+        Import many Certificates in one transaction.
+
+        :param certs: tuples of (Key Name, Certificate Name, Certificate data).
+        """
+        rows = [(name_to_bytes(key_name), name_to_bytes(cert_name), bytes(cert_data))
+                for key_name, cert_name, cert_data in certs]
+        with self._bulk_transaction('cert_default_after_insert_trigger') as conn:
+            conn.executemany('INSERT INTO certificates (key_id, certificate_name, certificate_data)'
+                             'VALUES ((SELECT id FROM keys WHERE key_name=?), ?, ?)', rows)
+
+    def new_keys(self, keys: Iterable[tuple[NonStrictName, dict[str, Any]]], key_type: str = 'ec') -> list[Key]:
+        """
+        Generate many keys and their self-signed Certificates, and store them in one transaction.
+        Identities that do not exist yet are created.
+
+        :param keys: tuples of (Identity Name, keyword arguments of :meth:`new_key`).
+        :param key_type: the type of the keys, ``ec`` or ``rsa``.
+        :return: the new Keys.
+        """
+        generated = []
+        for id_name, kwargs in keys:
+            id_name = Name.normalize(id_name)
+            key_name, pub_key = self.tpm.generate_key(id_name, key_type, **kwargs)
+            cert_name, cert_data = self_sign(key_name, pub_key, self.tpm.get_signer(key_name))
+            generated.append((Name.to_bytes(id_name), Name.to_bytes(key_name), bytes(pub_key),
+                              Name.to_bytes(cert_name), bytes(cert_data)))
+        with self._bulk_transaction('identity_default_after_insert_trigger', 'key_default_after_insert_trigger',
+                                    'cert_default_after_insert_trigger') as conn:
+            conn.executemany('INSERT OR IGNORE INTO identities (identity) VALUES (?)',
+                             {(row[0],) for row in generated})
+            conn.executemany('INSERT INTO keys (identity_id, key_name, key_bits) '
+                             'VALUES ((SELECT id FROM identities WHERE identity=?), ?, ?)',
+                             [row[:3] for row in generated])
+            conn.executemany('INSERT INTO certificates (key_id, certificate_name, certificate_data)'
+                             'VALUES ((SELECT id FROM keys WHERE key_name=?), ?, ?)',
+                             [row[1:2] + row[3:] for row in generated])
+        return [self[Name.from_bytes(row[0])][row[1]] for row in generated]
+
+    def import_keys(self, keys: Iterable[tuple[NonStrictName, NonStrictName, BinaryStr, NonStrictName, BinaryStr]]):
+        """
+        Store many public keys with one Certificate each, e.g. the trust anchors of other domains,
+        in one transaction. Identities that do not exist yet are created.
+        The TPM is not involved, so these keys cannot sign.
+
+        :param keys: tuples of (Identity Name, Key Name, key bits, Certificate Name, Certificate data).
+        """
+        rows = [(name_to_bytes(id_name), name_to_bytes(key_name), bytes(key_bits),
+                 name_to_bytes(cert_name), bytes(cert_data))
+                for id_name, key_name, key_bits, cert_name, cert_data in keys]
+        with self._bulk_transaction('identity_default_after_insert_trigger', 'key_default_after_insert_trigger',
+                                    'cert_default_after_insert_trigger') as conn:
+            conn.executemany('INSERT OR IGNORE INTO identities (identity) VALUES (?)', {(row[0],) for row in rows})
+            conn.executemany('INSERT INTO keys (identity_id, key_name, key_bits) '
+                             'VALUES ((SELECT id FROM identities WHERE identity=?), ?, ?)',
+                             [row[:3] for row in rows])
+            conn.executemany('INSERT INTO certificates (key_id, certificate_name, certificate_data)'
+                             'VALUES ((SELECT id FROM keys WHERE key_name=?), ?, ?)',
+                             [row[1:2] + row[3:] for row in rows])
+
+    def sign_PoRs(self, requests: Iterable[tuple[NonStrictName, NonStrictName, NonStrictName, NonStrictName]],
+                  executor: Optional[Executor] = None):
+        """
+        Issue many PoRs and store them in one transaction.
+        The PoRs signed by the same trust anchor for the same domain are issued from one certificate template.
+
+        :param requests: tuples of the arguments of :meth:`sign_PoR`,
+            i.e. (foreign Identity, foreign Key, trust anchor Key, local domain).
+        :param executor: if given, the signatures are computed on it, e.g. a process pool.
+        """
+        groups = {}
+        for id_name, key_name, ta_key_name, domain_name in requests:
+            identity = self[id_name]
+            key = identity[key_name]
+            group = groups.setdefault((name_to_bytes(ta_key_name), name_to_bytes(domain_name)), [])
+            group.append((key.name, key.key_bits, domain_name))
+        rows = []
+        for (ta_key_name, domain_name), group in groups.items():
+            signer = self._PoR_signer(Name.from_bytes(ta_key_name), Name.from_bytes(domain_name))
+            for cert_name, cert_data in sign_req_PoRs(group, signer, executor):
+                rows.append((Name.to_bytes(cert_name[:-2]), Name.to_bytes(cert_name), bytes(cert_data)))
+        with self._bulk_transaction('cert_default_after_insert_trigger') as conn:
+            conn.executemany('INSERT INTO certificates (key_id, certificate_name, certificate_data)'
+                             'VALUES ((SELECT id FROM keys WHERE key_name=?), ?, ?)', rows)
+
+    def _invalidate_certs_of(self, key_name: FormalName):
+        try:
+            key = self[key_name[:-2]][key_name]
+        except KeyError:
+            return
+        self.cache.invalidate_certs(key.row_id, key.name)
+
+
+class AsyncKeychain:
+    """
+    Run the blocking operations of a :class:`KeychainSqlite3` on a dedicated thread,
+    so that database writes and key generation do not block the event loop.
+    Every method of the keychain is available as a coroutine of the same name.
+
+    :ivar keychain: the wrapped keychain, which can still be used synchronously.
+    :vartype keychain: :class:`KeychainSqlite3`
+
+    :examples:
+        .. code-block:: python3
+
+            akc = AsyncKeychain(keychain)
+            await akc.new_key('/lvs-test2', key_id=key_id)
+            await akc.sign_PoR(foreign_domain, foreign_key_name, ta_key_name, local_domain)
+            cert = await akc.run(lambda: keychain['/lvs-test'].default_key().default_cert())
+    """
+    keychain: KeychainSqlite3
+
+    def __init__(self, keychain: KeychainSqlite3):
+        self.keychain = keychain
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='keychain')
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Run ``func(*args, **kwargs)`` on the keychain thread.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.keychain, name)
+        if not callable(attr):
+            return attr
+
+        async def wrapper(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        return wrapper
+
+    def shutdown(self):
+        """
+        Wait for pending operations and stop the keychain thread.
+        """
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,460 @@
+#[Project code]:
+#In-memory loopback forwarder that stands in for NFD
+#It keeps a PIT, a FIB and an optional content store, and connects several NDNApp instances
+#either in one process (LoopbackFace) or over a local Unix socket (any unmodified script).
+#
+#Running the scripts of this repo against it, without NFD:
+#   python loopback_forwarder.py --socket /tmp/ndn-loopback.sock --prefix-link /lvs-test2=25:0.01
+#   NDN_CLIENT_TRANSPORT=unix:///tmp/ndn-loopback.sock python producer-id.py
+#   NDN_CLIENT_TRANSPORT=unix:///tmp/ndn-loopback.sock python consumer-id.py
+#
+#Running several apps in one process:
+#   fwd = Forwarder(cs_size=1024)
+#   fwd.set_link('/lvs-test2', LinkConfig(delay=25))
+#   producer = NDNApp(face=LoopbackFace(fwd), keychain=keychain)
+#   consumer = NDNApp(face=LoopbackFace(fwd), keychain=keychain)
+
+import abc
+import argparse
+import asyncio as aio
+import hashlib
+import io
+import logging
+import os
+import random
+import stat
+import struct
+from collections import OrderedDict
+from typing import Optional
+from ndn.encoding import Name, Component, FormalName, NonStrictName, BinaryStr, TypeNumber, LpTypeNumber, \
+    MetaInfo, DecodeError, parse_interest, parse_data, parse_tl_num, make_data, get_tl_num_size, write_tl_num
+from ndn.encoding.ndnlp_v2 import NackReason, parse_lp_packet, make_network_nack
+from ndn.encoding.tlv_var import read_tl_num_from_stream
+from ndn.app_support.nfd_mgmt import ControlParameters, ControlResponse
+from ndn.name_tree import NameTrie
+from ndn.security import DigestSha256Signer
+from ndn.transport.face import Face
+
+
+MGMT_PREFIXES = (Name.from_str('/localhost/nfd'), Name.from_str('/localhop/nfd'))
+RIB_COMPONENT = Component.from_str('rib')
+REGISTER_COMPONENT = Component.from_str('register')
+UNREGISTER_COMPONENT = Component.from_str('unregister')
+DEFAULT_INTEREST_LIFETIME = 4000
+
+
+def _implicit_digest(wire: bytes) -> bytes:
+    return bytes(Component.from_bytes(hashlib.sha256(wire).digest(), Component.TYPE_IMPLICIT_SHA256))
+
+
+class LinkConfig:
+    """
+    Emulated link properties, applied to every packet the forwarder sends over the link.
+
+    :ivar delay: one-way delay in milliseconds.
+    :vartype delay: float
+    :ivar loss: probability in ``[0, 1]`` that a packet is dropped.
+    :vartype loss: float
+    """
+    delay: float
+    loss: float
+
+    def __init__(self, delay: float = 0.0, loss: float = 0.0):
+        if delay < 0 or not 0.0 <= loss <= 1.0:
+            raise ValueError(f'Invalid link config: delay={delay} loss={loss}')
+        self.delay = delay
+        self.loss = loss
+
+    @staticmethod
+    def from_str(value: str) -> 'LinkConfig':
+        """
+        Parse ``DELAY[:LOSS]``, e.g. ``25`` or ``25:0.01``.
+        """
+        delay, _, loss = value.partition(':')
+        return LinkConfig(float(delay), float(loss) if loss else 0.0)
+
+    def combine(self, other: Optional['LinkConfig']) -> 'LinkConfig':
+        if other is None:
+            return self
+        return LinkConfig(self.delay + other.delay, 1.0 - (1.0 - self.loss) * (1.0 - other.loss))
+
+
+class ForwarderFace(abc.ABC):
+    """
+    The forwarder's side of a face. Subclasses only need to implement ``deliver``.
+    """
+    face_id: int = 0
+    link: LinkConfig
+
+    def __init__(self, link: Optional[LinkConfig] = None):
+        self.link = link if link is not None else LinkConfig()
+
+    @abc.abstractmethod
+    def deliver(self, wire: bytes):
+        """
+        Send a packet from the forwarder out of this face.
+        """
+        pass
+
+
+class LoopbackFace(Face, ForwarderFace):
+    """
+    An NDNApp face attached directly to a :class:`Forwarder` in the same event loop.
+    """
+    forwarder: 'Forwarder'
+
+    def __init__(self, forwarder: 'Forwarder', link: Optional[LinkConfig] = None):
+        Face.__init__(self)
+        ForwarderFace.__init__(self, link)
+        self.forwarder = forwarder
+        self._closed = None
+        #The loop only keeps weak references to tasks, pending deliveries are held here until done
+        self._deliveries = set()
+
+    async def open(self):
+        self._closed = aio.Event()
+        self.forwarder.add_face(self)
+        self.running = True
+
+    def shutdown(self):
+        if not self.running:
+            return
+        self.running = False
+        self.forwarder.remove_face(self)
+        if self._closed:
+            self._closed.set()
+
+    def send(self, data: BinaryStr):
+        if self.running:
+            self.forwarder.receive(self, data)
+
+    async def run(self):
+        await self._closed.wait()
+
+    def isLocalFace(self):
+        return True
+
+    def deliver(self, wire: bytes):
+        if self.running:
+            typ, _ = parse_tl_num(wire)
+            task = aio.create_task(self.callback(typ, wire))
+            self._deliveries.add(task)
+            task.add_done_callback(self._delivered)
+
+    def _delivered(self, task: aio.Task):
+        self._deliveries.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f'Delivery to face {self.face_id} failed', exc_info=task.exception())
+
+
+class _StreamFace(ForwarderFace):
+    def __init__(self, writer: aio.StreamWriter, link: Optional[LinkConfig] = None):
+        super().__init__(link)
+        self.writer = writer
+
+    def deliver(self, wire: bytes):
+        if not self.writer.is_closing():
+            self.writer.write(wire)
+
+
+class _PitEntry:
+    in_records: dict[ForwarderFace, float]
+    timer: Optional[aio.TimerHandle]
+
+    def __init__(self):
+        self.in_records = {}
+        self.timer = None
+
+
+class ContentStore:
+    """
+    An LRU content store indexed by Name.
+
+    :ivar capacity: the maximum number of Data packets kept.
+    :vartype capacity: int
+    """
+    capacity: int
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._trie = NameTrie()
+        self._lru = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def insert(self, name: FormalName, wire: bytes, freshness_period: Optional[int], now: float):
+        key = b''.join(name)
+        stale_at = now + freshness_period / 1000.0 if freshness_period else now
+        if key in self._lru:
+            self._lru.move_to_end(key)
+        elif len(self._lru) >= self.capacity:
+            _, (old_name, _, _) = self._lru.popitem(last=False)
+            del self._trie[old_name]
+        self._lru[key] = (name, wire, stale_at)
+        self._trie[name] = key
+
+    def find(self, name: FormalName, can_be_prefix: bool, must_be_fresh: bool, now: float) -> Optional[bytes]:
+        if name and Component.get_type(name[-1]) == Component.TYPE_IMPLICIT_SHA256:
+            # The Name of the Data plus the digest of the whole packet
+            key = self._trie.get(name[:-1])
+            if key is None or _implicit_digest(self._lru[key][1]) != name[-1]:
+                return None
+            keys = [key]
+        elif can_be_prefix:
+            if not self._trie.has_node(name):
+                return None
+            keys = self._trie.itervalues(prefix=name)
+        else:
+            key = self._trie.get(name)
+            keys = [key] if key is not None else []
+        for key in keys:
+            _, wire, stale_at = self._lru[key]
+            if must_be_fresh and stale_at <= now:
+                continue
+            self._lru.move_to_end(key)
+            return wire
+        return None
+
+
+class Forwarder:
+    """
+    A minimal NDN forwarder with a PIT, a FIB, an optional content store and emulated links.
+    It answers the ``rib/register`` and ``rib/unregister`` commands NDNApp sends to NFD,
+    so applications run against it unchanged.
+
+    :ivar cs: the content store, or ``None`` if caching is disabled.
+    :vartype cs: Optional[ContentStore]
+    :ivar counters: packet counters, named after NFD's general status.
+    :vartype counters: dict[str, int]
+    """
+    cs: Optional[ContentStore]
+    counters: dict[str, int]
+
+    def __init__(self, cs_size: int = 0, seed: Optional[int] = None):
+        self.cs = ContentStore(cs_size) if cs_size > 0 else None
+        self.counters = dict.fromkeys(('n_in_interests', 'n_in_data', 'n_in_nacks', 'n_out_interests',
+                                       'n_out_data', 'n_out_nacks', 'n_cs_hits', 'n_dropped'), 0)
+        self._faces = {}
+        self._next_face_id = 256
+        self._fib = NameTrie()
+        self._pit = {}
+        self._links = NameTrie()
+        self._rng = random.Random(seed)
+
+    def add_face(self, face: ForwarderFace) -> int:
+        face.face_id = self._next_face_id
+        self._next_face_id += 1
+        self._faces[face.face_id] = face
+        return face.face_id
+
+    def remove_face(self, face: ForwarderFace):
+        self._faces.pop(face.face_id, None)
+        for prefix, nexthops in list(self._fib.iteritems()):
+            if face in nexthops:
+                self.remove_route(prefix, face)
+        for entry in self._pit.values():
+            entry.in_records.pop(face, None)
+
+    def add_route(self, prefix: NonStrictName, face: ForwarderFace):
+        prefix = [bytes(c) for c in Name.normalize(prefix)]
+        nexthops = self._fib.setdefault(prefix, [])
+        if face not in nexthops:
+            nexthops.append(face)
+
+    def remove_route(self, prefix: NonStrictName, face: ForwarderFace):
+        prefix = [bytes(c) for c in Name.normalize(prefix)]
+        nexthops = self._fib.get(prefix, [])
+        if face in nexthops:
+            nexthops.remove(face)
+        if not nexthops and prefix in self._fib:
+            del self._fib[prefix]
+
+    def set_link(self, prefix: NonStrictName, link: LinkConfig):
+        """
+        Emulate a link for all packets under a prefix, e.g. the path to another domain.
+        It is applied on top of the link of the face the packet is sent to.
+        """
+        self._links[[bytes(c) for c in Name.normalize(prefix)]] = link
+
+    def receive(self, face: ForwarderFace, wire: BinaryStr):
+        wire = bytes(wire)
+        try:
+            typ, _ = parse_tl_num(wire)
+            if typ == LpTypeNumber.LP_PACKET:
+                nack_reason, fragment = parse_lp_packet(wire, with_tl=True)
+                if nack_reason is not None:
+                    self.counters['n_in_nacks'] += 1
+                    return
+                wire = bytes(fragment)
+                typ, _ = parse_tl_num(wire)
+            if typ == TypeNumber.INTEREST:
+                self._on_interest(face, wire)
+            elif typ == TypeNumber.DATA:
+                self._on_data(face, wire)
+        except (DecodeError, TypeError, ValueError, struct.error):
+            logging.warning(f'Loopback forwarder dropped an undecodable packet from face {face.face_id}')
+
+    def _send(self, face: ForwarderFace, wire: bytes, upstream_name: Optional[FormalName] = None):
+        # Prefix links emulate the path to the producer, so they do not apply to content store hits
+        link = face.link
+        if upstream_name is not None:
+            step = self._links.longest_prefix(upstream_name)
+            link = link.combine(step.value if step else None)
+        if link.loss and self._rng.random() < link.loss:
+            self.counters['n_dropped'] += 1
+            return
+        if link.delay:
+            aio.get_running_loop().call_later(link.delay / 1000.0, face.deliver, wire)
+        else:
+            face.deliver(wire)
+
+    def _on_interest(self, face: ForwarderFace, wire: bytes):
+        self.counters['n_in_interests'] += 1
+        name, param, _, _ = parse_interest(wire, with_tl=True)
+        name = [bytes(c) for c in name]
+        if any(name[:len(prefix)] == prefix for prefix in MGMT_PREFIXES):
+            self._on_command(face, name)
+            return
+        now = aio.get_running_loop().time()
+        if self.cs is not None:
+            data = self.cs.find(name, param.can_be_prefix, param.must_be_fresh, now)
+            if data is not None:
+                self.counters['n_cs_hits'] += 1
+                self.counters['n_out_data'] += 1
+                self._send(face, data)
+                return
+
+        lifetime = param.lifetime if param.lifetime is not None else DEFAULT_INTEREST_LIFETIME
+        pit_key = (b''.join(name), bool(param.can_be_prefix), bool(param.must_be_fresh))
+        entry = self._pit.get(pit_key)
+        if entry is not None:
+            # Aggregate: the Interest is already pending upstream
+            entry.in_records[face] = now + lifetime / 1000.0
+            return
+
+        step = self._fib.longest_prefix(name)
+        nexthops = [nh for nh in step.value if nh is not face] if step else []
+        if not nexthops:
+            self.counters['n_out_nacks'] += 1
+            self._send(face, make_network_nack(wire, NackReason.NO_ROUTE))
+            return
+        entry = _PitEntry()
+        entry.in_records[face] = now + lifetime / 1000.0
+        entry.timer = aio.get_running_loop().call_later(lifetime / 1000.0, self._pit.pop, pit_key, None)
+        self._pit[pit_key] = entry
+        for nexthop in nexthops:
+            self.counters['n_out_interests'] += 1
+            self._send(nexthop, wire, name)
+
+    def _on_data(self, face: ForwarderFace, wire: bytes):
+        self.counters['n_in_data'] += 1
+        name, meta_info, _, _ = parse_data(wire, with_tl=True)
+        name = [bytes(c) for c in name]
+        now = aio.get_running_loop().time()
+        # Candidate PIT keys: every proper prefix with CanBePrefix, the exact name, and the full name
+        # with the implicit digest
+        entries = []
+        for i in range(len(name) + 2):
+            key = b''.join(name[:i]) if i <= len(name) else b''.join(name) + _implicit_digest(wire)
+            for can_be_prefix in ((True,) if i < len(name) else (True, False)):
+                for must_be_fresh in (False, True):
+                    entry = self._pit.pop((key, can_be_prefix, must_be_fresh), None)
+                    if entry is not None:
+                        entries.append(entry)
+        if not entries:
+            return
+        if self.cs is not None:
+            self.cs.insert(name, wire, meta_info.freshness_period if meta_info else None, now)
+        downstream = set()
+        for entry in entries:
+            entry.timer.cancel()
+            downstream.update(f for f, expiry in entry.in_records.items() if expiry > now and f is not face)
+        for out_face in downstream:
+            self.counters['n_out_data'] += 1
+            self._send(out_face, wire, name)
+
+    def _on_command(self, face: ForwarderFace, name: FormalName):
+        response = ControlResponse()
+        if len(name) > 4 and name[2] == RIB_COMPONENT and name[3] in (REGISTER_COMPONENT, UNREGISTER_COMPONENT):
+            cp = ControlParameters.parse(Component.get_value(name[4])).cp
+            if name[3] == REGISTER_COMPONENT:
+                self.add_route(cp.name, face)
+            else:
+                self.remove_route(cp.name, face)
+            response.status_code = 200
+            response.status_text = 'OK'
+            response.name = cp.name
+            response.face_id = face.face_id
+        else:
+            response.status_code = 501
+            response.status_text = 'Unsupported command'
+        value = response.encode()
+        content = bytearray(1 + get_tl_num_size(len(value)) + len(value))
+        offset = write_tl_num(0x65, content)
+        offset += write_tl_num(len(value), content, offset)
+        content[offset:] = value
+        reply = make_data(name, MetaInfo(), content=content, signer=DigestSha256Signer())
+        face.deliver(bytes(reply))
+
+    async def serve_unix(self, path: str, link: Optional[LinkConfig] = None) -> aio.AbstractServer:
+        """
+        Accept NDN stream connections on a Unix socket, like ``/run/nfd.sock``.
+
+        :param path: the socket path.
+        :param link: the link config given to every accepted face.
+        """
+        async def on_connection(reader: aio.StreamReader, writer: aio.StreamWriter):
+            face = _StreamFace(writer, link)
+            self.add_face(face)
+            try:
+                while True:
+                    bio = io.BytesIO()
+                    await read_tl_num_from_stream(reader, bio)
+                    siz = await read_tl_num_from_stream(reader, bio)
+                    bio.write(await reader.readexactly(siz))
+                    self.receive(face, bio.getvalue())
+            except (aio.IncompleteReadError, ConnectionResetError):
+                pass
+            finally:
+                self.remove_face(face)
+                writer.close()
+
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+        return await aio.start_unix_server(on_connection, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='In-memory NDN forwarder for NFD-free testing')
+    parser.add_argument('--socket', default='/tmp/ndn-loopback.sock', help='Unix socket path to listen on')
+    parser.add_argument('--cs-size', type=int, default=0, help='content store capacity, 0 disables caching')
+    parser.add_argument('--link', default='0', help='DELAY[:LOSS] of every face, delay in ms')
+    parser.add_argument('--prefix-link', action='append', default=[], metavar='PREFIX=DELAY[:LOSS]',
+                        help='extra delay/loss for packets under PREFIX, e.g. /lvs-test2=25:0.01')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the loss generator')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='[{asctime}]{levelname}:{message}',
+                        datefmt='%Y-%m-%d %H:%M:%S',
+                        level=logging.INFO,
+                        style='{')
+
+    async def run():
+        fwd = Forwarder(cs_size=args.cs_size, seed=args.seed)
+        for rule in args.prefix_link:
+            prefix, _, link = rule.partition('=')
+            fwd.set_link(prefix, LinkConfig.from_str(link))
+        server = await fwd.serve_unix(args.socket, LinkConfig.from_str(args.link))
+        print(f'Loopback forwarder listening on unix://{args.socket}')
+        async with server:
+            await server.serve_forever()
+
+    try:
+        aio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
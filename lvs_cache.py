@@ -0,0 +1,229 @@
+#[Project code]:
+#On-disk cache of compiled LVS models and of their trust anchor sanity checks
+#A model is compiled once, saved in the binary LVS format under a hash of the LVS text and the user functions,
+#and later processes load the binary model instead of compiling it. The anchors that passed the sanity check
+#of lvs_validator are recorded next to the model, so the check is skipped for them afterwards.
+#
+#   cache = LvsCache()
+#   checker = cache.checker(lvs_text, user_fns)
+#   cache.check_anchor(checker, trust_anchor.data)
+#   validator = lvs_validator(checker, app, trust_anchor.data, sanity_checked=True)
+#
+#   suggestions = SuggestCache(checker, keychain)
+#   sign_cert_name = suggestions.suggest(data_name)
+#
+#   python lvs_cache.py schema.lvs
+
+import argparse
+import hashlib
+import logging
+import marshal
+import os
+import tempfile
+import time
+import weakref
+from collections import OrderedDict
+from typing import Optional
+from ndn.encoding import BinaryStr, DecodeError, FormalName, NonStrictName
+from ndn.security.keychain import Keychain
+from ndn.app_support.light_versec import compile_lvs, Checker, DEFAULT_USER_FNS, LvsModelError, binary
+from ndn.app_support.light_versec.checker import UserFn
+from ndn.app_support.light_versec.validator import sanity_check
+
+
+CACHE_DIR = os.environ.get('LVS_CACHE_DIR', os.path.expanduser('~/.ndn/lvs-cache'))
+
+
+def user_fns_digest(user_fns: dict[str, UserFn]) -> bytes:
+    """
+    Hash the names and the code of user functions, so that changing a function invalidates the cached checks.
+    """
+    digest = hashlib.sha256()
+    for fn_name in sorted(user_fns):
+        fn = user_fns[fn_name]
+        digest.update(fn_name.encode())
+        code = getattr(fn, '__code__', None)
+        digest.update(marshal.dumps(code) if code is not None else getattr(fn, '__qualname__', repr(fn)).encode())
+    return digest.digest()
+
+
+def model_key(lvs_text: str, user_fns: dict[str, UserFn]) -> str:
+    digest = hashlib.sha256(f'lvs-cache/{binary.VERSION}\n'.encode())
+    digest.update(lvs_text.encode())
+    digest.update(user_fns_digest(user_fns))
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, data: bytes):
+    #Concurrent workers may compile the same model, the last rename wins with identical content
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.lvs-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class LvsCache:
+    """
+    Cache of compiled LVS models and sanity-checked anchors in a directory.
+
+    :ivar cache_dir: the directory holding ``<key>.lvs`` models and ``<key>.anchors`` checked anchor digests.
+    :ivar hits: the number of models loaded from the cache.
+    :ivar misses: the number of models compiled.
+    """
+    cache_dir: str
+    hits: int
+    misses: int
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or CACHE_DIR
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._keys = weakref.WeakKeyDictionary()
+        self._checked = {}
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def checker(self, lvs_text: str, user_fns: dict[str, UserFn] = DEFAULT_USER_FNS) -> Checker:
+        """
+        Return a Checker for the LVS text, loading its compiled model from the cache if present.
+        """
+        key = model_key(lvs_text, user_fns)
+        path = self._path(key, '.lvs')
+        checker = None
+        try:
+            with open(path, 'rb') as f:
+                checker = Checker.load(f.read(), user_fns)
+            self.hits += 1
+        except FileNotFoundError:
+            pass
+        except (DecodeError, LvsModelError, IndexError, TypeError, ValueError) as e:
+            logging.warning(f'Ignoring the corrupted LVS model {path}: {e}')
+        if checker is None:
+            checker = Checker(compile_lvs(lvs_text), user_fns)
+            _write_atomic(path, checker.save())
+            self.misses += 1
+        self._keys[checker] = key
+        return checker
+
+    def _checked_anchors(self, key: str) -> set[bytes]:
+        if key not in self._checked:
+            try:
+                with open(self._path(key, '.anchors'), 'rb') as f:
+                    self._checked[key] = {bytes.fromhex(line.decode()) for line in f.read().split()}
+            except (FileNotFoundError, ValueError):
+                self._checked[key] = set()
+        return self._checked[key]
+
+    def check_anchor(self, checker: Checker, trust_anchor: BinaryStr) -> bool:
+        """
+        Run the lvs_validator sanity check of a checker returned by :meth:`checker` with a trust anchor,
+        unless it already passed for this model, these user functions and this exact anchor.
+
+        :return: whether the result came from the cache.
+        :raises ValueError: the sanity check failed.
+        """
+        key = self._keys.get(checker)
+        if key is None:
+            raise KeyError('The checker was not created by this cache')
+        anchor_digest = hashlib.sha256(trust_anchor).digest()
+        checked = self._checked_anchors(key)
+        if anchor_digest in checked:
+            return True
+        sanity_check(checker, trust_anchor)
+        checked.add(anchor_digest)
+        with open(self._path(key, '.anchors'), 'ab') as f:
+            f.write(anchor_digest.hex().encode() + b'\n')
+        return False
+
+
+class SuggestCache:
+    """
+    Memoized ``Checker.suggest``. The suggested signing certificate only depends on the LVS rules a packet Name
+    matches and on the values bound to their named patterns, so Names that only differ in other components
+    (e.g. the version added to each Data) share one suggestion. Suggestions are dropped when the keychain
+    changes, detected through its ``data_version`` if it has one; otherwise call :meth:`invalidate`.
+
+    :ivar checker: the checker making the suggestions.
+    :ivar keychain: the keychain the certificates are suggested from.
+    :ivar maxsize: the maximum number of suggestions kept.
+    :ivar hits: the number of suggestions served from the cache.
+    :ivar misses: the number of suggestions computed.
+    """
+    checker: Checker
+    keychain: Keychain
+    maxsize: int
+    hits: int
+    misses: int
+
+    def __init__(self, checker: Checker, keychain: Keychain, maxsize: int = 1024):
+        self.checker = checker
+        self.keychain = keychain
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._suggestions = OrderedDict()
+        self._version = self._keychain_version()
+
+    def _keychain_version(self):
+        return getattr(self.keychain, 'data_version', None)
+
+    def _pattern_key(self, pkt_name: NonStrictName) -> tuple:
+        return tuple((tuple(rule_names), tuple(sorted((tag, bytes(value)) for tag, value in context.items())))
+                     for rule_names, context in self.checker.match(pkt_name))
+
+    def invalidate(self):
+        """
+        Drop all suggestions, e.g. after certificates were added to or deleted from the keychain.
+        """
+        self._suggestions.clear()
+
+    def suggest(self, pkt_name: NonStrictName) -> Optional[FormalName]:
+        """
+        Suggest the certificate to sign a packet with, as ``checker.suggest(pkt_name, keychain)`` does.
+        """
+        version = self._keychain_version()
+        if version != self._version:
+            self.invalidate()
+            self._version = version
+        key = self._pattern_key(pkt_name)
+        if key in self._suggestions:
+            self._suggestions.move_to_end(key)
+            self.hits += 1
+            return self._suggestions[key]
+        cert_name = self.checker.suggest(pkt_name, self.keychain)
+        self.misses += 1
+        self._suggestions[key] = cert_name
+        if len(self._suggestions) > self.maxsize:
+            self._suggestions.popitem(last=False)
+        return cert_name
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile an LVS schema into the cache and time loading it')
+    parser.add_argument('schema', help='a file containing the LVS text')
+    parser.add_argument('--cache-dir', default=None, help=f'the cache directory (default: {CACHE_DIR})')
+    args = parser.parse_args()
+
+    with open(args.schema) as f:
+        lvs_text = f.read()
+    start = time.perf_counter()
+    Checker(compile_lvs(lvs_text), DEFAULT_USER_FNS)
+    compile_time = time.perf_counter() - start
+    cache = LvsCache(args.cache_dir)
+    cache.checker(lvs_text)
+    start = time.perf_counter()
+    checker = cache.checker(lvs_text)
+    load_time = time.perf_counter() - start
+    print(f'Model {model_key(lvs_text, DEFAULT_USER_FNS)} in {cache.cache_dir}')
+    print(f'Roots of trust: {checker.root_of_trust()}')
+    print(f'compile {compile_time * 1e3:.2f}ms, cached load {load_time * 1e3:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,445 @@
+#[Project code]:
+#Read-only, memory-mapped snapshot of the public part of a PIB
+#Exporting writes identities, keys, certificates and defaults into one immutable file indexed by encoded Name.
+#SnapshotKeychain maps it and serves lookups without SQL, certificate wire bytes are memoryview slices of the
+#mapping, so short-lived workers can start serving right away with app.put_raw_packet(cert.data).
+#
+#   python pib_snapshot.py export --pib /home/vince/.ndn/pib.db pib.snapshot
+#   python pib_snapshot.py info pib.snapshot
+#
+#   keychain = SnapshotKeychain('pib.snapshot', TpmFile('/home/vince/.ndn/ndnsec-key-file'))
+#   app = NDNApp(keychain=keychain)
+
+import argparse
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+from typing import Any, Iterator, Optional
+from ndn.encoding import Name, FormalName, NonStrictName
+from ndn.security import DigestSha256Signer
+from ndn.security.keychain import Keychain
+from ndn.security.keychain.keychain import AbstractCertificate, AbstractKey, AbstractIdentity
+from ndn.security.keychain.keychain_sqlite3 import SignerCache, iter_rows
+from ndn.security.tpm import Tpm
+
+
+MAGIC = b'NDNPIBS1'
+#magic, number of identities, keys and certificates, index of the default identity (-1 if none)
+HEADER = struct.Struct('<8sIIIi')
+#Name offset, Name length, first key, number of keys, default key
+IDENTITY_RECORD = struct.Struct('<IIIIi')
+#Name offset, Name length, key bits offset, key bits length, identity, first certificate, number of certificates,
+#default certificate
+KEY_RECORD = struct.Struct('<IIIIIIIi')
+#Name offset, Name length, data offset, data length, key
+CERT_RECORD = struct.Struct('<IIIII')
+INDEX_ENTRY = struct.Struct('<I')
+
+
+def export_snapshot(conn: sqlite3.Connection, path: str) -> tuple[int, int, int]:
+    """
+    Write the public part of a PIB to a snapshot file. The file is replaced atomically,
+    so workers that already mapped the previous snapshot keep a consistent view.
+
+    :param conn: a connection to the PIB, e.g. ``keychain.conn`` or one opened read-only.
+
+    :return: the number of identities, keys and certificates written.
+    """
+    identities = []  # (name, is_default, keys)
+    #Read everything in one transaction on one connection, so that a controller issuing or renewing PoRs
+    #meanwhile cannot leave the snapshot with a mix of two states, e.g. a default key without its certificate
+    conn.execute('BEGIN')
+    try:
+        for id_row in iter_rows(lambda: conn, 'identities', 'identity'):
+            keys = []  # (name, key bits, is_default, certs)
+            for key_row in iter_rows(lambda: conn, 'keys', 'key_name', 'key_bits', 'identity_id', id_row.row_id):
+                certs = [(cert_row.name, cert_row.data, cert_row.is_default)
+                         for cert_row in iter_rows(lambda: conn, 'certificates', 'certificate_name',
+                                                   'certificate_data', 'key_id', key_row.row_id)]
+                keys.append((key_row.name, key_row.data, key_row.is_default, certs))
+            identities.append((id_row.name, id_row.is_default, keys))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    n_ids = len(identities)
+    n_keys = sum(len(keys) for _, _, keys in identities)
+    n_certs = sum(len(certs) for _, _, keys in identities for *_, certs in keys)
+    blob_start = (HEADER.size + n_ids * IDENTITY_RECORD.size + n_keys * KEY_RECORD.size +
+                  n_certs * CERT_RECORD.size + (n_ids + n_keys + n_certs) * INDEX_ENTRY.size)
+    blobs = bytearray()
+
+    def add_blob(value: bytes) -> tuple[int, int]:
+        offset = blob_start + len(blobs)
+        blobs.extend(value)
+        return offset, len(value)
+
+    id_records = []
+    key_records = []
+    cert_records = []
+    id_names = []
+    key_names = []
+    cert_names = []
+    default_id = -1
+    for id_name, id_default, keys in identities:
+        id_index = len(id_records)
+        default_key = -1
+        first_key = len(key_records)
+        for key_name, key_bits, key_default, certs in keys:
+            key_index = len(key_records)
+            default_cert = -1
+            first_cert = len(cert_records)
+            for cert_name, cert_data, cert_default in certs:
+                if cert_default:
+                    default_cert = len(cert_records)
+                cert_records.append((*add_blob(cert_name), *add_blob(cert_data), key_index))
+                cert_names.append(bytes(cert_name))
+            if key_default:
+                default_key = key_index
+            key_records.append((*add_blob(key_name), *add_blob(key_bits), id_index, first_cert, len(certs),
+                                default_cert))
+            key_names.append(bytes(key_name))
+        if id_default:
+            default_id = id_index
+        id_records.append((*add_blob(id_name), first_key, len(keys), default_key))
+        id_names.append(bytes(id_name))
+
+    out = bytearray(HEADER.pack(MAGIC, n_ids, n_keys, n_certs, default_id))
+    for struct_type, records in ((IDENTITY_RECORD, id_records), (KEY_RECORD, key_records),
+                                 (CERT_RECORD, cert_records)):
+        for record in records:
+            out.extend(struct_type.pack(*record))
+    for names in (id_names, key_names, cert_names):
+        for index in sorted(range(len(names)), key=names.__getitem__):
+            out.extend(INDEX_ENTRY.pack(index))
+    out.extend(blobs)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.pib-snapshot-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(out)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return n_ids, n_keys, n_certs
+
+
+class SnapshotCertificate(AbstractCertificate):
+    """
+    A Certificate of a snapshot. ``data`` is a read-only memoryview into the mapped file.
+    """
+    def __init__(self, snapshot: 'SnapshotKeychain', index: int, is_default: bool):
+        self._snapshot = snapshot
+        self.index = index
+        self.is_default = is_default
+        self._name = None
+
+    @property
+    def encoded_name(self) -> memoryview:
+        name_off, name_len, _, _, _ = self._snapshot._cert_record(self.index)
+        return self._snapshot._view[name_off:name_off + name_len]
+
+    @property
+    def name(self) -> FormalName:
+        if self._name is None:
+            self._name = Name.from_bytes(self.encoded_name)
+        return self._name
+
+    @property
+    def key(self) -> FormalName:
+        return self._snapshot._key(self._snapshot._cert_record(self.index)[4]).name
+
+    @property
+    def data(self) -> memoryview:
+        _, _, data_off, data_len, _ = self._snapshot._cert_record(self.index)
+        return self._snapshot._view[data_off:data_off + data_len]
+
+
+class SnapshotKey(AbstractKey):
+    """
+    A Key of a snapshot. It behaves like an immutable ``dict`` from :any:`FormalName` to Certificate.
+    """
+    def __init__(self, snapshot: 'SnapshotKeychain', index: int):
+        self._snapshot = snapshot
+        self.index = index
+        (self._name_off, self._name_len, self._bits_off, self._bits_len, self._identity, self._first_cert,
+         self._n_certs, self._default_cert) = snapshot._key_record(index)
+        self.is_default = snapshot._identity_record(self._identity)[4] == index
+        self._name = None
+
+    @property
+    def name(self) -> FormalName:
+        if self._name is None:
+            self._name = Name.from_bytes(self._snapshot._view[self._name_off:self._name_off + self._name_len])
+        return self._name
+
+    @property
+    def identity(self) -> FormalName:
+        return self._snapshot._identity(self._identity).name
+
+    @property
+    def key_bits(self) -> memoryview:
+        return self._snapshot._view[self._bits_off:self._bits_off + self._bits_len]
+
+    def __len__(self) -> int:
+        return self._n_certs
+
+    def __iter__(self) -> Iterator[FormalName]:
+        for index in range(self._first_cert, self._first_cert + self._n_certs):
+            yield SnapshotCertificate(self._snapshot, index, index == self._default_cert).name
+
+    def __getitem__(self, name: NonStrictName) -> SnapshotCertificate:
+        index = self._snapshot._find(2, Name.to_bytes(name))
+        if index is None or not self._first_cert <= index < self._first_cert + self._n_certs:
+            raise KeyError(name)
+        return SnapshotCertificate(self._snapshot, index, index == self._default_cert)
+
+    def has_default_cert(self) -> bool:
+        return self._default_cert >= 0
+
+    def default_cert(self) -> SnapshotCertificate:
+        if self._default_cert < 0:
+            raise KeyError('No default certificate')
+        return SnapshotCertificate(self._snapshot, self._default_cert, True)
+
+
+class SnapshotIdentity(AbstractIdentity):
+    """
+    An Identity of a snapshot. It behaves like an immutable ``dict`` from :any:`FormalName` to Key.
+    """
+    def __init__(self, snapshot: 'SnapshotKeychain', index: int):
+        self._snapshot = snapshot
+        self.index = index
+        self._name_off, self._name_len, self._first_key, self._n_keys, self._default_key = \
+            snapshot._identity_record(index)
+        self.is_default = snapshot.default_identity_index == index
+        self._name = None
+
+    @property
+    def name(self) -> FormalName:
+        if self._name is None:
+            self._name = Name.from_bytes(self._snapshot._view[self._name_off:self._name_off + self._name_len])
+        return self._name
+
+    def __len__(self) -> int:
+        return self._n_keys
+
+    def __iter__(self) -> Iterator[FormalName]:
+        for index in range(self._first_key, self._first_key + self._n_keys):
+            yield self._snapshot._key(index).name
+
+    def __getitem__(self, name: NonStrictName) -> SnapshotKey:
+        index = self._snapshot._find(1, Name.to_bytes(name))
+        if index is None or not self._first_key <= index < self._first_key + self._n_keys:
+            raise KeyError(name)
+        return self._snapshot._key(index)
+
+    def has_default_key(self) -> bool:
+        return self._default_key >= 0
+
+    def default_key(self) -> SnapshotKey:
+        if self._default_key < 0:
+            raise KeyError('No default key')
+        return self._snapshot._key(self._default_key)
+
+
+class SnapshotKeychain(Keychain):
+    """
+    A read-only Keychain over a snapshot written by :func:`export_snapshot`.
+    Private keys stay in the TPM, which is only needed to sign.
+
+    :ivar path: the path to the snapshot.
+    :vartype path: str
+    :ivar tpm: an instance of TPM, ``None`` if this keychain is only used to look up certificates.
+    :vartype tpm: Optional[:class:`Tpm`]
+    :ivar signer_cache: the signers returned by :meth:`get_signer`.
+    :vartype signer_cache: :class:`SignerCache`
+    """
+    path: str
+    tpm: Optional[Tpm]
+    signer_cache: SignerCache
+
+    def __init__(self, path: str, tpm: Optional[Tpm] = None):
+        #The indexes are viewed in place as native unsigned ints, while snapshots are written little-endian
+        if sys.byteorder != 'little':
+            raise ValueError('PIB snapshots can only be mapped on little-endian hosts')
+        self.path = path
+        self.tpm = tpm
+        self.signer_cache = SignerCache()
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap).toreadonly()
+        magic, self.n_identities, self.n_keys, self.n_certs, self.default_identity_index = \
+            HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC:
+            self.shutdown()
+            raise ValueError(f'{path} is not a PIB snapshot')
+        self._id_start = HEADER.size
+        self._key_start = self._id_start + self.n_identities * IDENTITY_RECORD.size
+        self._cert_start = self._key_start + self.n_keys * KEY_RECORD.size
+        index_start = self._cert_start + self.n_certs * CERT_RECORD.size
+        # Sorted indexes, viewed as arrays of record numbers
+        sizes = (self.n_identities, self.n_keys, self.n_certs)
+        self._indexes = []
+        for size in sizes:
+            self._indexes.append(self._view[index_start:index_start + size * INDEX_ENTRY.size].cast('I'))
+            index_start += size * INDEX_ENTRY.size
+        self._name_of = (lambda i: self._identity_record(i)[:2],
+                         lambda i: self._key_record(i)[:2],
+                         lambda i: self._cert_record(i)[:2])
+
+    def _identity_record(self, index: int) -> tuple:
+        return IDENTITY_RECORD.unpack_from(self._view, self._id_start + index * IDENTITY_RECORD.size)
+
+    def _key_record(self, index: int) -> tuple:
+        return KEY_RECORD.unpack_from(self._view, self._key_start + index * KEY_RECORD.size)
+
+    def _cert_record(self, index: int) -> tuple:
+        return CERT_RECORD.unpack_from(self._view, self._cert_start + index * CERT_RECORD.size)
+
+    def _identity(self, index: int) -> SnapshotIdentity:
+        return SnapshotIdentity(self, index)
+
+    def _key(self, index: int) -> SnapshotKey:
+        return SnapshotKey(self, index)
+
+    def _find(self, table: int, name: bytes) -> Optional[int]:
+        # Binary search of an encoded Name in the sorted index of a table (0: identities, 1: keys, 2: certs)
+        index = self._indexes[table]
+        name_of = self._name_of[table]
+        lo, hi = 0, len(index)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name_off, name_len = name_of(index[mid])
+            probe = self._view[name_off:name_off + name_len]
+            if probe == name:
+                return index[mid]
+            if probe.tobytes() < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def __iter__(self) -> Iterator[FormalName]:
+        for index in range(self.n_identities):
+            yield self._identity(index).name
+
+    def __len__(self) -> int:
+        return self.n_identities
+
+    def __getitem__(self, name: NonStrictName) -> SnapshotIdentity:
+        index = self._find(0, Name.to_bytes(name))
+        if index is None:
+            raise KeyError(name)
+        return self._identity(index)
+
+    def cert(self, name: NonStrictName) -> SnapshotCertificate:
+        """
+        Look up a Certificate by Name without going through its Identity and Key.
+        """
+        index = self._find(2, Name.to_bytes(name))
+        if index is None:
+            raise KeyError(name)
+        default_cert = self._key_record(self._cert_record(index)[4])[7]
+        return SnapshotCertificate(self, index, index == default_cert)
+
+    def has_default_identity(self) -> bool:
+        return self.default_identity_index >= 0
+
+    def default_identity(self) -> SnapshotIdentity:
+        if self.default_identity_index < 0:
+            raise KeyError('No default identity')
+        return self._identity(self.default_identity_index)
+
+    def get_signer(self, sign_args: dict[str, Any]):
+        if sign_args.get('no_signature', False):
+            return None
+        if sign_args.get('digest_sha256', False):
+            return DigestSha256Signer()
+        cert_name = sign_args.get('cert', None)
+        if not cert_name:
+            key_name = sign_args.get('key', None)
+            if not key_name:
+                id_name = sign_args.get('identity', None)
+                identity = self[id_name] if id_name else self.default_identity()
+                key = identity.default_key()
+            else:
+                key_name = Name.normalize(key_name)
+                key = self[key_name[:-2]][key_name]
+            cert_name = key.default_cert().name
+        elif isinstance(cert_name, AbstractCertificate):
+            cert_name = cert_name.name
+        else:
+            cert_name = Name.normalize(cert_name)
+        key_name = cert_name[:-2]
+        key_locator_name = sign_args.get('key_locator', None) or cert_name
+        key_locator_bytes = Name.to_bytes(key_locator_name)
+        signer = self.signer_cache.get(key_locator_bytes)
+        if not signer:
+            if self.tpm is None:
+                raise KeyError(f'No TPM to sign with {Name.to_str(key_name)}')
+            signer = self.tpm.get_signer(key_name, key_locator_name)
+            self.signer_cache.put(key_locator_bytes, Name.to_bytes(key_name), signer)
+        return signer
+
+    def shutdown(self):
+        """
+        Unmap the snapshot. Certificate data obtained from it must not be used afterwards.
+        """
+        if self._mmap is None:
+            return
+        for index in getattr(self, '_indexes', []):
+            index.release()
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Slices handed out are still alive, the mapping is closed when they are collected
+            pass
+        self._mmap = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export and inspect read-only PIB snapshots')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='write a snapshot of a PIB')
+    export_parser.add_argument('--pib', default=os.path.expanduser('~/.ndn/pib.db'), help='the PIB database')
+    export_parser.add_argument('output', help='the snapshot file to write')
+    info_parser = subparsers.add_parser('info', help='list the content of a snapshot')
+    info_parser.add_argument('snapshot', help='the snapshot file')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        #Read-only, so that exporting neither changes the journal mode nor creates the indexes of KeychainSqlite3
+        conn = sqlite3.connect(f'file:{args.pib}?mode=ro', uri=True)
+        start = time.perf_counter()
+        try:
+            n_ids, n_keys, n_certs = export_snapshot(conn, args.output)
+        finally:
+            conn.close()
+        print(f'Exported {n_ids} identities, {n_keys} keys and {n_certs} certificates to {args.output} '
+              f'in {time.perf_counter() - start:.3f}s')
+    else:
+        start = time.perf_counter()
+        keychain = SnapshotKeychain(args.snapshot)
+        print(f'Opened in {(time.perf_counter() - start) * 1000:.2f}ms')
+        for id_name in keychain:
+            identity = keychain[id_name]
+            print(f'{"*" if identity.is_default else " "} {Name.to_str(id_name)}')
+            for key_name in identity:
+                key = identity[key_name]
+                print(f'  +->{"*" if key.is_default else " "} {Name.to_str(key_name)}')
+                for cert_name in key:
+                    cert = key[cert_name]
+                    print(f'       +->{"*" if cert.is_default else " "} {Name.to_str(cert_name)}')
+        keychain.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,8 @@ from ndn.utils import timestamp
 from ndn.encoding import Name, Component
 from ndn.security import TpmFile, KeychainSqlite3
 from ndn.app import NDNApp
-from ndn.app_support.light_versec import compile_lvs, Checker, DEFAULT_USER_FNS
+from ndn.app_support.light_versec import DEFAULT_USER_FNS
+from lvs_cache import LvsCache, SuggestCache
 
 
 logging.basicConfig(format='[{asctime}]{levelname}:{message}',
@@ -28,6 +29,7 @@ def main():
     basedir = os.path.dirname(os.path.abspath(sys.argv[0]))
     tpm_path = os.path.join(basedir, 'privKeys')
     pib_path = os.path.join(basedir, 'pib.db')
+    #The controllers write PoRs, keys and renewals into this PIB, so its rows are not cached (no cache=True)
     keychain = KeychainSqlite3("/home/vince/.ndn/pib.db", TpmFile("/home/vince/.ndn/ndnsec-key-file"))
 
     trust_anchor = keychain['/lvs-test'].default_key().default_cert()
@@ -37,17 +39,18 @@ def main():
     print(f'Admin name: {Name.to_str(admin_cert.name)}')
     print(f'Author name: {Name.to_str(author_cert.name)}')
 
-    lvs_model = compile_lvs(lvs_text)
-    checker = Checker(lvs_model, DEFAULT_USER_FNS)
-    # The following manual checks are listed for demonstration only.
-    # In real implementation they are automatically done
-    root_of_trust = checker.root_of_trust()
-    print(f'LVS model root of trust: {root_of_trust}')
-    print(f'LVS model user functions provided: {checker.validate_user_fns()}')
-    ta_matches = sum((m[0] for m in checker.match(trust_anchor.name)), start=[])
-    assert len(ta_matches) > 0
-    assert root_of_trust.issubset(ta_matches)
-    print(f'Trust anchor matches the root of trust: OK')
+    #The compiled model and the sanity check of the trust anchor are cached on disk across runs
+    lvs_cache = LvsCache()
+    checker = lvs_cache.checker(lvs_text, DEFAULT_USER_FNS)
+    print(f'LVS model root of trust: {checker.root_of_trust()}')
+    cached = lvs_cache.check_anchor(checker, trust_anchor.data)
+    print(f'Trust anchor matches the root of trust: OK{" (cached)" if cached else ""}')
+
+    #The signing cert only depends on the article route, not on the version added to each Data
+    suggestions = SuggestCache(checker, keychain)
+    #Load the signers of the certs suggested for the article routes before the first Interest arrives
+    route_certs = [suggestions.suggest(f'/lvs-test/article/vincent/{post}/v=0') for post in ('hello', 'world')]
+    print(f'Pre-warmed signers: {keychain.prewarm_signers(route_certs)}')
 
     app = NDNApp(keychain=keychain)
 
@@ -73,7 +76,7 @@ def main():
         print(f'>> I: {Name.to_str(name)}, {param}')
         content = "Hello,".encode()
         data_name = name + [Component.from_version(timestamp())]
-        sign_cert_name = checker.suggest(data_name, app.keychain)
+        sign_cert_name = suggestions.suggest(data_name)
         print(f'        Suggested signing cert: {Name.to_str(sign_cert_name)}')
         app.put_data(data_name, content=content, freshness_period=10000, cert=sign_cert_name)
         print(f'<< D: {Name.to_str(data_name)}')
@@ -85,7 +88,7 @@ def main():
         print(f'>> I: {Name.to_str(name)}, {param}')
         content = "world!".encode()
         data_name = name + [Component.from_version(timestamp())]
-        sign_cert_name = checker.suggest(data_name, app.keychain)
+        sign_cert_name = suggestions.suggest(data_name)
         print(f'        Suggested signing cert: {Name.to_str(sign_cert_name)}')
         app.put_data(data_name, content=content, freshness_period=10000, cert=sign_cert_name)
         print(f'<< D: {Name.to_str(data_name)}')
@@ -0,0 +1,249 @@
+#[Project code]:
+#Certificate revocation published by the domain controllers
+#A controller publishes under <domain>/REVOKED a Bloom filter of the SHA-256 digests of the certificates revoked in
+#its domain, signed by its trust anchor (see RevocationFilter in cascade_validator-modified.py). Validators ask for
+#<domain>/REVOKED/32=delta/v=<version they hold> and get the digests revoked since that version. Validators that
+#hold none ask for v=0 and get the full filter, those holding one from before the last rebuild are told to.
+#Responses are fresh for a short period, so forwarder caches answer the validators holding the same version.
+#The seed of the filter is picked so that no certificate of the keychain that is not revoked is a false positive.
+#Revoked digests are listed in a file, one hex digest per line, which the controller polls. To revoke a certificate:
+#
+#   python revocation.py /lvs-test/admin/ndn/KEY/%3A%DA.../lvs-test/v=1677033765106
+#   python revocation.py --digest 5f1c...e2 --domain /lvs-test2
+
+import os
+import sys
+import hashlib
+import logging
+import argparse
+from typing import Optional
+from ndn.utils import timestamp
+from ndn.encoding import Name, Component, FormalName, NonStrictName
+from ndn.app import NDNApp
+from ndn.security import TpmFile, KeychainSqlite3, DigestSha256Signer
+from ndn.security.keychain import Keychain
+from ndn.security.keychain.keychain_sqlite3 import iter_rows
+from ndn.security.validator.cascade_validator import RevocationFilter, RevocationUpdate, REVOCATION_COMPONENT, \
+    DELTA_COMPONENT
+
+
+#Freshness period of the filter in ms, i.e. how often validators refresh it
+REVOCATION_FRESHNESS = 10 * 1000
+REVOKED_DIR = os.environ.get('REVOKED_DIR', os.path.expanduser('~/.ndn/revoked'))
+#Seeds tried before giving up on a filter without false positives
+MAX_SEED_TRIES = 16
+
+
+def revoked_path(domain: NonStrictName) -> str:
+    return os.path.join(REVOKED_DIR, Name.to_str(domain).strip('/').replace('/', '_') + '.txt')
+
+
+def read_revoked(path: str) -> list[bytes]:
+    """
+    The revoked digests listed in a file, in order. Blank lines and lines starting with # are skipped, and anything
+    after the digest on a line is a comment.
+    """
+    digests = []
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return digests
+    for line in lines:
+        fields = line.split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        try:
+            digest = bytes.fromhex(fields[0])
+        except ValueError:
+            digest = b''
+        if len(digest) != 32:
+            logging.warning(f'{path}: {fields[0]} is not a SHA-256 digest, skipped')
+            continue
+        digests.append(digest)
+    return digests
+
+
+def revoke(path: str, digest: bytes, comment: str = ''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(f'{digest.hex()} {comment}'.rstrip() + '\n')
+
+
+class RevocationPublisher:
+    """
+    The revocation filter of a domain, and the digests revoked at each version since the filter was last built.
+    Revoking only adds to the filter. The filter is rebuilt, with a new seed, when a revocation is withdrawn, when
+    it is full, or when a certificate of the keychain that is not revoked becomes a false positive.
+
+    :ivar version: the current version of the filter.
+    :ivar rebuilt: the version of the last rebuild, deltas from before it are not available.
+    """
+    def __init__(self, keychain: Keychain, domain: NonStrictName, path: Optional[str] = None,
+                 freshness: int = REVOCATION_FRESHNESS):
+        self.keychain = keychain
+        self.domain = Name.normalize(domain)
+        self.prefix = self.domain + [REVOCATION_COMPONENT]
+        self.path = path if path is not None else revoked_path(domain)
+        self.freshness = freshness
+        self.revoked = []
+        self.filter = None
+        self.capacity = 0
+        self.version = 0
+        self.rebuilt = 0
+        #(version, digests revoked at that version) since the last rebuild
+        self._history = []
+        #Version held by the validator (0 for the full filter) -> signed response, only for versions with a delta
+        self._responses = {}
+        self._stat = None
+        self.refresh()
+
+    def _valid_digests(self) -> list[bytes]:
+        revoked = set(self.revoked)
+        rows = iter_rows(lambda: self.keychain.conn, 'certificates', 'certificate_name', 'certificate_data')
+        digests = (hashlib.sha256(row.data).digest() for row in rows)
+        return [digest for digest in digests if digest not in revoked]
+
+    def _rebuild(self, valid: list[bytes]):
+        self.capacity = max(64, 2 * len(self.revoked))
+        for _ in range(MAX_SEED_TRIES):
+            revoked_filter = RevocationFilter.for_capacity(self.capacity, os.urandom(16))
+            for digest in self.revoked:
+                revoked_filter.add(digest)
+            if not any(digest in revoked_filter for digest in valid):
+                break
+        else:
+            logging.warning(f'Revocation filter of {Name.to_str(self.domain)} has false positives')
+        self.filter = revoked_filter
+
+    def refresh(self) -> bool:
+        """
+        Reload the revoked digests if the file changed.
+
+        :return: whether a new version of the filter was made.
+        """
+        try:
+            st = os.stat(self.path)
+            stat = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stat = None
+        if self.filter is not None and stat == self._stat:
+            return False
+        self._stat = stat
+        revoked = list(dict.fromkeys(read_revoked(self.path)))
+        known = set(self.revoked)
+        added = [digest for digest in revoked if digest not in known]
+        if self.filter is not None and not added and len(revoked) == len(self.revoked):
+            return False
+        self.revoked = revoked
+        version = max(timestamp(), self.version + 1)
+        valid = self._valid_digests()
+        extended = False
+        if self.filter is not None and known.issubset(revoked) and len(revoked) <= self.capacity:
+            for digest in added:
+                self.filter.add(digest)
+            extended = not any(digest in self.filter for digest in valid)
+        if extended:
+            self._history.append((version, added))
+        else:
+            self._rebuild(valid)
+            self.rebuilt = version
+            self._history = []
+        self.version = version
+        self._responses = {}
+        logging.info(f'Revocation filter of {Name.to_str(self.domain)}: version {version}, '
+                     f'{len(revoked)} revoked certificates')
+        return True
+
+    def _known(self, have: int) -> bool:
+        #Whether a delta from this version can be made
+        return have == self.rebuilt or any(version == have for version, _ in self._history)
+
+    def _update(self, have: int) -> RevocationUpdate:
+        update = RevocationUpdate()
+        update.version = self.version
+        if self._known(have):
+            update.base_version = have
+            update.digests = [digest for version, added in self._history if version > have for digest in added]
+        else:
+            update.seed = self.filter.seed
+            update.hash_count = self.filter.hash_count
+            update.bits = bytes(self.filter.bits)
+        return update
+
+    def response(self, app: NDNApp, name: FormalName, have: int) -> bytes:
+        """
+        The signed Data answering an Interest for the changes since version ``have``.
+        The full filter is only signed and kept under ``v=0``. Any other version without a delta, e.g. one from
+        before the last rebuild, gets a hint carrying only the current version, which tells the validator to ask
+        for ``v=0``. The hint is signed with a SHA-256 digest and not kept, so arbitrary versions cost neither a
+        signature nor memory, and a forged hint can only make a validator fetch the full filter.
+        """
+        if have != 0 and not self._known(have):
+            hint = RevocationUpdate()
+            hint.version = self.version
+            return app.prepare_data(name + [Component.from_version(self.version)], hint.encode(),
+                                    freshness_period=self.freshness, signer=DigestSha256Signer())
+        wire = self._responses.get(have)
+        if wire is None:
+            update = self._update(have)
+            anchor = self.keychain[self.domain].default_key().default_cert()
+            wire = app.prepare_data(name + [Component.from_version(self.version)], update.encode(),
+                                    freshness_period=self.freshness,
+                                    signer=self.keychain.get_signer({'cert': anchor.name}))
+            self._responses[have] = wire
+        return wire
+
+
+def serve_revocations(app: NDNApp, publisher: RevocationPublisher):
+    """
+    Answer the Interests for <domain>/REVOKED/32=delta/v=<version held>.
+    """
+    prefix = publisher.prefix
+
+    @app.route(prefix)
+    def on_interest(name, _param, _app_param):
+        name = name[:len(prefix) + 2]
+        if (len(name) == len(prefix) + 2 and name[len(prefix)] == DELTA_COMPONENT
+                and Component.get_type(name[-1]) == Component.TYPE_VERSION):
+            have = Component.to_number(name[-1])
+        else:
+            #Not a delta request, e.g. <domain>/REVOKED by prefix, answer with the full filter
+            have = 0
+            name = prefix + [DELTA_COMPONENT, Component.from_version(0)]
+        app.put_raw_packet(publisher.response(app, name, have))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Revoke a certificate in the revocation filter of a domain')
+    parser.add_argument('cert', nargs='?', help='the Name of a certificate of the keychain')
+    parser.add_argument('--digest', default='', help='the SHA-256 digest of the certificate, in hex')
+    parser.add_argument('--domain', default='/lvs-test', help='the domain revoking it (default: /lvs-test)')
+    parser.add_argument('--file', default='', help='the revocation file (default: under ~/.ndn/revoked)')
+    args = parser.parse_args()
+    path = args.file or revoked_path(args.domain)
+    if args.digest:
+        try:
+            digest = bytes.fromhex(args.digest)
+        except ValueError:
+            digest = b''
+        if len(digest) != 32:
+            parser.error(f'{args.digest} is not a SHA-256 digest in hex')
+        revoke(path, digest)
+    elif args.cert:
+        keychain = KeychainSqlite3("/home/vince/.ndn/pib.db", TpmFile("/home/vince/.ndn/ndnsec-key-file"))
+        cert_name = Name.normalize(args.cert)
+        try:
+            cert = keychain[cert_name[:-4]][cert_name[:-2]][cert_name]
+        except KeyError:
+            print(f'{args.cert} is not in the keychain, give its --digest instead')
+            sys.exit(1)
+        digest = hashlib.sha256(bytes(cert.data)).digest()
+        revoke(path, digest, Name.to_str(cert_name))
+    else:
+        parser.error('give a certificate Name or --digest')
+    print(f'Revoked {digest.hex()} in {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -15,13 +15,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # -----------------------------------------------------------------------------
-from typing import Tuple
+import calendar
+from concurrent.futures import Executor
+from typing import Tuple, Optional, Iterable, List
 from datetime import datetime, timedelta
 from ..utils import timestamp
 from ..encoding import Component, Name, ModelField, TlvModel, ContentType, BytesField,\
     SignatureInfo, TypeNumber, RepeatedField, IncludeBase, MetaInfo, VarBinaryStr,\
-    get_tl_num_size, write_tl_num, parse_and_check_tl, FormalName
+    get_tl_num_size, write_tl_num, parse_and_check_tl, parse_tl_num, FormalName, NonStrictName, BinaryStr, DecodeError
 from ..encoding.ndn_format_0_3 import DataPacketValue
+from ..encoding.signer import Signer
 
 
 KEY_COMPONENT = Component.from_str('KEY')
@@ -84,6 +87,141 @@ def parse_certificate(wire) -> CertificateV2Value:
     return CertificateV2Value.parse(wire)
 
 
+def decode_validity_time(value: BinaryStr) -> int:
+    """
+    Convert a NotBefore or NotAfter value (``%Y%m%dT%H%M%S`` in UTC) into seconds since the epoch.
+
+    :raises DecodeError: the value is not in that format.
+    """
+    value = bytes(value)
+    if len(value) != 15 or value[8:9] != b'T' or not (value[:8] + value[9:]).isdigit():
+        raise DecodeError(f'Invalid validity time {value}')
+    return calendar.timegm((int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                            int(value[9:11]), int(value[11:13]), int(value[13:15])))
+
+
+def _find_tlv(buf: memoryview, start: int, end: int, typ: int) -> Optional[Tuple[int, int]]:
+    # The value offsets of the first TLV of type typ among the TLVs in buf[start:end]
+    offset = start
+    while offset < end:
+        tlv_type, size = parse_tl_num(buf, offset)
+        offset += size
+        length, size = parse_tl_num(buf, offset)
+        offset += size
+        if offset + length > end:
+            raise DecodeError(f'TLV {tlv_type} exceeds its parent')
+        if tlv_type == typ:
+            return offset, offset + length
+        offset += length
+    return None
+
+
+class CertificateView:
+    """
+    A lazy, read-only view of an encoded certificate.
+    The top-level TLVs are located once, every field is only decoded when it is accessed,
+    and values are ``memoryview`` slices of the wire instead of copies.
+    Use :any:`parse_certificate` when the full :class:`CertificateV2Value` is needed.
+
+    :param wire: the certificate Data, with its TL.
+    :raises DecodeError: the wire is not a Data packet with a Name.
+    """
+    __slots__ = ('wire', '_offsets', '_name', '_validity', '_window')
+
+    def __init__(self, wire: BinaryStr):
+        self.wire = memoryview(wire)
+        value = parse_and_check_tl(self.wire, TypeNumber.DATA)
+        start = len(self.wire) - len(value)
+        end = len(self.wire)
+        self._offsets = {}
+        offset = start
+        while offset < end:
+            tlv_type, size = parse_tl_num(self.wire, offset)
+            tl_start = offset
+            offset += size
+            length, size = parse_tl_num(self.wire, offset)
+            offset += size
+            if offset + length > end:
+                raise DecodeError(f'TLV {tlv_type} exceeds the Data packet')
+            self._offsets.setdefault(tlv_type, (tl_start, offset, offset + length))
+            offset += length
+        if TypeNumber.NAME not in self._offsets:
+            raise DecodeError('Certificate without Name')
+        self._name = None
+        self._validity = None
+        self._window = None
+
+    def _value(self, typ: int) -> Optional[memoryview]:
+        offsets = self._offsets.get(typ)
+        return self.wire[offsets[1]:offsets[2]] if offsets else None
+
+    @property
+    def encoded_name(self) -> memoryview:
+        tl_start, _, end = self._offsets[TypeNumber.NAME]
+        return self.wire[tl_start:end]
+
+    @property
+    def name(self) -> FormalName:
+        if self._name is None:
+            self._name = Name.from_bytes(self.encoded_name)
+        return self._name
+
+    @property
+    def key_bits(self) -> Optional[memoryview]:
+        return self._value(TypeNumber.CONTENT)
+
+    @property
+    def signature_info(self) -> Optional[memoryview]:
+        return self._value(TypeNumber.SIGNATURE_INFO)
+
+    @property
+    def signature_value(self) -> Optional[memoryview]:
+        return self._value(TypeNumber.SIGNATURE_VALUE)
+
+    def _validity_period(self) -> Tuple[Optional[memoryview], Optional[memoryview]]:
+        if self._validity is None:
+            not_before = not_after = None
+            offsets = self._offsets.get(TypeNumber.SIGNATURE_INFO)
+            if offsets:
+                period = _find_tlv(self.wire, offsets[1], offsets[2], SecurityV2TypeNumber.VALIDITY_PERIOD)
+                if period:
+                    if found := _find_tlv(self.wire, period[0], period[1], SecurityV2TypeNumber.NOT_BEFORE):
+                        not_before = self.wire[found[0]:found[1]]
+                    if found := _find_tlv(self.wire, period[0], period[1], SecurityV2TypeNumber.NOT_AFTER):
+                        not_after = self.wire[found[0]:found[1]]
+            self._validity = (not_before, not_after)
+        return self._validity
+
+    @property
+    def not_before(self) -> Optional[memoryview]:
+        """
+        The NotBefore of the ValidityPeriod as encoded, i.e. ``%Y%m%dT%H%M%S``, ``None`` if absent.
+        """
+        return self._validity_period()[0]
+
+    @property
+    def not_after(self) -> Optional[memoryview]:
+        """
+        The NotAfter of the ValidityPeriod as encoded, i.e. ``%Y%m%dT%H%M%S``, ``None`` if absent.
+        """
+        return self._validity_period()[1]
+
+    @property
+    def validity_window(self) -> Optional[Tuple[int, int]]:
+        """
+        The ValidityPeriod as seconds since the epoch ``(not_before, not_after)``, decoded once.
+        ``None`` if the certificate has no complete ValidityPeriod.
+
+        :raises DecodeError: the ValidityPeriod is malformed.
+        """
+        if self._window is None:
+            not_before, not_after = self._validity_period()
+            if not_before is None or not_after is None:
+                return None
+            self._window = (decode_validity_time(not_before), decode_validity_time(not_after))
+        return self._window
+
+
 def new_cert(key_name, issuer_id_component, pub_key, signer, start_time, end_time) -> Tuple[FormalName, VarBinaryStr]:
     cert_val = CertificateV2Value()
     cert_name = Name.normalize(key_name) + [issuer_id_component, Component.from_version(timestamp())]
@@ -136,3 +274,162 @@ def derive_cert(key_name, issuer_id, pub_key, signer, start_time, expire_sec) ->
     if isinstance(issuer_id, str):
         issuer_id = Component.from_str(issuer_id)
     return new_cert(key_name, issuer_id, pub_key, signer, start_time, end_time)
+
+
+def _encode_tlv(typ: int, value: BinaryStr) -> bytearray:
+    type_len = get_tl_num_size(typ)
+    size_len = get_tl_num_size(len(value))
+    buf = bytearray(type_len + size_len + len(value))
+    write_tl_num(typ, buf)
+    write_tl_num(len(value), buf, type_len)
+    buf[type_len + size_len:] = value
+    return buf
+
+
+def _sign_covered(signer: Signer, covered: bytes) -> bytes:
+    # Module level so that it can be sent to a process pool
+    buf = bytearray(signer.get_signature_value_size())
+    real_len = signer.write_signature_value(buf, [covered])
+    return bytes(buf[:real_len])
+
+
+_worker_signers = {}
+
+
+def _sign_covered_with_key(signer_type: type, key_der: bytes, covered: bytes) -> bytes:
+    # The KeyLocator is already in the encoded SignatureInfo, so the signer does not need it
+    signer = _worker_signers.get((signer_type, key_der))
+    if signer is None:
+        signer = _worker_signers[(signer_type, key_der)] = signer_type(b'', key_der)
+    return _sign_covered(signer, covered)
+
+
+class CertTemplate:
+    """
+    Issue many certificates with the same signer and validity period.
+    MetaInfo and SignatureInfo are encoded once, and every certificate is written into one preallocated
+    buffer, with only the Name, the key bits and the SignatureValue differing between certificates.
+    The result is the same as :any:`new_cert`.
+
+    :param signer: the signer of the issuer.
+    :param start_time: the NotBefore of the certificates.
+    :param end_time: the NotAfter of the certificates.
+    """
+    signer: Signer
+
+    def __init__(self, signer: Signer, start_time: datetime, end_time: datetime):
+        self.signer = signer
+        meta_info = MetaInfo(content_type=ContentType.KEY, freshness_period=3600000)
+        self._meta_info = _encode_tlv(TypeNumber.META_INFO, meta_info.encode())
+        sig_info = CertificateV2SignatureInfo()
+        signer.write_signature_info(sig_info)
+        sig_info.validity_period = ValidityPeriod()
+        sig_info.validity_period.not_before = start_time.strftime('%Y%m%dT%H%M%S').encode()
+        sig_info.validity_period.not_after = end_time.strftime('%Y%m%dT%H%M%S').encode()
+        self._sig_info = _encode_tlv(TypeNumber.SIGNATURE_INFO, sig_info.encode())
+        self._sig_size = signer.get_signature_value_size()
+        self._last_version = 0
+
+    def _next_version(self) -> int:
+        # Distinct versions, so the same key can be certified twice in a batch
+        self._last_version = max(timestamp(), self._last_version + 1)
+        return self._last_version
+
+    def _prepare(self, key_name, issuer_id, pub_key) -> Tuple[FormalName, bytearray, int, int]:
+        # Write everything but the SignatureValue, leaving room for the largest TLs
+        if isinstance(issuer_id, str):
+            issuer_id = Component.from_str(issuer_id)
+        cert_name = Name.normalize(key_name) + [issuer_id, Component.from_version(self._next_version())]
+        name_wire = Name.encode(cert_name)
+        content_type_len = get_tl_num_size(TypeNumber.CONTENT) + get_tl_num_size(len(pub_key))
+        covered_len = (len(name_wire) + len(self._meta_info) + content_type_len + len(pub_key) +
+                       len(self._sig_info))
+        sig_tl_len = get_tl_num_size(TypeNumber.SIGNATURE_VALUE) + get_tl_num_size(self._sig_size)
+        data_tl_len = get_tl_num_size(TypeNumber.DATA) + get_tl_num_size(covered_len + sig_tl_len + self._sig_size)
+        buf = bytearray(data_tl_len + covered_len + sig_tl_len + self._sig_size)
+        offset = data_tl_len
+        buf[offset:offset + len(name_wire)] = name_wire
+        offset += len(name_wire)
+        buf[offset:offset + len(self._meta_info)] = self._meta_info
+        offset += len(self._meta_info)
+        offset += write_tl_num(TypeNumber.CONTENT, buf, offset)
+        offset += write_tl_num(len(pub_key), buf, offset)
+        buf[offset:offset + len(pub_key)] = pub_key
+        offset += len(pub_key)
+        buf[offset:offset + len(self._sig_info)] = self._sig_info
+        return cert_name, buf, data_tl_len, covered_len
+
+    def _finish(self, buf: bytearray, data_tl_len: int, covered_len: int, signature: BinaryStr) -> bytearray:
+        # Write the SignatureValue and the Data TL, then trim the room left for the largest sizes
+        offset = data_tl_len + covered_len
+        offset += write_tl_num(TypeNumber.SIGNATURE_VALUE, buf, offset)
+        offset += write_tl_num(len(signature), buf, offset)
+        buf[offset:offset + len(signature)] = signature
+        end = offset + len(signature)
+        value_len = end - data_tl_len
+        start = data_tl_len - get_tl_num_size(TypeNumber.DATA) - get_tl_num_size(value_len)
+        offset = start + write_tl_num(TypeNumber.DATA, buf, start)
+        write_tl_num(value_len, buf, offset)
+        del buf[end:]
+        del buf[:start]
+        return buf
+
+    def issue(self, key_name, issuer_id, pub_key) -> Tuple[FormalName, VarBinaryStr]:
+        """
+        Issue one certificate, same arguments as :any:`new_cert`.
+        """
+        return self.issue_many([(key_name, issuer_id, pub_key)])[0]
+
+    def issue_many(self, requests: Iterable[Tuple[FormalName, BinaryStr, BinaryStr]],
+                   executor: Optional[Executor] = None) -> List[Tuple[FormalName, VarBinaryStr]]:
+        """
+        Issue a batch of certificates.
+
+        :param requests: tuples (key Name, issuer id, public key).
+        :param executor: if given, the signatures are computed on it, e.g. a process pool.
+        :return: (certificate Name, certificate Data) in the order of the requests.
+        """
+        prepared = [self._prepare(key_name, issuer_id, pub_key) for key_name, issuer_id, pub_key in requests]
+        covered = [memoryview(buf)[data_tl_len:data_tl_len + covered_len]
+                   for _, buf, data_tl_len, covered_len in prepared]
+        if executor is None:
+            signatures = [_sign_covered(self.signer, blk) for blk in covered]
+        else:
+            key_der = getattr(self.signer, 'key_der', None)
+            if key_der is not None:
+                # The key objects of the TPM signers cannot be pickled, so workers rebuild them from the key
+                args = ([type(self.signer)] * len(covered), [key_der] * len(covered))
+                sign_func = _sign_covered_with_key
+            else:
+                args = ([self.signer] * len(covered),)
+                sign_func = _sign_covered
+            signatures = list(executor.map(sign_func, *args, [bytes(blk) for blk in covered]))
+        for blk in covered:
+            blk.release()
+        return [(cert_name, self._finish(buf, data_tl_len, covered_len, signature))
+                for (cert_name, buf, data_tl_len, covered_len), signature in zip(prepared, signatures)]
+
+
+def derive_certs(requests: Iterable[Tuple[FormalName, BinaryStr, BinaryStr]], signer: Signer,
+                 start_time: datetime, expire_sec: int,
+                 executor: Optional[Executor] = None) -> List[Tuple[FormalName, VarBinaryStr]]:
+    """
+    Batch version of :any:`derive_cert`.
+
+    :param requests: tuples (key Name, issuer id, public key).
+    """
+    template = CertTemplate(signer, start_time, start_time + timedelta(seconds=expire_sec))
+    return template.issue_many(requests, executor)
+
+
+def sign_req_PoRs(requests: Iterable[Tuple[FormalName, BinaryStr, NonStrictName]], signer: Signer,
+                  executor: Optional[Executor] = None) -> List[Tuple[FormalName, VarBinaryStr]]:
+    """
+    Batch version of :any:`sign_req_PoR`, all PoRs share the same 10-day validity period.
+
+    :param requests: tuples (foreign key Name, foreign public key, local domain Name).
+    """
+    start_time = datetime.utcnow()
+    template = CertTemplate(signer, start_time, start_time + timedelta(days=10))
+    return template.issue_many([(key_name, Name.to_bytes(domain_name), pub_key)
+                                for key_name, pub_key, domain_name in requests], executor)
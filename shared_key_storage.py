@@ -0,0 +1,181 @@
+#[Project code]:
+#Verified-key storage shared by the consumer processes of a host
+#A fixed-size hash table in a memory-mapped file, so a key or PoR verified by one worker is used by all the others
+#instead of each worker fetching and verifying the same chains. Reads take no lock: every slot carries a sequence
+#number that is odd while the slot is written, and a read is retried when it changed during the copy.
+#Writes are serialized between processes with flock.
+#
+#Anyone who can write the file can make the validators accept a key, it is created readable and writable
+#by its owner only and must stay so. A file owned by another user, or open to group or others, is refused, since
+#another local user may have created it first in a shared directory such as /dev/shm.
+#
+#   storage = SharedKeyStorage('/dev/shm/ndn-keys')
+#   validator = lvs_validator(checker, app, trust_anchor.data, storage)
+
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from typing import Optional
+from ndn.encoding import FormalName, Name
+from ndn.security.validator.cascade_validator import PublicKeyStorage
+
+
+MAGIC = b'NDNKEYS1'
+#magic, number of slots, slot size
+HEADER = struct.Struct('<8sII')
+#sequence number, Name hash (0 if the slot is empty), NotAfter (0 if none), Name length, key length
+SLOT_HEADER = struct.Struct('<IQqHH')
+SEQ = struct.Struct('<I')
+SLOTS = 4096
+SLOT_SIZE = 1024
+#Slots probed from the home slot of a Name
+PROBES = 8
+#Attempts to read a slot that keeps being written before treating it as a miss
+READ_RETRIES = 16
+
+
+def _name_hash(name: bytes) -> int:
+    # Never 0, which marks an empty slot
+    return int.from_bytes(hashlib.blake2b(name, digest_size=8).digest(), 'little') | 1
+
+
+class SharedKeyStorage(PublicKeyStorage):
+    """
+    A :class:`PublicKeyStorage` in a memory-mapped file, shared by every process that opens the same path.
+    When all slots a Name can use are taken, the one expiring first is replaced.
+
+    :param path: the file, preferably on a tmpfs such as ``/dev/shm``. Created if it does not exist.
+        It must not be a symbolic link.
+    :param slots: the number of slots of a new file.
+    :param slot_size: the size of a slot of a new file, which bounds the size of a Name plus its key.
+    :raises PermissionError: the file belongs to another user or is accessible to group or others.
+    """
+    path: str
+    slots: int
+    slot_size: int
+
+    def __init__(self, path: str, slots: int = SLOTS, slot_size: int = SLOT_SIZE):
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            #The mode is only set if this process created the file
+            st = os.fstat(self._fd)
+            if st.st_uid != os.geteuid() or st.st_mode & 0o077:
+                raise PermissionError(f'{path} must be owned by this user and not accessible to others')
+            with self._write_lock():
+                if os.fstat(self._fd).st_size == 0:
+                    os.ftruncate(self._fd, HEADER.size + slots * slot_size)
+                    os.pwrite(self._fd, HEADER.pack(MAGIC, slots, slot_size), 0)
+                magic, self.slots, self.slot_size = HEADER.unpack(os.pread(self._fd, HEADER.size, 0))
+            if magic != MAGIC:
+                raise ValueError(f'{path} is not a shared key storage')
+            self._mmap = mmap.mmap(self._fd, HEADER.size + self.slots * self.slot_size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    @contextmanager
+    def _write_lock(self):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _offsets(self, name_hash: int):
+        home = name_hash % self.slots
+        for i in range(min(PROBES, self.slots)):
+            yield HEADER.size + (home + i) % self.slots * self.slot_size
+
+    def _read_slot(self, offset: int, name_hash: int, name: bytes) -> Optional[tuple[int, bytes]]:
+        #The (NotAfter, key) of the slot if it holds the Name, None otherwise
+        for _ in range(READ_RETRIES):
+            seq, slot_hash, not_after, name_len, key_len = SLOT_HEADER.unpack_from(self._mmap, offset)
+            if seq & 1:
+                continue
+            if slot_hash != name_hash:
+                payload = None
+            else:
+                start = offset + SLOT_HEADER.size
+                payload = self._mmap[start:start + name_len + key_len]
+            if SEQ.unpack_from(self._mmap, offset)[0] != seq:
+                continue
+            if payload is None or payload[:name_len] != name:
+                return None
+            return not_after, payload[name_len:]
+        return None
+
+    def _write_slot(self, offset: int, name_hash: int, name: bytes, key_bits: bytes, not_after: int):
+        #Called with the write lock held. A writer that died mid-write left the sequence odd, keep it odd while
+        #writing and make it even after, so that readers never take a half-written slot as complete
+        seq = SEQ.unpack_from(self._mmap, offset)[0] | 1
+        SEQ.pack_into(self._mmap, offset, seq)
+        SLOT_HEADER.pack_into(self._mmap, offset, seq, name_hash, not_after, len(name), len(key_bits))
+        start = offset + SLOT_HEADER.size
+        self._mmap[start:start + len(name) + len(key_bits)] = name + key_bits
+        SEQ.pack_into(self._mmap, offset, seq + 1)
+
+    def load(self, name: FormalName) -> Optional[bytes]:
+        name = Name.to_bytes(name)
+        name_hash = _name_hash(name)
+        for offset in self._offsets(name_hash):
+            entry = self._read_slot(offset, name_hash, name)
+            if entry is not None:
+                not_after, key_bits = entry
+                if not_after and not_after < time.time():
+                    return None
+                return key_bits
+        return None
+
+    def save(self, name: FormalName, key_bits: bytes, not_after: Optional[int] = None):
+        name = Name.to_bytes(name)
+        key_bits = bytes(key_bits)
+        if SLOT_HEADER.size + len(name) + len(key_bits) > self.slot_size:
+            logging.warning(f'Key of {Name.to_str(name)} does not fit in a slot of {self.path}')
+            return
+        name_hash = _name_hash(name)
+        now = time.time()
+        with self._write_lock():
+            target = None
+            target_not_after = None
+            for offset in self._offsets(name_hash):
+                _, slot_hash, slot_not_after, name_len, _ = SLOT_HEADER.unpack_from(self._mmap, offset)
+                start = offset + SLOT_HEADER.size
+                if slot_hash == name_hash and self._mmap[start:start + name_len] == name:
+                    target = offset
+                    break
+                if slot_hash == 0 or 0 < slot_not_after < now:
+                    slot_not_after = -1
+                elif slot_not_after == 0:
+                    slot_not_after = 2 ** 63 - 1
+                if target is None or slot_not_after < target_not_after:
+                    target, target_not_after = offset, slot_not_after
+            self._write_slot(target, name_hash, name, key_bits, not_after or 0)
+
+    def invalidate(self, name: FormalName):
+        name = Name.to_bytes(name)
+        name_hash = _name_hash(name)
+        with self._write_lock():
+            for offset in self._offsets(name_hash):
+                if self._read_slot(offset, name_hash, name) is not None:
+                    self._write_slot(offset, 0, b'', b'', 0)
+
+    def clear(self):
+        """
+        Empty the table for every process.
+        """
+        with self._write_lock():
+            for index in range(self.slots):
+                self._write_slot(HEADER.size + index * self.slot_size, 0, b'', b'', 0)
+
+    def close(self):
+        if self._mmap is None:
+            return
+        self._mmap.close()
+        self._mmap = None
+        os.close(self._fd)
@@ -21,17 +21,47 @@
 # limitations under the License.
 # -----------------------------------------------------------------------------
 import logging
+from typing import Optional, Union
 from ...encoding import BinaryStr, SignaturePtrs, FormalName, parse_data, Name
 from ...app import NDNApp, Validator
 from ...security import union_checker
-from ...security.validator.cascade_validator import CascadeChecker, PublicKeyStorage, MemoryKeyStorage
+from ...security.validator.cascade_validator import CascadeChecker, CertificatePins, PublicKeyStorage, \
+    AsyncPublicKeyStorage, MemoryKeyStorage, LocalPoRStore, RevocationFilters
 from .checker import Checker
 
-__all__ = ['lvs_validator']
+__all__ = ['lvs_validator', 'sanity_check']
+
+
+def sanity_check(checker: Checker, trust_anchor: BinaryStr):
+    """
+    Check that the user functions of the model are provided and the trust anchor matches all its roots of trust.
+
+    :raises ValueError: the check failed.
+    """
+    root_of_trust = checker.root_of_trust()
+    if not checker.validate_user_fns():
+        raise ValueError('Missing user functions for LVS validator')
+    cert_name, _, _, _ = parse_data(trust_anchor)
+    ta_matches = sum((m[0] for m in checker.match(cert_name)), start=[])
+    if not ta_matches or not root_of_trust.issubset(ta_matches):
+        raise ValueError('Trust anchor does not match all roots of trust of LVS model')
 
 
 def lvs_validator(checker: Checker, app: NDNApp, trust_anchor: BinaryStr,
-                  storage: PublicKeyStorage = MemoryKeyStorage()) -> Validator:
+                  storage: Union[PublicKeyStorage, AsyncPublicKeyStorage] = MemoryKeyStorage(),
+                  pins: Optional[CertificatePins] = None, sanity_checked: bool = False,
+                  por_store: Optional[LocalPoRStore] = None,
+                  revocation: Optional[RevocationFilters] = None) -> Validator:
+    """
+    Create a validator from an LVS checker, cascading to the trust anchor.
+
+    :param por_store: look PoRs up in this local store before fetching them.
+    :param revocation: reject the certificates revoked in these filters, see :class:`RevocationFilters`.
+    :param sanity_checked: skip :func:`sanity_check`, because it already passed for this checker and anchor,
+        e.g. as recorded by an on-disk cache.
+    :return: the validator. Its ``reload(checker=None, trust_anchor=None, sanity_checked=False)`` coroutine
+        swaps in a new checker and/or trust anchor at runtime, see :meth:`CascadeChecker.reload`.
+    """
     async def validate_name(name: FormalName, sig_ptrs: SignaturePtrs) -> bool:
         #Make sure name conforms to LVS schema
         if (not sig_ptrs.signature_info or not sig_ptrs.signature_info.key_locator
@@ -86,25 +116,27 @@ def lvs_validator(checker: Checker, app: NDNApp, trust_anchor: BinaryStr,
             - Else return True
         
         '''
-        res = checker.check(name, cert_name)
+        #Read from the CascadeChecker, so that reload() swaps the checker of both
+        res = cas_checker.lvs_checker.check(name, cert_name)
         logging.debug(f'[LVS Validate Name] result: {res}')
         print(f'[LVS Validate Name] result: {res}')
         return res
 
-    def sanity_check():
-        root_of_trust = checker.root_of_trust()
-        if not checker.validate_user_fns():
-            raise ValueError('Missing user functions for LVS validator')
-        cert_name, _, _, _ = parse_data(trust_anchor)
-        ta_matches = sum((m[0] for m in checker.match(cert_name)), start=[])
-        if not ta_matches or not root_of_trust.issubset(ta_matches):
-            raise ValueError('Trust anchor does not match all roots of trust of LVS model')
-
-    sanity_check()
+    if not sanity_checked:
+        sanity_check(checker, trust_anchor)
     #We add the roots of trust to be passed along to cascade checker.
     #So we modify CascadeChecker construction function to take in root_of_trust
     root_of_trust = checker.root_of_trust() #[Project code]:
-    cas_checker = CascadeChecker(app, trust_anchor, storage, checker)
+    cas_checker = CascadeChecker(app, trust_anchor, storage, checker, pins, por_store, revocation)
     ret = union_checker(validate_name, cas_checker)
     cas_checker.next_level = ret
+
+    async def reload(checker: Optional[Checker] = None, trust_anchor: Optional[BinaryStr] = None,
+                     sanity_checked: bool = False) -> int:
+        #Check the new configuration before anything is swapped
+        if not sanity_checked:
+            sanity_check(checker or cas_checker.lvs_checker, trust_anchor or cas_checker.trust_anchor)
+        return await cas_checker.reload(checker, trust_anchor)
+
+    ret.reload = reload
     return ret #We are actually returning union_checker, so when we call validate it actually runs union_checker to run both validate_name and cas_checker.